@@ -75,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'file_parser_project.wsgi.application'
+ASGI_APPLICATION = 'file_parser_project.asgi.application'
 
 # Database
 default_db_url = 'sqlite:///' + str(BASE_DIR / 'db.sqlite3')
@@ -171,7 +172,62 @@ CACHES = {
 # File Upload Settings
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 52428800))  # 50MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_FILE_SIZE
-FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_FILE_SIZE
+# Multipart uploads above this are spooled to a temporary file instead of RAM
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440))  # 2.5MB
+# Files accepted by one batch upload request
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', 500))
+DATA_UPLOAD_MAX_NUMBER_FILES = MAX_BATCH_FILES
+# CSV parser: 'python' (csv module), 'pandas' (chunked C tokenizer, falling
+# back to the csv module for dialects it can't read) or 'auto' (pandas for
+# files of at least CSV_PANDAS_MIN_BYTES)
+CSV_ENGINE = os.getenv('CSV_ENGINE', 'auto')
+CSV_PANDAS_MIN_BYTES = int(os.getenv('CSV_PANDAS_MIN_BYTES', 1048576))  # 1MB
+# Parse CSV uploads while they are still being received
+FILE_INGEST_WHILE_UPLOADING = os.getenv('FILE_INGEST_WHILE_UPLOADING', 'True').lower() == 'true'
+
+# Parse Result Cache Settings
+# Defaults to MEDIA_ROOT/parse_cache so cached artifacts can be hard-linked
+PARSE_CACHE_DIR = os.getenv('PARSE_CACHE_DIR') or None
+PARSE_CACHE_MAX_BYTES = int(os.getenv('PARSE_CACHE_MAX_BYTES', 1073741824))  # 1GB, 0 disables
+
+# Metrics Settings
+# Bearer token required by /metrics; empty leaves it open
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Search Index Settings
+# SQLite FTS5 database; defaults to MEDIA_ROOT/search/index.sqlite3
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH') or None
+
+# Chunked Upload Settings
+MAX_CHUNKED_UPLOAD_SIZE = int(os.getenv('MAX_CHUNKED_UPLOAD_SIZE', 10737418240))  # 10GB
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8388608))  # 8MB
+MIN_UPLOAD_CHUNK_SIZE = 262144  # 256KB
+MAX_UPLOAD_CHUNK_SIZE = 67108864  # 64MB
+# Unfinished uploads idle this long are deleted by `manage.py expire_upload_sessions`
+UPLOAD_SESSION_EXPIRY_HOURS = float(os.getenv('UPLOAD_SESSION_EXPIRY_HOURS', 24))
+
+# Background Processing
+# Number of worker threads per process; 0 runs processing inline in the request
+FILE_PROCESSING_WORKERS = int(os.getenv('FILE_PROCESSING_WORKERS', 4))
+# Jobs allowed to wait for a free worker before uploads are rejected (0 = unbounded)
+FILE_PROCESSING_QUEUE_SIZE = int(os.getenv('FILE_PROCESSING_QUEUE_SIZE', 0))
+# Seconds to wait for queued jobs to finish when the process exits
+FILE_PROCESSING_DRAIN_TIMEOUT = int(os.getenv('FILE_PROCESSING_DRAIN_TIMEOUT', 30))
+# Parser execution mode per file type: 'thread' (worker thread) or 'process'
+# (separate process pool, for CPU-bound parsers that would otherwise hold the GIL).
+# Large CSVs are only split across cores with 'process'; the default 'thread' uses one
+FILE_PARSER_EXECUTION = {
+    'csv': os.getenv('FILE_PARSER_EXECUTION_CSV', 'thread'),
+    'excel': os.getenv('FILE_PARSER_EXECUTION_EXCEL', 'process'),
+    'pdf': os.getenv('FILE_PARSER_EXECUTION_PDF', 'process'),
+}
+# Size of the parser process pool (0 = one per CPU core)
+FILE_PARSER_PROCESSES = int(os.getenv('FILE_PARSER_PROCESSES', 0))
+# Parser progress is written at most every N seconds or every N percentage points
+FILE_PROGRESS_FLUSH_INTERVAL = float(os.getenv('FILE_PROGRESS_FLUSH_INTERVAL', 1.0))
+FILE_PROGRESS_FLUSH_DELTA = int(os.getenv('FILE_PROGRESS_FLUSH_DELTA', 5))
+# Progress streams re-read the cache this often to catch updates from other processes
+FILE_PROGRESS_STREAM_POLL_INTERVAL = float(os.getenv('FILE_PROGRESS_STREAM_POLL_INTERVAL', 5))
 
 # Logging Configuration
 LOGGING = {
@@ -6,6 +6,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.http import JsonResponse
+from files.views import metrics_view
 
 # API Documentation
 schema_view = get_schema_view(
@@ -44,6 +45,9 @@ urlpatterns = [
     # Health check
     path('api/health/', health_check),
 
+    # Prometheus scrape target
+    path('metrics', metrics_view, name='metrics'),
+
     # Root URL
     path('', home),
 ]
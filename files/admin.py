@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FileUpload
+from .models import FileUpload, FileBlob, UploadBatch, UploadSession, UserFileStats
 
 
 @admin.register(FileUpload)
@@ -10,7 +10,7 @@ class FileUploadAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'mime_type', 'created_at']
     search_fields = ['original_name', 'user__email', 'user__username']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'file_size', 'mime_type']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'file_size', 'mime_type', 'stage_timings']
     
     fieldsets = (
         (None, {
@@ -24,6 +24,33 @@ class FileUploadAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at')
+            'fields': ('created_at', 'updated_at', 'stage_timings')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'file', 'file_size', 'ref_count', 'created_at']
+    search_fields = ['content_hash', 'file']
+    readonly_fields = ['content_hash', 'created_at']
+
+
+@admin.register(UploadBatch)
+class UploadBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'file_count', 'created_at']
+    readonly_fields = ['id', 'created_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'user', 'status', 'file_size', 'total_chunks', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'user__email']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+
+@admin.register(UserFileStats)
+class UserFileStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'status', 'mime_type', 'file_count', 'total_bytes', 'timed_count', 'processing_seconds']
+    list_filter = ['status', 'mime_type']
+    search_fields = ['user__email', 'user__username']
@@ -0,0 +1,58 @@
+import fcntl
+import os
+import shutil
+from contextlib import contextmanager
+from django.conf import settings
+
+ARTIFACTS_SUFFIX = '.parsed'
+LOCK_SUFFIX = '.lock'
+
+
+def artifacts_dir(file_path, create=False):
+    """Directory next to an uploaded file holding its parse artifacts"""
+    path = f'{file_path}{ARTIFACTS_SUFFIX}'
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def to_media_path(path):
+    """Path relative to MEDIA_ROOT, as stored in parsed_content"""
+    return os.path.relpath(path, settings.MEDIA_ROOT)
+
+
+def from_media_path(relative_path):
+    """Absolute path for a MEDIA_ROOT-relative path from parsed_content"""
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+def remove_artifacts(file_path):
+    shutil.rmtree(artifacts_dir(file_path), ignore_errors=True)
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive flock on ``lock_path``, held against other threads and processes alike"""
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def parse_lock(file_path):
+    """Serialize parses of one stored file across threads and worker processes.
+
+    Duplicates share a stored file and its artifacts, so whoever holds the
+    lock file next to it is the only one rebuilding them.
+    """
+    return file_lock(f'{file_path}{LOCK_SUFFIX}')
+
+
+def remove_parse_lock(file_path):
+    """Remove the lock file of a stored file that is being deleted"""
+    try:
+        os.remove(f'{file_path}{LOCK_SUFFIX}')
+    except FileNotFoundError:
+        pass
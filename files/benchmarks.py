@@ -0,0 +1,289 @@
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from django.conf import settings
+from django.test import override_settings
+from openpyxl import Workbook
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from .workers import _init_parser_process
+
+RESULTS_FORMAT = 1
+# Rows (pages for PDFs) of each corpus size
+SIZES = {
+    'small': {'rows': 10000, 'pages': 20},
+    'medium': {'rows': 100000, 'pages': 200},
+    'large': {'rows': 1000000, 'pages': 1000},
+}
+WIDE_COLUMNS = 50
+# Stands in for the save time openpyxl stamps into workbooks
+FIXED_TIMESTAMP = (2020, 1, 1, 0, 0, 0)
+SHEETS = 3
+LINES_PER_PAGE = 40
+WORDS = (
+    'alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike '
+    'november oscar papa quebec romeo sierra tango uniform victor whiskey xray yankee zulu'
+).split()
+CATEGORIES = ['north', 'south', 'east', 'west', 'central']
+
+
+def _narrow_row(rng, i):
+    day = datetime.date(2020, 1, 1) + datetime.timedelta(days=i % 1500)
+    return [i, round(rng.uniform(0, 10000), 2), rng.choice(CATEGORIES), day.isoformat()]
+
+
+def _wide_row(rng, i):
+    row = [i]
+    for column in range(1, WIDE_COLUMNS):
+        kind = column % 4
+        if kind == 0:
+            row.append(rng.randint(0, 1000000))
+        elif kind == 1:
+            row.append(round(rng.random() * 1000, 3))
+        elif kind == 2:
+            row.append(rng.choice(CATEGORIES))
+        else:
+            row.append(' '.join(rng.choices(WORDS, k=3)))
+    return row
+
+
+def write_csv(path, rows, wide=False, seed=0):
+    """Deterministic CSV: 4 mixed columns, or WIDE_COLUMNS with ``wide``"""
+    rng = random.Random(seed)
+    make_row = _wide_row if wide else _narrow_row
+    width = WIDE_COLUMNS if wide else 4
+    headers = ['id'] + [f'col{i}' for i in range(1, width)] if wide else ['id', 'amount', 'region', 'date']
+    with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv_file.write(','.join(headers) + '\n')
+        for i in range(rows):
+            # Some text values need quoting, as in real exports
+            values = [f'"{v}, ok"' if isinstance(v, str) and i % 10 == 0 else str(v) for v in make_row(rng, i)]
+            csv_file.write(','.join(values) + '\n')
+    return path
+
+
+def write_xlsx(path, rows, sheets=SHEETS, seed=0):
+    """Deterministic workbook with ``rows`` narrow rows spread over ``sheets`` sheets"""
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for sheet_number in range(sheets):
+        sheet = workbook.create_sheet(f'Sheet{sheet_number + 1}')
+        sheet.append(['id', 'amount', 'region', 'date'])
+        for i in range(rows // sheets):
+            row = _narrow_row(rng, i)
+            row[3] = datetime.date.fromisoformat(row[3])
+            sheet.append(row)
+    workbook.save(path)
+    _pin_timestamps(path)
+    return path
+
+
+def _pin_timestamps(path):
+    """Replace the save time in a workbook's properties and zip entries with a fixed one"""
+    stamp = datetime.datetime(*FIXED_TIMESTAMP).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with zipfile.ZipFile(path) as source:
+        members = [(info, source.read(info)) for info in source.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info, data in members:
+            if info.filename == 'docProps/core.xml':
+                data = re.sub(rb'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', stamp.encode(), data)
+            target.writestr(zipfile.ZipInfo(info.filename, FIXED_TIMESTAMP), data, zipfile.ZIP_DEFLATED)
+
+
+def write_pdf(path, pages, seed=0):
+    """Deterministic PDF with LINES_PER_PAGE lines of Helvetica text per page"""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    for _ in range(pages):
+        lines = ' T* '.join(f"({' '.join(rng.choices(WORDS, k=12))}) Tj" for _ in range(LINES_PER_PAGE))
+        page = PageObject.create_blank_page(width=612, height=792)
+        stream = DecodedStreamObject()
+        stream.set_data(f'BT /F1 10 Tf 14 TL 50 750 Td {lines} ET'.encode())
+        page[NameObject('/Contents')] = stream
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        writer.add_page(page)
+    with open(path, 'wb') as pdf_file:
+        writer.write(pdf_file)
+    return path
+
+
+# corpus name -> (parser type, file extension, writer taking (path, size spec))
+CORPORA = {
+    'csv-narrow': ('csv', 'csv', lambda path, size: write_csv(path, size['rows'])),
+    'csv-wide': ('csv', 'csv', lambda path, size: write_csv(path, size['rows'] // 10, wide=True)),
+    'xlsx-multi': ('excel', 'xlsx', lambda path, size: write_xlsx(path, size['rows'] // 10)),
+    'pdf-text': ('pdf', 'pdf', lambda path, size: write_pdf(path, size['pages'])),
+}
+
+
+def corpus_path(corpus_dir, corpus, size):
+    """Generate a corpus file once and reuse it on later runs"""
+    parser_type, extension, write = CORPORA[corpus]
+    path = os.path.join(corpus_dir, f'{corpus}-{size}.{extension}')
+    if not os.path.exists(path):
+        os.makedirs(corpus_dir, exist_ok=True)
+        write(f'{path}.tmp', SIZES[size])
+        os.replace(f'{path}.tmp', path)
+    return path
+
+
+def _rss_bytes():
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(parser_type, file_path, csv_engine=None, trace=True):
+    """Parse ``file_path`` once and return timings and memory use.
+
+    Progress writes are switched off so only parsing is measured. Peak RSS
+    is the whole process's, so run each measurement in a fresh process.
+    """
+    from . import tasks
+    overrides = {'MEDIA_ROOT': os.path.dirname(file_path)}
+    if csv_engine:
+        overrides['CSV_ENGINE'] = csv_engine
+
+    def parse():
+        tasks.remove_artifacts(file_path)
+        return tasks.PARSERS[parser_type](file_path, str(uuid.uuid4()))
+
+    with override_settings(**overrides), mock.patch.object(tasks, 'update_progress'):
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        parsed_content = parse()
+        seconds = time.perf_counter() - started
+        result = {
+            'seconds': seconds,
+            'rows': parsed_content['pages'] if parser_type == 'pdf' else _total_rows(parsed_content),
+            'peak_rss_bytes': _rss_bytes(),
+            'rss_growth_bytes': max(_rss_bytes() - rss_before, 0),
+        }
+        if trace:
+            # A second run, because tracing allocations slows parsing down
+            tracemalloc.start()
+            try:
+                parse()
+                result['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        tasks.remove_artifacts(file_path)
+    return result
+
+
+def _total_rows(parsed_content):
+    if 'sheet_details' in parsed_content:
+        return sum(sheet['rows'] for sheet in parsed_content['sheet_details'])
+    return parsed_content['total_rows']
+
+
+def measure_isolated(parser_type, file_path, csv_engine=None, trace=True):
+    """measure() in a freshly spawned process, so peak RSS belongs to this run alone"""
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_parser_process,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'file_parser_project.settings'),)
+    ) as executor:
+        return executor.submit(measure, parser_type, file_path, csv_engine, trace).result()
+
+
+def cases(corpora, sizes, csv_engines):
+    """``(name, corpus, size, engine)`` for every combination to run"""
+    for size in sizes:
+        for corpus in corpora:
+            engines = csv_engines if CORPORA[corpus][0] == 'csv' else [None]
+            for engine in engines:
+                name = f'{corpus}/{size}' + (f'/{engine}' if engine else '')
+                yield name, corpus, size, engine
+
+
+def run(corpus_dir, corpora, sizes, csv_engines, repeat=1, trace=True, isolate=True):
+    """Run every case and return the results document"""
+    results = []
+    for name, corpus, size, engine in cases(corpora, sizes, csv_engines):
+        parser_type = CORPORA[corpus][0]
+        path = corpus_path(corpus_dir, corpus, size)
+        run_once = measure_isolated if isolate else measure
+        runs = [run_once(parser_type, path, engine, trace and i == 0) for i in range(repeat)]
+        best = min(runs, key=lambda r: r['seconds'])
+        file_size = os.path.getsize(path)
+        results.append({
+            'case': name,
+            'corpus': corpus,
+            'size': size,
+            'parser': parser_type,
+            'csv_engine': engine,
+            'bytes': file_size,
+            'rows': best['rows'],
+            'seconds': best['seconds'],
+            'rows_per_second': best['rows'] / best['seconds'] if best['seconds'] else None,
+            'mb_per_second': file_size / 1e6 / best['seconds'] if best['seconds'] else None,
+            'peak_rss_bytes': max(r['peak_rss_bytes'] for r in runs),
+            'rss_growth_bytes': max(r['rss_growth_bytes'] for r in runs),
+            'tracemalloc_peak_bytes': runs[0].get('tracemalloc_peak_bytes'),
+        })
+    return {'format': RESULTS_FORMAT, 'environment': environment(), 'results': results}
+
+
+def environment():
+    """Where the results came from, so runs on different commits can be told apart"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """Per-case changes between two results documents.
+
+    Returns ``[(case, baseline seconds, current seconds, change)]`` for cases
+    in both, where change is the relative difference in time (positive is
+    slower), and the cases that got slower by more than ``threshold``.
+    """
+    before = {result['case']: result for result in baseline['results']}
+    rows = []
+    regressions = []
+    for result in current['results']:
+        old = before.get(result['case'])
+        if old is None or not old['seconds']:
+            continue
+        change = result['seconds'] / old['seconds'] - 1
+        rows.append((result['case'], old['seconds'], result['seconds'], change))
+        if change > threshold:
+            regressions.append(result['case'])
+    return rows, regressions
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as results_file:
+        return json.load(results_file)
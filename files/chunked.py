@@ -0,0 +1,169 @@
+import fcntl
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from .models import UploadSession
+
+READ_BLOCK_SIZE = 64 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ChunkError(Exception):
+    """Raised when a chunk doesn't match the session's layout"""
+
+
+class UploadClosed(Exception):
+    """Raised when the partial file is gone: the upload was completed, aborted or expired"""
+
+
+def create_partial_file(session):
+    """Preallocate the file that chunks are written into.
+
+    The file is extended with truncate(), which is sparse on most
+    filesystems, so creating a session costs no I/O up front.
+    """
+    os.makedirs(os.path.dirname(session.partial_path), exist_ok=True)
+    with open(session.partial_path, 'wb') as partial:
+        partial.truncate(session.file_size)
+
+
+def write_chunk(session, index, stream, content_length=None):
+    """Copy one chunk from ``stream`` straight to its offset in the partial file.
+
+    The body is read in READ_BLOCK_SIZE pieces and written with pwrite, so
+    chunks of the same session can be written concurrently and nothing is
+    held in memory beyond one block. Writers share a lock on the partial
+    file that completion takes exclusively, so no chunk lands in a file that
+    has already been moved into uploads/.
+    """
+    if not 0 <= index < session.total_chunks:
+        raise ChunkError(f'Chunk index must be between 0 and {session.total_chunks - 1}')
+    expected = session.chunk_length(index)
+    if content_length is not None and content_length != expected:
+        raise ChunkError(f'Chunk {index} must be {expected} bytes, got {content_length}')
+
+    offset = index * session.chunk_size
+    written = 0
+    fd = _open_partial_file(session, os.O_WRONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        if not _is_partial_file(fd, session):
+            raise UploadClosed('Upload is no longer accepting chunks')
+        while written < expected and stream is not None:
+            block = stream.read(min(READ_BLOCK_SIZE, expected - written))
+            if not block:
+                break
+            view = memoryview(block)
+            while view:
+                count = os.pwrite(fd, view, offset + written)
+                view = view[count:]
+                written += count
+    finally:
+        os.close(fd)
+
+    if written != expected:
+        raise ChunkError(f'Chunk {index} must be {expected} bytes, got {written}')
+    return written
+
+
+def _open_partial_file(session, flags):
+    try:
+        return os.open(session.partial_path, flags)
+    except FileNotFoundError:
+        raise UploadClosed('Upload is no longer accepting chunks') from None
+
+
+def _is_partial_file(fd, session):
+    """Whether ``fd`` is still the file at the session's partial path, i.e. not finalized"""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(session.partial_path))
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def lock_partial_file(session):
+    """Hold the partial file exclusively, once chunk writes in progress have finished"""
+    fd = _open_partial_file(session, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def hash_partial_file(session):
+    """sha256 of the assembled file, used to deduplicate it"""
+    hasher = hashlib.sha256()
+    with open(session.partial_path, 'rb') as partial:
+        while True:
+            block = partial.read(HASH_BLOCK_SIZE)
+            if not block:
+                return hasher.hexdigest()
+            hasher.update(block)
+
+
+def finalize_partial_file(session):
+    """Move the assembled file into uploads/ and return its storage name.
+
+    This is a rename on the same filesystem, so the data is never copied.
+    """
+    filename = get_valid_filename(os.path.basename(session.filename)) or 'upload'
+    name = default_storage.get_available_name(f'uploads/{filename}')
+    os.replace(session.partial_path, default_storage.path(name))
+    return name
+
+
+def restore_partial_file(session, name):
+    """Undo finalize_partial_file so completion can be retried"""
+    os.replace(default_storage.path(name), session.partial_path)
+
+
+def remove_partial_file(session):
+    if os.path.exists(session.partial_path):
+        os.remove(session.partial_path)
+
+
+def expire_upload_sessions(max_age):
+    """Delete sessions idle for longer than ``max_age`` and their partial files.
+
+    A session is idle when neither it nor any of its chunks changed since the
+    cutoff; this also catches completions that died halfway. Partial files
+    left without a session, and stale ingest staging directories, are
+    removed too. Returns (sessions, files) removed.
+    """
+    cutoff = timezone.now() - max_age
+    stale = UploadSession.objects.filter(
+        status__in=('active', 'completing'), updated_at__lt=cutoff
+    ).annotate(last_chunk_at=Max('chunks__created_at')).exclude(last_chunk_at__gte=cutoff)
+    sessions = 0
+    for session in stale:
+        remove_partial_file(session)
+        session.delete()
+        sessions += 1
+
+    files = 0
+    partial_dir = UploadSession.partial_dir()
+    if os.path.isdir(partial_dir):
+        live = {str(session_id) for session_id in UploadSession.objects.values_list('id', flat=True)}
+        for entry in os.scandir(partial_dir):
+            stem = entry.name.rsplit('.', 1)[0]
+            if stem in live or entry.stat().st_mtime >= cutoff.timestamp():
+                continue
+            try:
+                # Besides partial files, ingest stages parse output here in <uuid>.parsed directories
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+                files += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing {entry.path}: {e}")
+    return sessions, files
@@ -0,0 +1,298 @@
+import json
+import math
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from .artifacts import from_media_path, to_media_path
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+CHUNK_ROWS = 65536
+# Integers above this can't round-trip through the float64 staging column
+MAX_EXACT_INT = 2 ** 53
+COPY_BUFFER_BYTES = 1 << 20
+PADDING_PREFIXES = np.frombuffer(b'0+- \t\n\r\x0b\x0c', dtype=np.uint8)
+
+
+def _encode_texts(values, nulls):
+    """UTF-8 of the non-null values, concatenated, and each value's length in bytes"""
+    texts = values.copy()
+    texts[nulls] = ''
+    try:
+        joined = ''.join(texts)
+    except TypeError:
+        # Not all strings, e.g. numbers and dates from a spreadsheet
+        texts = [str(value) for value in texts]
+        joined = ''.join(texts)
+    data = joined.encode('utf-8')
+    if len(data) == len(joined):
+        # All ASCII, so byte lengths are character lengths
+        lengths = np.fromiter(map(len, texts), dtype='<i8', count=len(texts))
+    else:
+        lengths = np.fromiter((len(text.encode('utf-8')) for text in texts), dtype='<i8', count=len(texts))
+    return data, lengths
+
+
+class ColumnarWriter:
+    """Write a table column by column into a directory of flat binary files.
+
+    Rows are buffered and flushed in chunks. Each column is staged both as
+    UTF-8 text (an int64 offsets file plus a data file) and, for as long as
+    every value parses as a number, as float64. On close the column keeps
+    whichever representation fits: ``int64``, ``float64`` or ``string``.
+    All files are raw little-endian arrays, so readers can memory-map them.
+    """
+
+    def __init__(self, path, headers, chunk_rows=CHUNK_ROWS):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.headers = ['' if h is None else str(h) for h in headers]
+        self.chunk_rows = chunk_rows
+        self.num_rows = 0
+        self._rows = []
+        width = len(self.headers)
+        self._numeric = [True] * width
+        self._integral = [True] * width
+        self._has_nulls = [False] * width
+        self._text_size = [0] * width
+        for i in range(width):
+            # Files are reopened per chunk so wide tables don't exhaust descriptors
+            for ext in ('txt', 'null', 'f8'):
+                open(self._file(i, ext), 'wb').close()
+            np.zeros(1, dtype='<i8').tofile(self._file(i, 'off'))
+
+    def _file(self, index, ext):
+        return os.path.join(self.path, f'c{index}.{ext}')
+
+    def _append_to(self, index, ext, data):
+        with open(self._file(index, ext), 'ab') as column_file:
+            column_file.write(data)
+
+    def append(self, row):
+        """Add one row; short rows are padded with nulls, extra values dropped"""
+        width = len(self.headers)
+        if len(row) != width:
+            row = list(row[:width]) + [None] * (width - len(row))
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_rows:
+            self._flush()
+
+    def append_columns(self, columns):
+        """Add a block of rows given as one equal-length sequence per column"""
+        self._flush()
+        # pandas yields an empty block for a file with only a header
+        if columns and len(columns[0]):
+            self.num_rows += len(columns[0])
+            self._write_columns(columns)
+
+    def part_state(self):
+        """Flush and describe the staged columns, so append_part can adopt them.
+
+        For datasets written in parts by several processes: each part's
+        writer is left unclosed and the parts are appended to one writer.
+        """
+        self._flush()
+        return {
+            'num_rows': self.num_rows,
+            'numeric': self._numeric,
+            'integral': self._integral,
+            'has_nulls': self._has_nulls,
+            'text_size': self._text_size,
+        }
+
+    def append_part(self, path, state):
+        """Append the rows staged in ``path`` by a writer with the same headers"""
+        self._flush()
+        for i in range(len(self.headers)):
+            part_file = os.path.join(path, f'c{i}.{{}}')
+            for ext in ('null', 'txt'):
+                with open(part_file.format(ext), 'rb') as source, open(self._file(i, ext), 'ab') as target:
+                    shutil.copyfileobj(source, target, COPY_BUFFER_BYTES)
+            offsets = np.fromfile(part_file.format('off'), dtype='<i8')[1:] + self._text_size[i]
+            self._append_to(i, 'off', offsets.tobytes())
+            self._text_size[i] += state['text_size'][i]
+            self._has_nulls[i] = self._has_nulls[i] or state['has_nulls'][i]
+            if not self._numeric[i]:
+                continue
+            if state['numeric'][i]:
+                with open(part_file.format('f8'), 'rb') as source, open(self._file(i, 'f8'), 'ab') as target:
+                    shutil.copyfileobj(source, target, COPY_BUFFER_BYTES)
+                self._integral[i] = self._integral[i] and state['integral'][i]
+            else:
+                self._numeric[i] = False
+                os.remove(self._file(i, 'f8'))
+        self.num_rows += state['num_rows']
+
+    def _flush(self):
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows)) if self.headers else []
+        self.num_rows += len(self._rows)
+        self._rows = []
+        self._write_columns(columns)
+
+    def _write_columns(self, columns):
+        for i, values in enumerate(columns):
+            values = np.asarray(values, dtype=object)
+            nulls = pd.isna(values)
+            if nulls.any():
+                self._has_nulls[i] = True
+            self._append_to(i, 'null', nulls.astype('u1').tobytes())
+
+            data, lengths = _encode_texts(values, nulls)
+            offsets = self._text_size[i] + np.cumsum(lengths)
+            self._append_to(i, 'txt', data)
+            self._append_to(i, 'off', offsets.astype('<i8').tobytes())
+            self._text_size[i] = int(offsets[-1])
+
+            if self._numeric[i]:
+                # Only values starting like '0', '+0' or ' 0' can be zero-padded
+                first_bytes = np.zeros(len(values), dtype=np.uint8)
+                present = lengths > 0
+                first_bytes[present] = np.frombuffer(data, dtype=np.uint8)[(np.cumsum(lengths) - lengths)[present]]
+                self._stage_numbers(i, values, nulls, np.isin(first_bytes, PADDING_PREFIXES))
+
+    def _stage_numbers(self, index, values, nulls, maybe_padded):
+        series = pd.Series(values, dtype=object)
+        blank = nulls | (series == '').to_numpy()
+        numbers = pd.to_numeric(series.where(~blank, None), errors='coerce').to_numpy(dtype='<f8')
+        # Zero-padded codes such as '007' are identifiers, not numbers
+        padded = series[maybe_padded & ~blank].astype(str).str.match(r'\s*[+-]?0\d').any()
+        if padded or (~np.isfinite(numbers) & ~blank).any():
+            # A non-numeric value, or one like 'inf' that JSON can't carry: this column stays text
+            self._numeric[index] = False
+            os.remove(self._file(index, 'f8'))
+            return
+        if blank.any():
+            self._integral[index] = False
+        elif self._integral[index]:
+            self._integral[index] = bool(
+                np.all(np.mod(numbers, 1) == 0)
+                and np.all(np.abs(numbers) < MAX_EXACT_INT)
+            )
+        self._append_to(index, 'f8', numbers.tobytes())
+
+    def close(self):
+        """Flush buffered rows, settle column types and write the metadata"""
+        self._flush()
+        columns = []
+        for i, name in enumerate(self.headers):
+            if self._numeric[i] and self.num_rows:
+                column_type = 'int64' if self._integral[i] else 'float64'
+                if column_type == 'int64':
+                    np.fromfile(self._file(i, 'f8'), dtype='<f8').astype('<i8').tofile(self._file(i, 'i8'))
+                    os.remove(self._file(i, 'f8'))
+                for ext in ('txt', 'off', 'null'):
+                    os.remove(self._file(i, ext))
+            else:
+                column_type = 'string'
+                if self._numeric[i]:
+                    os.remove(self._file(i, 'f8'))
+                if not self._has_nulls[i]:
+                    os.remove(self._file(i, 'null'))
+            columns.append({'name': name, 'type': column_type, 'nullable': self._has_nulls[i]})
+
+        meta = {'version': FORMAT_VERSION, 'num_rows': self.num_rows, 'columns': columns}
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+        return meta
+
+
+def _memmap(path, dtype, length):
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+class StringColumn:
+    """Memory-mapped UTF-8 column; values are decoded on access"""
+
+    def __init__(self, path, index, length, nullable):
+        self.length = length
+        self.offsets = _memmap(os.path.join(path, f'c{index}.off'), '<i8', length + 1)
+        data_path = os.path.join(path, f'c{index}.txt')
+        self.data = _memmap(data_path, 'u1', os.path.getsize(data_path))
+        self.nulls = _memmap(os.path.join(path, f'c{index}.null'), 'u1', length) if nullable else None
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step == 1:
+                return self.values(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += self.length
+        if self.nulls is not None and self.nulls[key]:
+            return None
+        return bytes(self.data[self.offsets[key]:self.offsets[key + 1]]).decode('utf-8')
+
+    def values(self, start, stop):
+        """Values ``start`` to ``stop`` with one read of the data they span"""
+        stop = max(start, stop)
+        offsets = (self.offsets[start:stop + 1] - self.offsets[start]).tolist()
+        data = bytes(self.data[self.offsets[start]:self.offsets[stop]]) if stop > start else b''
+        values = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(stop - start)]
+        if self.nulls is not None:
+            for i in np.flatnonzero(self.nulls[start:stop]):
+                values[i] = None
+        return values
+
+
+class ColumnarDataset:
+    """Read access to a directory written by ColumnarWriter"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as meta_file:
+            self.meta = json.load(meta_file)
+        self.num_rows = self.meta['num_rows']
+        self.headers = [column['name'] for column in self.meta['columns']]
+        self._columns = {}
+
+    def column(self, key):
+        """Column by name or position: a numpy memmap, or a StringColumn for text"""
+        index = key if isinstance(key, int) else self.headers.index(key)
+        if index not in self._columns:
+            spec = self.meta['columns'][index]
+            if spec['type'] == 'int64':
+                column = _memmap(os.path.join(self.path, f'c{index}.i8'), '<i8', self.num_rows)
+            elif spec['type'] == 'float64':
+                column = _memmap(os.path.join(self.path, f'c{index}.f8'), '<f8', self.num_rows)
+            else:
+                column = StringColumn(self.path, index, self.num_rows, spec['nullable'])
+            self._columns[index] = column
+        return self._columns[index]
+
+    def rows(self, start=0, stop=None):
+        """Rows ``start`` to ``stop`` as dicts keyed by header"""
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        start = max(0, min(start, stop))
+        columns = []
+        for index, spec in enumerate(self.meta['columns']):
+            values = self.column(index)[start:stop]
+            if spec['type'] == 'int64':
+                values = values.tolist()
+            elif spec['type'] == 'float64':
+                values = [None if math.isnan(v) else v for v in values.tolist()]
+            columns.append(values)
+        return [dict(zip(self.headers, row)) for row in zip(*columns)] if columns else [{}] * (stop - start)
+
+
+def dataset_pointer(meta, path):
+    """The summary stored in parsed_content to locate a dataset"""
+    return {
+        'format': 'columnar',
+        'version': meta['version'],
+        'path': to_media_path(path),
+        'rows': meta['num_rows'],
+        'columns': [{'name': c['name'], 'type': c['type']} for c in meta['columns']],
+    }
+
+
+def open_dataset(pointer):
+    """Open the dataset referenced by a parsed_content ``dataset`` pointer"""
+    return ColumnarDataset(from_media_path(pointer['path']))
@@ -0,0 +1,197 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+from .columnar import CHUNK_ROWS, ColumnarWriter
+from .csv_stream import (
+    PREVIEW_ROWS, ROW_INDEX_INTERVAL, SAMPLE_ROWS, SNIFF_BYTES, LineReader, sniff_delimiter
+)
+
+SCAN_BLOCK_BYTES = 1 << 20
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+
+class UnsupportedDialect(Exception):
+    """The file needs the csv module's handling; parse it with parse_csv_stream"""
+
+
+def scan_records(stream, delimiter, width, interval, first_row=0):
+    """Find where each record of a CSV stream starts, without parsing it.
+
+    Reads from the stream's position in blocks and tracks double-quote parity
+    with NumPy: a newline outside quotes ends a record, and so does a
+    delimiter outside quotes end a field. Blank lines are skipped the way
+    csv.reader skips them. Returns ``(rows, offsets)`` where ``offsets`` is an
+    int64 array of the byte offset of every ``interval``-th record, counting the first
+    record as number ``first_row``.
+
+    Raises UnsupportedDialect unless every record has exactly ``width``
+    fields and quotes and line endings are regular, so a file that passes is
+    one the C tokenizer reads exactly as csv.reader would. With ``width``
+    None fields are not counted, which makes a cheaper pass that only
+    counts records.
+    """
+    separator = ord(delimiter)
+    position = stream.tell()
+    record_start = position
+    in_quotes = 0
+    fields_so_far = 0
+    rows = first_row
+    offsets = []
+
+    def add_records(starts, ends, field_counts, block, block_start):
+        nonlocal rows
+        lengths = ends - starts
+        first_bytes = block[np.clip(starts - block_start, 0, len(block) - 1)]
+        blank = (lengths == 0) | ((lengths == 1) & (first_bytes == CARRIAGE_RETURN))
+        if width is not None and np.any(field_counts[~blank] != width):
+            raise UnsupportedDialect('Rows have different numbers of fields')
+        starts = starts[~blank]
+        numbers = rows + np.arange(len(starts))
+        offsets.append(starts[numbers % interval == 0].astype(np.int64))
+        rows += len(starts)
+
+    while True:
+        # Blocks end on a newline, so a CRLF pair is never split between two
+        data = stream.read(SCAN_BLOCK_BYTES)
+        if data and not data.endswith(b'\n'):
+            data += stream.readline()
+        if not data:
+            break
+        block = np.frombuffer(data, dtype=np.uint8)
+        quoted = np.bitwise_xor.accumulate(block == QUOTE) ^ bool(in_quotes)
+        in_quotes = int(quoted[-1])
+        outside = ~quoted
+        if (
+            np.any(outside[:-1] & (block[:-1] == CARRIAGE_RETURN) & (block[1:] != NEWLINE))
+            or (outside[-1] and block[-1] == CARRIAGE_RETURN)
+        ):
+            raise UnsupportedDialect('Bare carriage return line endings')
+
+        ends = np.flatnonzero(outside & (block == NEWLINE))
+        separators = np.cumsum(outside & (block == separator)) if width is not None else None
+        if len(ends):
+            if separators is not None:
+                at_ends = separators[ends]
+                field_counts = np.diff(at_ends, prepend=0) + 1
+                field_counts[0] += fields_so_far
+                fields_so_far = int(separators[-1] - at_ends[-1])
+            else:
+                field_counts = None
+            ends = ends + position
+            starts = np.concatenate(([record_start], ends[:-1] + 1))
+            add_records(starts, ends, field_counts, block, position)
+            record_start = int(ends[-1]) + 1
+        elif separators is not None:
+            fields_so_far += int(separators[-1])
+        last_block, last_start = block, position
+        position += len(block)
+
+    if in_quotes:
+        raise UnsupportedDialect('Unbalanced quotes')
+    if position > record_start:
+        # A last record without a trailing newline
+        add_records(
+            np.array([record_start]), np.array([position]), np.array([fields_so_far + 1]),
+            last_block, last_start
+        )
+    return rows - first_row, np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+
+
+def read_header(stream):
+    """Sniff the delimiter and read the header row from the start of ``stream``.
+
+    Returns ``(delimiter, headers, data_start)`` where ``data_start`` is the
+    byte offset of the first record after the header.
+    """
+    delimiter = sniff_delimiter(stream.read(SNIFF_BYTES).decode('utf-8', errors='ignore'))
+    if delimiter == '"' or delimiter in '\r\n':
+        raise UnsupportedDialect(f'Delimiter {delimiter!r}')
+    stream.seek(0)
+    lines = LineReader(stream)
+    for row in csv.reader(lines, delimiter=delimiter):
+        if row:
+            return delimiter, row, lines.offset
+    raise UnsupportedDialect('No header row')
+
+
+def read_records(stream, delimiter, headers, writer=None, on_chunk=None):
+    """Read the records after the header with the C tokenizer, CHUNK_ROWS at a time.
+
+    Rows go to ``writer`` if given; ``on_chunk`` is called after each chunk.
+    Returns ``(rows, preview)`` with the first PREVIEW_ROWS rows as dicts.
+    """
+    preview = []
+    rows = 0
+    chunks = pd.read_csv(
+        stream, sep=delimiter, header=None, names=range(len(headers)), dtype=str,
+        keep_default_na=False, na_values=[], skip_blank_lines=True, engine='c',
+        encoding='utf-8', chunksize=CHUNK_ROWS
+    )
+    for chunk in chunks:
+        columns = [chunk[i].to_numpy(dtype=object) for i in range(len(headers))]
+        if writer:
+            writer.append_columns(columns)
+        if len(preview) < PREVIEW_ROWS:
+            for row in zip(*(column[:PREVIEW_ROWS - len(preview)] for column in columns)):
+                preview.append(dict(zip(headers, row)))
+        rows += len(chunk)
+        if on_chunk:
+            on_chunk()
+    return rows, preview
+
+
+def csv_result(headers, total_rows, preview, delimiter):
+    """The parse_csv_stream-shaped result, less the dataset and row index files"""
+    return {
+        'type': 'csv',
+        'headers': headers,
+        'rows': total_rows,
+        'data': preview,
+        'total_rows': total_rows,
+        'sample_data': preview[:SAMPLE_ROWS],
+        'row_index': {
+            'interval': ROW_INDEX_INTERVAL,
+            'delimiter': delimiter,
+            'encoding': 'utf-8',
+        }
+    }
+
+
+def parse_csv_pandas(file_path, on_progress=None, dataset_path=None, index_path=None):
+    """Parse a CSV file with pandas' C tokenizer, CHUNK_ROWS rows at a time.
+
+    Returns what parse_csv_path returns for the same file. The header is read
+    with the csv module and the rest is first checked with scan_records,
+    which also yields the row index. Files the scan rejects raise
+    UnsupportedDialect before anything is written, and so does a row count
+    that disagrees with the scan, after the dataset has been written.
+    """
+    total_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as stream:
+        delimiter, headers, data_start = read_header(stream)
+        stream.seek(data_start)
+        total_rows, offsets = scan_records(stream, delimiter, len(headers), ROW_INDEX_INTERVAL)
+
+        def on_chunk():
+            if on_progress and total_size:
+                on_progress(min(stream.tell() / total_size, 1))
+
+        stream.seek(data_start)
+        writer = ColumnarWriter(dataset_path, headers) if dataset_path else None
+        rows_read, preview = read_records(stream, delimiter, headers, writer, on_chunk)
+
+    if rows_read != total_rows:
+        raise UnsupportedDialect(f'Read {rows_read} rows but found {total_rows} records')
+
+    result = csv_result(headers, total_rows, preview, delimiter)
+    if writer:
+        result['dataset_meta'] = writer.close()
+    if index_path is None:
+        del result['row_index']
+    else:
+        with open(index_path, 'wb') as index_file:
+            offsets.tofile(index_file)
+    return result
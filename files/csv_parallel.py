@@ -0,0 +1,221 @@
+import io
+import mmap
+import os
+import shutil
+from concurrent.futures import as_completed
+import numpy as np
+from .columnar import ColumnarWriter
+from .csv_pandas import (
+    NEWLINE, QUOTE, SCAN_BLOCK_BYTES, UnsupportedDialect,
+    csv_result, read_header, read_records, scan_records
+)
+from .csv_stream import PREVIEW_ROWS, ROW_INDEX_INTERVAL
+
+# Files are only split into segments at least this big
+MIN_SEGMENT_BYTES = 16 * 1024 * 1024
+
+
+class RangeReader(io.RawIOBase):
+    """Read-only stream over bytes ``start``..``stop`` of a memory-mapped file.
+
+    ``tell()`` reports absolute file offsets, so byte offsets found while
+    reading a segment are offsets into the whole file.
+    """
+
+    def __init__(self, buffer, start, stop):
+        self.buffer = buffer
+        self.position = start
+        self.start = start
+        self.stop = stop
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.stop
+        self.position = max(self.start, min(offset, self.stop))
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.buffer.close()
+        super().close()
+
+    def readinto(self, target):
+        size = min(len(target), self.stop - self.position)
+        target[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+
+
+def _open_range(file_path, start, stop):
+    """Buffered reader for part of a file, backed by a memory map"""
+    with open(file_path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return io.BufferedReader(RangeReader(buffer, start, stop))
+
+
+def find_record_ends(file_path, start, stop):
+    """Quote parity of a segment and where its first record ends, for either parity.
+
+    Returns ``(quote_parity, first_end)`` where ``first_end[p]`` is the
+    offset of the first newline in the segment that is outside quotes when
+    the segment starts with quote parity ``p``, or None.
+    """
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        parity = 0
+        first_end = [None, None]
+        for block_start in range(start, stop, SCAN_BLOCK_BYTES):
+            block = np.frombuffer(buffer, dtype=np.uint8, count=min(SCAN_BLOCK_BYTES, stop - block_start),
+                                  offset=block_start)
+            if None in first_end:
+                quoted = np.bitwise_xor.accumulate(block == QUOTE) ^ bool(parity)
+                newlines = np.flatnonzero(block == NEWLINE)
+                inside = quoted[newlines]
+                for start_parity, candidates in ((0, newlines[~inside]), (1, newlines[inside])):
+                    if first_end[start_parity] is None and len(candidates):
+                        first_end[start_parity] = block_start + int(candidates[0])
+            parity ^= int(np.count_nonzero(block == QUOTE)) & 1
+            del block
+        return parity, first_end
+
+
+def count_records(file_path, start, stop, delimiter):
+    """Number of records in ``start``..``stop``; a cheap pass that doesn't check fields"""
+    with _open_range(file_path, start, stop) as stream:
+        rows, _ = scan_records(stream, delimiter, None, ROW_INDEX_INTERVAL)
+    return rows
+
+
+def parse_part(file_path, start, stop, delimiter, headers, first_row, rows, dataset_path):
+    """Check and parse the records in ``start``..``stop`` into an unclosed dataset part.
+
+    ``first_row`` is the number of the part's first record in the file, so
+    the offsets it returns are the file's row index entries in this part.
+    """
+    with _open_range(file_path, start, stop) as stream:
+        scanned, offsets = scan_records(stream, delimiter, len(headers), ROW_INDEX_INTERVAL, first_row)
+        stream.seek(start)
+        writer = ColumnarWriter(dataset_path, headers) if dataset_path else None
+        rows_read, preview = read_records(stream, delimiter, headers, writer)
+    if not rows_read == scanned == rows:
+        raise UnsupportedDialect(f'Read {rows_read} rows but found {scanned} records')
+    return {
+        'offsets': offsets,
+        'preview': preview,
+        'state': writer.part_state() if writer else None,
+    }
+
+
+def split_records(file_path, data_start, size, executor, segments):
+    """Split ``data_start``..``size`` into byte ranges of whole records.
+
+    The file is cut into equal segments whose quote parities and candidate
+    record ends are found in parallel. The parity at each cut is then the
+    running XOR of the segments before it, which picks the real record end.
+    """
+    step = max((size - data_start) // segments, 1)
+    cuts = list(range(data_start, size, step))[:segments] + [size]
+    futures = [
+        executor.submit(find_record_ends, file_path, cuts[i], cuts[i + 1])
+        for i in range(len(cuts) - 1)
+    ]
+    scans = [future.result() for future in futures]
+
+    bounds = [data_start]
+    parity = 0
+    for i, (segment_parity, first_end) in enumerate(scans):
+        if i:
+            end = first_end[parity]
+            # A segment that is one long quoted field joins the previous range
+            if end is not None and end + 1 > bounds[-1]:
+                bounds.append(end + 1)
+        parity ^= segment_parity
+    if parity:
+        raise UnsupportedDialect('Unbalanced quotes')
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1]]
+
+
+def segment_count(size, workers):
+    """Ranges to split a file of ``size`` bytes into: one per worker, none under MIN_SEGMENT_BYTES"""
+    return max(1, min(workers, size // MIN_SEGMENT_BYTES))
+
+
+def parse_csv_parallel(file_path, executor, segments, on_progress=None, dataset_path=None, index_path=None):
+    """Parse a CSV file on several cores by splitting it at record boundaries.
+
+    The file is split with split_records and the records of every range
+    are counted in parallel with a pass that skips field checks. Each range
+    is then checked and parsed in parallel into its own dataset part, with
+    row numbers that follow on from the ranges before it, so it returns only
+    its own row index entries. Parts are concatenated in order. Returns what
+    parse_csv_pandas returns; raises UnsupportedDialect for files that
+    parse_csv_pandas would refuse.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as stream:
+        delimiter, headers, data_start = read_header(stream)
+
+    ranges = split_records(file_path, data_start, size, executor, segments)
+    if on_progress:
+        on_progress(0.1)
+    counts = [
+        future.result() for future in
+        [executor.submit(count_records, file_path, start, stop, delimiter) for start, stop in ranges]
+    ]
+    if on_progress:
+        on_progress(0.2)
+
+    parts_path = f'{dataset_path}.parts' if dataset_path else None
+    futures = []
+    first_row = 0
+    for i, ((start, stop), rows) in enumerate(zip(ranges, counts)):
+        part_path = os.path.join(parts_path, str(i)) if parts_path else None
+        futures.append(executor.submit(
+            parse_part, file_path, start, stop, delimiter, headers, first_row, rows, part_path
+        ))
+        first_row += rows
+    try:
+        done = 0
+        for _ in as_completed(futures):
+            done += 1
+            if on_progress:
+                on_progress(0.2 + 0.7 * done / len(futures))
+        parts = [future.result() for future in futures]
+
+        preview = []
+        writer = ColumnarWriter(dataset_path, headers) if dataset_path else None
+        for i, part in enumerate(parts):
+            preview.extend(part['preview'][:PREVIEW_ROWS - len(preview)])
+            if writer:
+                writer.append_part(os.path.join(parts_path, str(i)), part['state'])
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        if parts_path:
+            shutil.rmtree(parts_path, ignore_errors=True)
+
+    result = csv_result(headers, first_row, preview, delimiter)
+    if writer:
+        result['dataset_meta'] = writer.close()
+    if index_path is None:
+        del result['row_index']
+    else:
+        with open(index_path, 'wb') as index_file:
+            for part in parts:
+                part['offsets'].tofile(index_file)
+    if on_progress:
+        on_progress(1)
+    return result
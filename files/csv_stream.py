@@ -0,0 +1,175 @@
+import csv
+import os
+from array import array
+from .columnar import ColumnarWriter
+
+PREVIEW_ROWS = 100
+SAMPLE_ROWS = 5
+SNIFF_BYTES = 1024
+PROGRESS_EVERY_ROWS = 1000
+# Every Nth data row gets its byte offset recorded in the row index
+ROW_INDEX_INTERVAL = 1000
+
+
+class LineReader:
+    """Iterate the decoded lines of a binary stream.
+
+    ``offset`` is the byte position of the next line to be returned, so a
+    ``csv.reader`` wrapped around this knows exactly where each record starts,
+    including records whose quoted fields span several lines. ``prefix`` holds
+    bytes already read from a stream that can't seek back.
+    """
+
+    def __init__(self, stream, encoding='utf-8', offset=0, prefix=b''):
+        self.stream = stream
+        self.encoding = encoding
+        self.offset = offset
+        self.prefix = prefix
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.prefix:
+            newline = self.prefix.find(b'\n')
+            if newline >= 0:
+                line, self.prefix = self.prefix[:newline + 1], self.prefix[newline + 1:]
+            else:
+                line, self.prefix = self.prefix + self.stream.readline(), b''
+        else:
+            line = self.stream.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+
+def sniff_delimiter(sample):
+    """Guess the delimiter from a text sample, defaulting to a comma"""
+    try:
+        return csv.Sniffer().sniff(sample).delimiter
+    except csv.Error:
+        return ','
+
+
+def row_to_dict(headers, row):
+    """Build a row dict the same way csv.DictReader does"""
+    record = dict(zip(headers, row))
+    if len(row) > len(headers):
+        record[None] = row[len(headers):]
+    elif len(row) < len(headers):
+        for key in headers[len(row):]:
+            record[key] = None
+    return record
+
+
+def parse_csv_stream(stream, total_size=None, on_progress=None, encoding='utf-8',
+                     dataset_path=None, index_path=None):
+    """Parse a binary CSV stream in constant memory.
+
+    Every row is counted but only the first PREVIEW_ROWS are turned into
+    dicts, so peak memory does not depend on the file size. ``on_progress``
+    is called with the fraction of bytes consumed every PROGRESS_EVERY_ROWS rows.
+    With ``dataset_path`` every row is also written to a columnar dataset there,
+    and the returned dict carries its metadata under ``dataset_meta``.
+    With ``index_path`` the byte offset of every ROW_INDEX_INTERVAL-th row is
+    saved there as raw int64, and the result gets a ``row_index`` entry.
+    """
+    seekable = stream.seekable()
+    start = stream.tell() if seekable else 0
+    sample = stream.read(SNIFF_BYTES)
+    if seekable:
+        stream.seek(start)
+
+    delimiter = sniff_delimiter(sample.decode(encoding, errors='ignore'))
+    lines = LineReader(stream, encoding=encoding, offset=start, prefix=b'' if seekable else sample)
+    reader = csv.reader(lines, delimiter=delimiter)
+
+    headers = []
+    for row in reader:
+        if row:
+            headers = row
+            break
+
+    writer = ColumnarWriter(dataset_path, headers) if dataset_path else None
+    offsets = array('q')
+    # The reader consumes whole lines only, so where one record ends the next
+    # one begins, even when quoted fields span several lines
+    record_start = lines.offset
+    preview = []
+    total_rows = 0
+    for row in reader:
+        row_start, record_start = record_start, lines.offset
+        # DictReader skips blank lines, so they are not counted as rows
+        if not row:
+            continue
+        if index_path is not None and total_rows % ROW_INDEX_INTERVAL == 0:
+            offsets.append(row_start)
+        if writer:
+            writer.append(row)
+        if total_rows < PREVIEW_ROWS:
+            preview.append(row_to_dict(headers, row))
+        total_rows += 1
+        if on_progress and total_size and total_rows % PROGRESS_EVERY_ROWS == 0:
+            on_progress(lines.offset / total_size)
+
+    result = {
+        'type': 'csv',
+        'headers': headers,
+        'rows': total_rows,
+        'data': preview,
+        'total_rows': total_rows,
+        'sample_data': preview[:SAMPLE_ROWS]
+    }
+    if writer:
+        result['dataset_meta'] = writer.close()
+    if index_path is not None:
+        with open(index_path, 'wb') as index_file:
+            offsets.tofile(index_file)
+        result['row_index'] = {
+            'interval': ROW_INDEX_INTERVAL,
+            'delimiter': delimiter,
+            'encoding': encoding,
+        }
+    return result
+
+
+def parse_csv_path(file_path, on_progress=None, dataset_path=None, index_path=None):
+    """Parse the CSV file at ``file_path`` with parse_csv_stream"""
+    with open(file_path, 'rb') as stream:
+        return parse_csv_stream(
+            stream, total_size=os.path.getsize(file_path), on_progress=on_progress,
+            dataset_path=dataset_path, index_path=index_path
+        )
+
+
+def read_csv_rows(file_path, index_path, row_index, headers, offset, limit):
+    """Read ``limit`` data rows starting at row ``offset`` using the row index.
+
+    Costs one seek to the nearest indexed row before ``offset`` and parsing at
+    most ROW_INDEX_INTERVAL - 1 rows to skip, regardless of the file size.
+    """
+    interval = row_index['interval']
+    with open(index_path, 'rb') as index_file:
+        offsets = array('q')
+        offsets.frombytes(index_file.read())
+    block = offset // interval
+    if limit <= 0 or block >= len(offsets):
+        return []
+
+    with open(file_path, 'rb') as stream:
+        stream.seek(offsets[block])
+        lines = LineReader(stream, encoding=row_index['encoding'], offset=offsets[block])
+        reader = csv.reader(lines, delimiter=row_index['delimiter'])
+        skip = offset - block * interval
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            rows.append(row_to_dict(headers, row))
+            if len(rows) >= limit:
+                break
+        return rows
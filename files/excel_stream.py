@@ -0,0 +1,108 @@
+import datetime
+import os
+import zipfile
+from contextlib import contextmanager
+from openpyxl import load_workbook
+from .columnar import ColumnarWriter
+from .csv_stream import SAMPLE_ROWS, PROGRESS_EVERY_ROWS
+
+
+def _header_names(row):
+    """Column names from a header row, naming blanks the way pandas does"""
+    return [f'Unnamed: {i}' if value is None else str(value) for i, value in enumerate(row)]
+
+
+def _cell_value(value):
+    """A cell as stored in both the dataset and sample_data.
+
+    Dates become ISO 8601 strings and booleans the TRUE/FALSE Excel shows,
+    which also keeps them out of numeric columns.
+    """
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return value
+
+
+@contextmanager
+def open_workbook(file_path):
+    """Context manager giving ``[(name, rows, estimated_rows)]`` for every sheet.
+
+    .xlsx files are read with openpyxl in read-only mode, which streams each
+    sheet's XML, so rows are produced lazily and never held as a whole.
+    Legacy .xls files, which openpyxl can't open, go through pandas instead.
+    """
+    if not zipfile.is_zipfile(file_path):
+        import pandas as pd
+        frames = pd.read_excel(file_path, sheet_name=None, header=None)
+        yield [
+            (name, df.astype(object).where(df.notna(), None).itertuples(index=False, name=None), len(df))
+            for name, df in frames.items()
+        ]
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield [(sheet.title, sheet.iter_rows(values_only=True), sheet.max_row) for sheet in workbook.worksheets]
+    finally:
+        workbook.close()
+
+
+def parse_excel_path(file_path, on_progress=None, dataset_path=None):
+    """Parse every sheet of a workbook into per-sheet summaries.
+
+    The first non-empty row of a sheet is its header and blank rows are
+    skipped. Only SAMPLE_ROWS rows per sheet are kept in memory; when
+    ``dataset_path`` is given every row is written to a columnar dataset in
+    ``<dataset_path>/<sheet number>``. ``on_progress`` receives the
+    fraction of the workbook processed.
+    """
+    sheets = []
+    with open_workbook(file_path) as workbook:
+        for sheet_number, (name, rows, estimated_rows) in enumerate(workbook):
+            def sheet_progress(fraction, done=sheet_number, count=len(workbook)):
+                on_progress((done + fraction) / count)
+            
+            sheets.append(_parse_sheet(
+                sheet_number, name, rows, estimated_rows, dataset_path, sheet_progress if on_progress else None
+            ))
+    return sheets
+
+
+def _parse_sheet(sheet_number, name, rows, estimated_rows, dataset_path, on_progress):
+    headers = None
+    writer = None
+    sample_data = []
+    total_rows = 0
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        if headers is None:
+            headers = _header_names(row)
+            if dataset_path:
+                writer = ColumnarWriter(os.path.join(dataset_path, str(sheet_number)), headers)
+            continue
+        total_rows += 1
+        row = [_cell_value(value) for value in row]
+        if writer:
+            writer.append(row)
+        if len(sample_data) < SAMPLE_ROWS:
+            sample_data.append(dict(zip(headers, row)))
+        if on_progress and estimated_rows and total_rows % PROGRESS_EVERY_ROWS == 0:
+            on_progress(min(total_rows / estimated_rows, 1))
+
+    sheet = {
+        'name': name,
+        'headers': headers or [],
+        'rows': total_rows,
+        'sample_data': sample_data
+    }
+    if writer:
+        sheet['dataset_meta'] = writer.close()
+        sheet['dataset_path'] = os.path.join(dataset_path, str(sheet_number))
+    if on_progress:
+        on_progress(1)
+    return sheet
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import uuid
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from .artifacts import artifacts_dir
+from .csv_stream import parse_csv_stream
+
+
+def hash_upload(file_obj):
+    """sha256 of an uploaded file that went through the regular handlers"""
+    hasher = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        hasher.update(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest()
+
+
+class ChunkPipe:
+    """Read-only file object over byte chunks pushed from another thread.
+
+    The queue is bounded, so a producer that outruns the parser blocks
+    instead of buffering the whole upload in memory.
+    """
+
+    def __init__(self, max_chunks=64):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = b''
+        self._pos = 0
+        self._eof = False
+        self.abandoned = False
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        if not self.abandoned:
+            self._chunks.put(bytes(data))
+
+    def close_writer(self):
+        if not self.abandoned:
+            self._chunks.put(None)
+
+    def abandon(self):
+        """Called by the reader when it stops early, so writers never block on it"""
+        self.abandoned = True
+        while True:
+            try:
+                self._chunks.get_nowait()
+            except queue.Empty:
+                return
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._chunks.get()
+        if chunk is None:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def readline(self):
+        start = self._pos
+        while True:
+            newline = self._buffer.find(b'\n', start)
+            if newline >= 0:
+                line = self._buffer[self._pos:newline + 1]
+                self._pos = newline + 1
+                return line
+            start = len(self._buffer) - self._pos
+            if not self._fill():
+                line = self._buffer[self._pos:]
+                self._pos = len(self._buffer)
+                return line
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) - self._pos < size:
+            if not self._fill():
+                break
+        end = len(self._buffer) if size < 0 else min(len(self._buffer), self._pos + size)
+        data = self._buffer[self._pos:end]
+        self._pos = end
+        return data
+
+
+class CSVIngest:
+    """Parses a CSV on a helper thread while its bytes are still arriving.
+
+    Artifacts are written to a staging directory because the upload's final
+    path isn't known until it is saved; attach() moves them next to it.
+    """
+
+    def __init__(self):
+        self.staging_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial', f'{uuid.uuid4()}.parsed')
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.pipe = ChunkPipe()
+        self.result = None
+        self.error = None
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, name='csv-ingest', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.result = parse_csv_stream(
+                self.pipe,
+                dataset_path=os.path.join(self.staging_dir, 'dataset'),
+                index_path=os.path.join(self.staging_dir, 'rows.idx')
+            )
+        except Exception as e:
+            self.error = e
+            self.pipe.abandon()
+
+    def feed(self, data):
+        self.pipe.write(data)
+
+    def finish(self):
+        """Signal the end of the upload and wait for the parser to catch up"""
+        if not self._finished:
+            self._finished = True
+            self.pipe.close_writer()
+            self._thread.join()
+        return self.error is None
+
+    def attach(self, file_path):
+        """Move the staged artifacts next to the saved upload and return their directory"""
+        target = artifacts_dir(file_path)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(self.staging_dir, target)
+        return target
+
+    def discard(self):
+        self.finish()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+class IngestUploadHandler(FileUploadHandler):
+    """Upload handler that hashes the file and starts parsing it mid-transfer.
+
+    It sits in front of Django's default handlers and passes every chunk on
+    unchanged, so the file is still stored as usual. The outcome is left on
+    the request as ``upload_ingest``.
+
+    A file over ``max_size`` bytes is dropped as soon as that is known, from
+    its declared length or the bytes received so far, so nothing more of it
+    is stored or parsed; ``upload_too_large`` is then set on the request.
+    """
+
+    def __init__(self, request=None, parser_type_for=None, max_size=None):
+        super().__init__(request)
+        self.parser_type_for = parser_type_for
+        self.max_size = max_size
+        self.hasher = None
+        self.csv_ingest = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != 'file':
+            return
+        if self.max_size is not None and content_length is not None and content_length > self.max_size:
+            self.reject()
+        self.hasher = hashlib.sha256()
+        if self.parser_type_for and self.parser_type_for(content_type or '', file_name) == 'csv':
+            self.csv_ingest = CSVIngest()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.hasher is not None:
+            if self.max_size is not None and start + len(raw_data) > self.max_size:
+                self.reject()
+            self.hasher.update(raw_data)
+            if self.csv_ingest is not None:
+                self.csv_ingest.feed(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.hasher is not None:
+            self.request.upload_ingest = UploadIngest(self.hasher.hexdigest(), file_size, self.csv_ingest)
+            self.hasher = None
+            self.csv_ingest = None
+        return None
+
+    def reject(self):
+        """Stop the upload; the rest of the body is read and thrown away"""
+        if self.csv_ingest is not None:
+            self.csv_ingest.discard()
+        self.hasher = None
+        self.csv_ingest = None
+        self.request.upload_too_large = True
+        raise StopUpload()
+
+    def upload_interrupted(self):
+        if self.csv_ingest is not None:
+            self.csv_ingest.discard()
+
+
+class UploadIngest:
+    """What IngestUploadHandler learned about an uploaded file"""
+
+    def __init__(self, content_hash, size, csv_ingest=None):
+        self.content_hash = content_hash
+        self.size = size
+        self.csv_ingest = csv_ingest
@@ -0,0 +1,359 @@
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+from .benchmarks import environment, write_csv
+
+RESULTS_FORMAT = 1
+OPERATIONS = ('upload', 'progress', 'list')
+DEFAULT_MIX = {'upload': 1, 'progress': 6, 'list': 2}
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TERMINAL_STATUSES = {'completed', 'ready', 'failed'}
+PROGRESS_BATCH = 500
+PASSWORD = 'Load-test-password-1'
+
+
+class RequestFailed(Exception):
+    """A request the load test can't go on without, e.g. logging in"""
+
+
+def parse_mix(value):
+    """``'upload:1,progress:6,list:2'`` as a weights dict"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition(':')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation {name!r}; expected one of {", ".join(OPERATIONS)}')
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f'Negative weight for {name}')
+    if not any(mix.values()):
+        raise ValueError('At least one operation needs a positive weight')
+    return mix
+
+
+def csv_payload(rows):
+    """The narrow benchmark CSV with ``rows`` rows, as bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_csv(os.path.join(directory, 'payload.csv'), rows)
+        with open(path, 'rb') as csv_file:
+            return csv_file.read()
+
+
+def multipart_body(field, filename, content, content_type='text/csv'):
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        f'--{boundary}\r\n'.encode(),
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'.encode(),
+        f'Content-Type: {content_type}\r\n\r\n'.encode(),
+        content,
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+    """One keep-alive HTTP connection to the API, as one user would hold"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.secure = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+        self.connection = None
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, json_body=None, body=None, content_type=None):
+        """Send a request; returns ``(status, parsed JSON or None, seconds)``.
+
+        Connection errors come back as status 0 so they count as errors
+        instead of ending the run.
+        """
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            content_type = 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = self._connect()
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, None, time.perf_counter() - started
+        seconds = time.perf_counter() - started
+        try:
+            payload = json.loads(data) if data else None
+        except ValueError:
+            payload = None
+        return status, payload, seconds
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class LatencyStats:
+    """Latencies and outcomes of one operation; safe to record from many threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, seconds, status):
+        with self.lock:
+            self.samples.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if not 200 <= status < 400:
+                self.errors += 1
+
+    def summary(self, elapsed):
+        with self.lock:
+            samples = sorted(self.samples)
+            statuses = dict(self.statuses)
+            errors = self.errors
+        count = len(samples)
+        histogram = []
+        index = 0
+        for bound in LATENCY_BUCKETS:
+            while index < count and samples[index] <= bound:
+                index += 1
+            histogram.append({'le': bound, 'count': index})
+        histogram.append({'le': 'inf', 'count': count})
+        return {
+            'requests': count,
+            'errors': errors,
+            'error_rate': errors / count if count else 0,
+            'throughput': count / elapsed if elapsed else 0,
+            'statuses': {str(code): n for code, n in sorted(statuses.items())},
+            'p50': percentile(samples, 50),
+            'p95': percentile(samples, 95),
+            'p99': percentile(samples, 99),
+            'max': samples[-1] if samples else None,
+            'histogram': histogram,
+        }
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of sorted ``samples``"""
+    if not samples:
+        return None
+    rank = max(int(-(-p * len(samples) // 100)), 1)
+    return samples[rank - 1]
+
+
+class VirtualUser(threading.Thread):
+    """Registers its own account, then runs the operation mix until stopped"""
+
+    def __init__(self, load_test, number):
+        super().__init__(name=f'load-user-{number}', daemon=True)
+        self.load_test = load_test
+        self.client = Client(load_test.base_url, load_test.timeout)
+        self.random = random.Random(f'{load_test.seed}-{number}')
+        self.email = f'load-{load_test.run_id}-{number}@example.com'
+        self.username = f'load-{load_test.run_id}-{number}'
+        self.file_ids = []
+        self.uploads = 0
+        self.error = None
+
+    def sign_up(self):
+        status, payload, _ = self.client.request('POST', '/auth/register/', json_body={
+            'username': self.username, 'email': self.email,
+            'password': PASSWORD, 'password_confirm': PASSWORD,
+        })
+        if status != 201:
+            raise RequestFailed(f'Registering {self.email} failed with status {status}: {payload}')
+        self.client.token = payload['tokens']['access']
+
+    def log_in(self):
+        status, payload, _ = self.client.request(
+            'POST', '/auth/login/', json_body={'email': self.email, 'password': PASSWORD}
+        )
+        if status != 200:
+            raise RequestFailed(f'Logging in {self.email} failed with status {status}')
+        self.client.token = payload['tokens']['access']
+
+    def run(self):
+        try:
+            self.sign_up()
+            operations = list(self.load_test.mix)
+            weights = [self.load_test.mix[name] for name in operations]
+            while not self.load_test.stopping.is_set():
+                operation = self.random.choices(operations, weights)[0]
+                operation, status, seconds = self.perform(operation)
+                if status == 401:
+                    # The access token expired during a long run
+                    self.log_in()
+                if self.load_test.recording:
+                    self.load_test.stats[operation].record(seconds, status)
+                if self.load_test.think_time:
+                    self.load_test.stopping.wait(self.random.expovariate(1 / self.load_test.think_time))
+        except RequestFailed as e:
+            self.error = str(e)
+        finally:
+            self.client.close()
+
+    def perform(self, operation):
+        if operation == 'progress' and not self.file_ids:
+            # Nothing to poll yet; a real client would upload first
+            operation = 'upload'
+        if operation == 'upload':
+            # A unique last row keeps uploads from being deduplicated away
+            content = self.load_test.payload + f'{uuid.uuid4().int % 10 ** 9},0,{self.username},2020-01-01\n'.encode()
+            body, content_type = multipart_body('file', f'{self.username}-{self.uploads}.csv', content)
+            status, payload, seconds = self.client.request('POST', '/files/files/', body=body, content_type=content_type)
+            self.uploads += 1
+            if status == 201:
+                with self.load_test.lock:
+                    self.file_ids.append(payload['file_id'])
+            return operation, status, seconds
+        if operation == 'progress':
+            file_id = self.random.choice(self.file_ids)
+            status, _, seconds = self.client.request('GET', f'/files/files/{file_id}/progress/')
+            return operation, status, seconds
+        status, _, seconds = self.client.request('GET', '/files/files/list/')
+        return operation, status, seconds
+
+
+class BacklogSampler(threading.Thread):
+    """Counts uploaded files that are not processed yet, every ``interval`` seconds.
+
+    Polls the bulk progress endpoint with each user's token over its own
+    connections; these requests are not part of the measured mix.
+    """
+
+    def __init__(self, load_test, interval):
+        super().__init__(name='load-backlog', daemon=True)
+        self.load_test = load_test
+        self.interval = interval
+        self.timeline = []
+
+    def run(self):
+        started = time.monotonic()
+        while not self.load_test.stopping.wait(self.interval):
+            self.timeline.append(self.sample(time.monotonic() - started))
+
+    def sample(self, elapsed):
+        counts = {}
+        for user in self.load_test.users:
+            with self.load_test.lock:
+                file_ids = list(user.file_ids)
+            if not file_ids or not user.client.token:
+                continue
+            client = Client(self.load_test.base_url, self.load_test.timeout)
+            client.token = user.client.token
+            try:
+                for start in range(0, len(file_ids), PROGRESS_BATCH):
+                    status, payload, _ = client.request(
+                        'POST', '/files/files/progress/', json_body={'file_ids': file_ids[start:start + PROGRESS_BATCH]}
+                    )
+                    if status != 200:
+                        counts['unknown'] = counts.get('unknown', 0) + len(file_ids[start:start + PROGRESS_BATCH])
+                        continue
+                    for progress in payload['files']:
+                        counts[progress['status']] = counts.get(progress['status'], 0) + 1
+            finally:
+                client.close()
+        return {
+            'seconds': round(elapsed, 3),
+            'backlog': sum(n for name, n in counts.items() if name not in TERMINAL_STATUSES),
+            'statuses': counts,
+        }
+
+
+class LoadTest:
+    """Runs ``users`` virtual users against a live server for one stage.
+
+    ``warmup`` seconds run before measuring starts, so sign-ups and the
+    first uploads don't skew the latencies.
+    """
+
+    def __init__(self, base_url, users, duration, mix=None, payload=b'', warmup=0.0,
+                 think_time=0.0, timeout=30, sample_interval=1.0, seed=0):
+        self.base_url = base_url
+        self.user_count = users
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.payload = payload
+        self.warmup = warmup
+        self.think_time = think_time
+        self.timeout = timeout
+        self.sample_interval = sample_interval
+        self.seed = seed
+        self.run_id = uuid.uuid4().hex[:8]
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.recording = False
+        self.stats = {name: LatencyStats() for name in OPERATIONS}
+        self.users = []
+
+    def run(self):
+        self.users = [VirtualUser(self, number) for number in range(self.user_count)]
+        sampler = BacklogSampler(self, self.sample_interval)
+        for user in self.users:
+            user.start()
+        sampler.start()
+        time.sleep(self.warmup)
+        self.recording = True
+        started = time.monotonic()
+        time.sleep(self.duration)
+        self.recording = False
+        elapsed = time.monotonic() - started
+        self.stopping.set()
+        for user in self.users:
+            user.join(self.timeout)
+        sampler.join(self.timeout)
+
+        operations = {name: stats.summary(elapsed) for name, stats in self.stats.items() if stats.samples}
+        requests = sum(summary['requests'] for summary in operations.values())
+        errors = sum(summary['errors'] for summary in operations.values())
+        return {
+            'users': self.user_count,
+            'seconds': elapsed,
+            'requests': requests,
+            'throughput': requests / elapsed if elapsed else 0,
+            'error_rate': errors / requests if requests else 0,
+            'operations': operations,
+            'backlog': sampler.timeline,
+            'user_errors': [user.error for user in self.users if user.error],
+        }
+
+
+def run(base_url, user_steps, duration, **options):
+    """Run a stage per number of users in ``user_steps`` and return the results document.
+
+    The saturation point is the stage with the highest throughput: past it,
+    more users only add latency.
+    """
+    started = {**environment(), 'base_url': base_url}
+    stages = [LoadTest(base_url, users, duration, **options).run() for users in user_steps]
+    peak = max(stages, key=lambda stage: stage['throughput'])
+    return {
+        'format': RESULTS_FORMAT,
+        'environment': started,
+        'stages': stages,
+        'saturation': {'users': peak['users'], 'throughput': peak['throughput']},
+    }
@@ -0,0 +1,63 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from files import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time the file parsers on synthetic corpora and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(benchmarks.SIZES), default=['small'],
+            help='Corpus sizes to run'
+        )
+        parser.add_argument(
+            '--corpora', nargs='+', choices=list(benchmarks.CORPORA), default=list(benchmarks.CORPORA),
+            help='Corpora to run'
+        )
+        parser.add_argument(
+            '--csv-engines', nargs='+', choices=['python', 'pandas'], default=['python', 'pandas'],
+            help='CSV engines to run the CSV corpora with'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case; the fastest is reported')
+        parser.add_argument(
+            '--corpus-dir', default=os.path.join(settings.BASE_DIR, 'benchmark_corpora'),
+            help='Where generated corpora are kept between runs'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Compare against results written by an earlier run')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='With --compare, fail if a case got this much slower (0.1 is 10%%)'
+        )
+        parser.add_argument('--no-tracemalloc', action='store_true', help='Skip the tracemalloc run')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = benchmarks.load(options['compare']) if options['compare'] else None
+
+        results = benchmarks.run(
+            options['corpus_dir'], options['corpora'], options['sizes'], options['csv_engines'],
+            repeat=options['repeat'], trace=not options['no_tracemalloc']
+        )
+        for result in results['results']:
+            self.stdout.write(
+                f"{result['case']:<28} {result['seconds']:8.3f}s {result['rows_per_second']:12,.0f} rows/s "
+                f"{result['mb_per_second']:8.2f} MB/s  peak RSS {result['peak_rss_bytes'] / 1e6:8.1f} MB"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+
+        if baseline is None:
+            return
+        rows, regressions = benchmarks.compare(baseline, results, options['threshold'])
+        self.stdout.write(f"\nCompared with {baseline['environment'].get('commit') or options['compare']}:")
+        for case, before, after, change in rows:
+            self.stdout.write(f'{case:<28} {before:8.3f}s -> {after:8.3f}s {change:+8.1%}')
+        if regressions:
+            raise CommandError(f"{len(regressions)} cases got slower: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from files.chunked import expire_upload_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that stopped receiving chunks, and their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=settings.UPLOAD_SESSION_EXPIRY_HOURS,
+            help='Idle time after which an unfinished upload is deleted'
+        )
+
+    def handle(self, *args, **options):
+        if options['hours'] <= 0:
+            raise CommandError('--hours must be positive')
+        sessions, files = expire_upload_sessions(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {sessions} expired upload sessions and {files} orphaned partial files'
+        ))
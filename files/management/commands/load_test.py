@@ -0,0 +1,71 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from files import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Drive a running server with concurrent users and report latency, throughput and backlog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000/api',
+            help='API root of the server under test'
+        )
+        parser.add_argument(
+            '--users', type=int, nargs='+', default=[10],
+            help='Concurrent users; several values run one stage each, e.g. 1 5 10 20 to find saturation'
+        )
+        parser.add_argument('--duration', type=float, default=30, help='Measured seconds per stage')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before each stage')
+        parser.add_argument(
+            '--mix', default='upload:1,progress:6,list:2',
+            help='Relative weights of the operations: upload, progress and list'
+        )
+        parser.add_argument('--think-time', type=float, default=0, help="Mean pause between a user's requests")
+        parser.add_argument('--upload-rows', type=int, default=1000, help='Rows in each uploaded CSV')
+        parser.add_argument('--sample-interval', type=float, default=1, help='Seconds between backlog samples')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the operation sequence')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if min(options['users']) < 1:
+            raise CommandError('--users must be at least 1')
+
+        results = loadtest.run(
+            options['base_url'], options['users'], options['duration'], mix=mix,
+            payload=loadtest.csv_payload(options['upload_rows']), warmup=options['warmup'],
+            think_time=options['think_time'], timeout=options['timeout'],
+            sample_interval=options['sample_interval'], seed=options['seed']
+        )
+        for stage in results['stages']:
+            self.write_stage(stage)
+        saturation = results['saturation']
+        self.stdout.write(
+            f"\nPeak throughput {saturation['throughput']:.1f} req/s at {saturation['users']} users"
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+
+    def write_stage(self, stage):
+        self.stdout.write(
+            f"\n{stage['users']} users: {stage['throughput']:.1f} req/s, "
+            f"{stage['error_rate']:.1%} errors over {stage['seconds']:.0f}s"
+        )
+        for error in stage['user_errors']:
+            self.stdout.write(self.style.ERROR(error))
+        for name, summary in stage['operations'].items():
+            p50, p95, p99 = (summary[p] * 1000 for p in ('p50', 'p95', 'p99'))
+            self.stdout.write(
+                f"  {name:<9} {summary['requests']:7} req {summary['throughput']:8.1f}/s  "
+                f"p50 {p50:7.1f}ms p95 {p95:7.1f}ms p99 {p99:7.1f}ms  "
+                f"errors {summary['error_rate']:6.1%}  {summary['statuses']}"
+            )
+        if stage['backlog']:
+            backlog = ', '.join(f"{sample['seconds']:.0f}s: {sample['backlog']}" for sample in stage['backlog'])
+            self.stdout.write(f'  backlog  {backlog}')
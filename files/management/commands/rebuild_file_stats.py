@@ -0,0 +1,63 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from files.models import FileUpload, UserFileStats
+
+FIELDS = ('file_count', 'total_bytes', 'timed_count', 'processing_seconds')
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user file statistics from FileUpload'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report buckets that differ from the stored ones; exit with an error if any do'
+        )
+
+    def compute(self):
+        buckets = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+        rows = FileUpload.objects.values(
+            'user_id', 'status', 'mime_type', 'file_size', 'processing_started_at', 'processed_at'
+        )
+        for row in rows.iterator():
+            bucket = buckets[(row['user_id'], row['status'], row['mime_type'])]
+            bucket['file_count'] += 1
+            bucket['total_bytes'] += row['file_size']
+            seconds = UserFileStats.processing_time(row)
+            if seconds is not None:
+                bucket['timed_count'] += 1
+                bucket['processing_seconds'] += seconds
+        return buckets
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the stats so concurrent updates can't slip in between read and write
+            stored = {
+                (s.user_id, s.status, s.mime_type): {field: getattr(s, field) for field in FIELDS}
+                for s in UserFileStats.objects.select_for_update()
+            }
+            expected = self.compute()
+
+            differences = 0
+            for key in sorted(set(stored) | set(expected), key=str):
+                current = stored.get(key, dict.fromkeys(FIELDS, 0))
+                fresh = expected.get(key, dict.fromkeys(FIELDS, 0))
+                if any(abs(current[field] - fresh[field]) > 1e-6 for field in FIELDS):
+                    differences += 1
+                    self.stdout.write(f'{key}: stored {current}, expected {fresh}')
+
+            if options['check']:
+                if differences:
+                    raise CommandError(f'{differences} stats buckets are out of date')
+                self.stdout.write(self.style.SUCCESS('File stats are consistent'))
+                return
+
+            UserFileStats.objects.all().delete()
+            UserFileStats.objects.bulk_create([
+                UserFileStats(user_id=user_id, status=status, mime_type=mime_type, **values)
+                for (user_id, status, mime_type), values in expected.items()
+            ])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(expected)} stats buckets ({differences} were out of date)'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from files.models import FileUpload
+from files import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from all ready files'
+
+    def handle(self, *args, **options):
+        indexed = 0
+        files = FileUpload.objects.filter(status='ready').values_list(
+            'id', 'user_id', 'original_name', 'parsed_content'
+        )
+        for file_id, user_id, original_name, parsed_content in files.iterator():
+            try:
+                search.index_file(file_id, user_id, original_name, parsed_content)
+                indexed += 1
+            except Exception as e:
+                self.stderr.write(f'Could not index {file_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} files'))
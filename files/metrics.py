@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds in seconds of the stage duration buckets
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+# (upper bound in bytes, label) of the file size buckets; bigger files are '>=100MB'
+SIZE_BUCKETS = (
+    (1024 * 1024, '<1MB'),
+    (10 * 1024 * 1024, '1-10MB'),
+    (100 * 1024 * 1024, '10-100MB'),
+)
+
+
+def size_bucket(file_size):
+    for bound, label in SIZE_BUCKETS:
+        if file_size < bound:
+            return label
+    return '>=100MB'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            # Unlabelled counters and gauges start at zero rather than missing
+            values = [((), 0)]
+        lines = self.header()
+        for key, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative buckets plus sum and count, as Prometheus histograms are exposed"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                labels = _labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    """The metrics of this process. ``collectors`` run before each render to refresh gauges."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'file_processing_stage_seconds', 'Time spent in each stage of processing a file',
+    ['stage', 'file_type', 'size_bucket']
+))
+PROCESSED_FILES = REGISTRY.register(Counter(
+    'file_processing_files_total', 'Files processed, by outcome', ['file_type', 'size_bucket', 'outcome']
+))
+FAILURES = REGISTRY.register(Counter(
+    'file_processing_failures_total', 'Files that failed, by the stage they failed in', ['file_type', 'stage']
+))
+IN_FLIGHT = REGISTRY.register(Gauge('file_processing_in_flight', 'Files being processed right now'))
+QUEUE_DEPTH = REGISTRY.register(Gauge('file_processing_queue_depth', 'Files waiting for a free worker'))
+WORKERS_ACTIVE = REGISTRY.register(Gauge('file_processing_workers_active', 'Worker threads running a job'))
+
+
+def _collect_pool():
+    from .workers import get_worker_pool
+    stats = get_worker_pool().stats()
+    QUEUE_DEPTH.set(stats['queued'])
+    WORKERS_ACTIVE.set(stats['active'])
+
+
+REGISTRY.collectors.append(_collect_pool)
+
+
+class StageTimer:
+    """Seconds spent in each stage of one job.
+
+    Stages may nest; time in an inner stage counts only towards it, so the
+    stages of a job add up to its total time. ``failed_stage`` is the
+    innermost stage an exception escaped from.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.failed_stage = None
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        self._nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if self.failed_stage is None:
+                self.failed_stage = name
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._nested.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + max(elapsed - nested, 0.0)
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def add(self, stages):
+        """Count stage times measured elsewhere, e.g. in a parser process, as nested here"""
+        for name, seconds in stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            if self._nested:
+                self._nested[-1] += seconds
+
+    def rounded(self):
+        """Stage times rounded to the millisecond, with their total, as stored on FileUpload"""
+        timings = {name: round(seconds, 3) for name, seconds in self.stages.items()}
+        timings['total'] = round(sum(self.stages.values()), 3)
+        return timings
+
+
+_local = threading.local()
+
+
+@contextmanager
+def timing_stages():
+    """Collect the stages run in this thread into a new StageTimer"""
+    outer = getattr(_local, 'timer', None)
+    _local.timer = timer = StageTimer()
+    try:
+        yield timer
+    finally:
+        _local.timer = outer
+
+
+def current_timer():
+    return getattr(_local, 'timer', None)
+
+
+def stage(name):
+    """Time a block as stage ``name`` of this thread's job; a no-op outside of one"""
+    timer = current_timer()
+    return timer.stage(name) if timer else nullcontext()
+
+
+def record_job(timer, file_type, file_size, outcome):
+    """Feed one finished job's stage times into the metrics"""
+    bucket = size_bucket(file_size)
+    for name, seconds in timer.stages.items():
+        STAGE_SECONDS.observe(seconds, stage=name, file_type=file_type, size_bucket=bucket)
+    PROCESSED_FILES.inc(file_type=file_type, size_bucket=bucket, outcome=outcome)
@@ -1,12 +1,33 @@
 import uuid
 import os
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.core.cache import cache
+from . import search
+from .artifacts import remove_artifacts, remove_parse_lock
+from .result_cache import get_result_cache
 
 User = get_user_model()
 
 
+class UploadBatch(models.Model):
+    """Files uploaded together in one batch request"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_batches')
+    file_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch {self.id} ({self.file_count} files)"
+
+
 class FileUpload(models.Model):
     STATUS_CHOICES = [
         ('uploading', 'Uploading'),
@@ -22,29 +43,307 @@ class FileUpload(models.Model):
     file = models.FileField(upload_to='uploads/')
     file_size = models.BigIntegerField()
     mime_type = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    batch = models.ForeignKey(
+        UploadBatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='files'
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
     progress = models.IntegerField(default=0)
     parsed_content = models.JSONField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)
     processing_started_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Seconds spent in each processing stage, e.g. {'parse': 1.2, ..., 'total': 1.5}
+    stage_timings = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the keyset-paginated file list
+            models.Index(fields=['user', '-created_at', '-id'], name='files_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.original_name} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                UserFileStats.add(self.user_id, self.status, self.mime_type, 1, self.file_size)
+    
     def delete(self, *args, **kwargs):
-        # Delete the file from filesystem when deleting the record
-        if self.file:
+        # Delete the file from filesystem when no other upload shares it
+        if self.file and FileBlob.release(self.content_hash, self.file.name):
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
-        super().delete(*args, **kwargs)
+            remove_artifacts(self.file.path)
+            remove_parse_lock(self.file.path)
+            self.recount_cached_results()
+        file_id = self.id
+        result = super().delete(*args, **kwargs)
+        # Only once the row is gone for good; if this fails, the stale entry
+        # is skipped by the search view
+        transaction.on_commit(lambda: remove_from_search(file_id))
+        return result
+    
+    def recount_cached_results(self):
+        # Cached artifacts that were linked with this file's now count as the cache's own
+        result_cache = get_result_cache() if self.content_hash else None
+        if result_cache:
+            try:
+                result_cache.recount(self.content_hash)
+            except OSError as e:
+                print(f"Error updating parse cache sizes: {e}")
     
     @property
     def file_url(self):
         if self.file:
             return f"{settings.MEDIA_URL}{self.file.name}"
-        return None
\ No newline at end of file
+        return None
+
+
+def remove_from_search(file_id):
+    try:
+        search.remove_file(file_id)
+    except Exception as e:
+        print(f"Error removing file {file_id} from the search index: {e}")
+
+
+@receiver(pre_delete, sender=FileUpload)
+def remove_from_stats(sender, instance, **kwargs):
+    # Runs inside the delete's transaction, also for queryset deletes. The row
+    # is re-read because status may have been updated since it was loaded.
+    row = FileUpload.objects.filter(pk=instance.pk).values(
+        'user_id', 'status', 'mime_type', 'file_size', 'processing_started_at', 'processed_at'
+    ).first()
+    if row:
+        UserFileStats.remove_file(row)
+    # After the commit, so a progress lookup in between can't cache the row again
+    file_id = str(instance.pk)
+    transaction.on_commit(lambda: forget_cached_progress(file_id))
+
+
+def forget_cached_progress(file_id):
+    from .progress import owner_cache_key, progress_cache_key
+    cache.delete_many([progress_cache_key(file_id), owner_cache_key(file_id)])
+
+
+class UserFileStats(models.Model):
+    """Running totals of one user's files with a given status and MIME type.
+
+    Rows are adjusted in the same transaction as the upload, status change
+    or delete they reflect, so reading a user's stats is a scan of a
+    handful of rows instead of an aggregate over their files. The
+    rebuild_file_stats command recomputes them from FileUpload.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='file_stats')
+    status = models.CharField(max_length=20)
+    mime_type = models.CharField(max_length=100)
+    file_count = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    # Files counted in processing_seconds (ready files with both timestamps)
+    timed_count = models.BigIntegerField(default=0)
+    processing_seconds = models.FloatField(default=0)
+    
+    class Meta:
+        unique_together = [('user', 'status', 'mime_type')]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.status} {self.mime_type}: {self.file_count} files"
+    
+    @classmethod
+    def add(cls, user_id, status, mime_type, files, size, timed=0, seconds=0.0):
+        """Add (or with negative numbers, subtract) files from a bucket"""
+        changes = dict(
+            file_count=F('file_count') + files,
+            total_bytes=F('total_bytes') + size,
+            timed_count=F('timed_count') + timed,
+            processing_seconds=F('processing_seconds') + seconds
+        )
+        bucket = cls.objects.filter(user_id=user_id, status=status, mime_type=mime_type)
+        if bucket.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    user_id=user_id, status=status, mime_type=mime_type, file_count=files,
+                    total_bytes=size, timed_count=timed, processing_seconds=seconds
+                )
+        except IntegrityError:
+            # Created concurrently; it exists now
+            bucket.update(**changes)
+    
+    @staticmethod
+    def processing_time(row):
+        """Seconds a ready file took to process, or None if it can't be told"""
+        if row['status'] != 'ready' or not row['processing_started_at'] or not row['processed_at']:
+            return None
+        return (row['processed_at'] - row['processing_started_at']).total_seconds()
+    
+    @classmethod
+    def remove_file(cls, row):
+        seconds = cls.processing_time(row)
+        cls.add(
+            row['user_id'], row['status'], row['mime_type'], -1, -row['file_size'],
+            -1 if seconds is not None else 0, -(seconds or 0.0)
+        )
+    
+    @classmethod
+    def add_file(cls, row):
+        seconds = cls.processing_time(row)
+        cls.add(
+            row['user_id'], row['status'], row['mime_type'], 1, row['file_size'],
+            1 if seconds is not None else 0, seconds or 0.0
+        )
+    
+    @classmethod
+    def summary(cls, user):
+        """Totals across a user's buckets, as returned by the stats endpoint"""
+        stats = {
+            'file_count': 0,
+            'total_bytes': 0,
+            'files_by_status': {},
+            'bytes_by_status': {},
+            'bytes_by_mime_type': {},
+            'average_processing_seconds': None
+        }
+        timed_count = 0
+        processing_seconds = 0.0
+        for bucket in cls.objects.filter(user=user):
+            if not bucket.file_count:
+                continue
+            stats['file_count'] += bucket.file_count
+            stats['total_bytes'] += bucket.total_bytes
+            stats['files_by_status'][bucket.status] = (
+                stats['files_by_status'].get(bucket.status, 0) + bucket.file_count
+            )
+            stats['bytes_by_status'][bucket.status] = (
+                stats['bytes_by_status'].get(bucket.status, 0) + bucket.total_bytes
+            )
+            stats['bytes_by_mime_type'][bucket.mime_type] = (
+                stats['bytes_by_mime_type'].get(bucket.mime_type, 0) + bucket.total_bytes
+            )
+            timed_count += bucket.timed_count
+            processing_seconds += bucket.processing_seconds
+        if timed_count:
+            stats['average_processing_seconds'] = processing_seconds / timed_count
+        return stats
+
+
+class FileBlob(models.Model):
+    """Stored content shared by every upload with the same hash.
+
+    ``ref_count`` is the number of FileUpload rows pointing at ``file``; the
+    file and its parse artifacts are removed when the last one is deleted.
+    """
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to='uploads/')
+    file_size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.ref_count} refs)"
+    
+    @classmethod
+    def acquire(cls, content_hash):
+        """Take a reference to stored content; returns its storage name or None"""
+        if not content_hash:
+            return None
+        with transaction.atomic():
+            if not cls.objects.filter(content_hash=content_hash).update(ref_count=F('ref_count') + 1):
+                return None
+            return cls.objects.values_list('file', flat=True).get(content_hash=content_hash)
+    
+    @classmethod
+    def register(cls, content_hash, name, file_size):
+        """Record ``name`` as the stored copy of its content.
+
+        Returns False if another upload registered the same content first, in
+        which case ``name`` stays a private copy.
+        """
+        if not content_hash:
+            return False
+        try:
+            with transaction.atomic():
+                cls.objects.create(content_hash=content_hash, file=name, file_size=file_size)
+        except IntegrityError:
+            return False
+        return True
+    
+    @classmethod
+    def release(cls, content_hash, name):
+        """Drop a reference to ``name``; True when nothing references it any more"""
+        if not content_hash:
+            return True
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(content_hash=content_hash, file=name).first()
+            if blob is None:
+                # Not shared storage
+                return True
+            if blob.ref_count > 1:
+                cls.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return False
+            blob.delete()
+            return True
+
+
+class UploadSession(models.Model):
+    """A resumable upload assembled from chunks sent in any order"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completing', 'Completing'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    file_size = models.BigIntegerField()
+    mime_type = models.CharField(max_length=100)
+    chunk_size = models.IntegerField()
+    total_chunks = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    file_upload = models.OneToOneField(
+        FileUpload, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+    
+    @property
+    def partial_path(self):
+        """Preallocated file the chunks are written into"""
+        return os.path.join(self.partial_dir(), f'{self.id}.part')
+    
+    @staticmethod
+    def partial_dir():
+        return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial')
+    
+    def chunk_length(self, index):
+        """Expected byte length of chunk ``index``; only the last one may be short"""
+        if index == self.total_chunks - 1:
+            return self.file_size - index * self.chunk_size
+        return self.chunk_size
+
+
+class UploadChunk(models.Model):
+    """A chunk of an UploadSession that has been written to disk"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    size = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['index']
+        unique_together = [('session', 'index')]
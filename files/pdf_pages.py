@@ -0,0 +1,95 @@
+import os
+import uuid
+from concurrent.futures import as_completed
+from PyPDF2 import PdfReader
+
+# Pages handed to one worker process at a time
+PAGES_PER_TASK = 8
+
+
+def page_path(pages_dir, page_number):
+    """Text file holding one extracted page; pages are numbered from 1"""
+    return os.path.join(pages_dir, f'{page_number}.txt')
+
+
+def write_page(pages_dir, page_number, text):
+    # Written under a temporary name and renamed, so readers never see half a
+    # page; the name is unique because on-demand and background extraction
+    # may write the same page at once
+    path = page_path(pages_dir, page_number)
+    staging = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(staging, 'w', encoding='utf-8') as page_file:
+        page_file.write(text)
+    os.replace(staging, path)
+
+
+def read_page(pages_dir, page_number):
+    """Text of an extracted page, or None if it hasn't been extracted yet"""
+    try:
+        with open(page_path(pages_dir, page_number), 'r', encoding='utf-8') as page_file:
+            return page_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def extract_page(file_path, page_number, pages_dir):
+    """Extract one page on demand and store it the way extract_pages does.
+
+    Raises IndexError if the document has no such page.
+    """
+    reader = PdfReader(file_path)
+    if not 1 <= page_number <= len(reader.pages):
+        raise IndexError(f'Page {page_number} is out of range (1-{len(reader.pages)})')
+    text = reader.pages[page_number - 1].extract_text() or ''
+    os.makedirs(pages_dir, exist_ok=True)
+    write_page(pages_dir, page_number, text)
+    return text
+
+
+def extract_page_range(file_path, start, stop, pages_dir):
+    """Extract pages ``start``..``stop - 1`` (0-based) into ``pages_dir``.
+
+    Each page is written as soon as it is extracted. Returns
+    ``[(page_number, word_count, character_count)]``.
+    """
+    reader = PdfReader(file_path)
+    stats = []
+    for index in range(start, stop):
+        text = reader.pages[index].extract_text() or ''
+        write_page(pages_dir, index + 1, text)
+        stats.append((index + 1, len(text.split()), len(text)))
+    return stats
+
+
+def extract_pages(file_path, pages_dir, executor=None, on_progress=None):
+    """Extract every page of a PDF into ``pages_dir``, one text file per page.
+
+    With an ``executor`` the document is split into PAGES_PER_TASK page
+    ranges that are extracted in parallel; otherwise ranges run one after
+    another in this thread. ``on_progress`` receives the fraction of pages
+    done as ranges complete. Returns per-page stats in page order.
+    """
+    os.makedirs(pages_dir, exist_ok=True)
+    total_pages = len(PdfReader(file_path).pages)
+    ranges = [(start, min(start + PAGES_PER_TASK, total_pages)) for start in range(0, total_pages, PAGES_PER_TASK)]
+    stats = []
+
+    if executor is None:
+        for start, stop in ranges:
+            stats.extend(extract_page_range(file_path, start, stop, pages_dir))
+            if on_progress:
+                on_progress(len(stats) / total_pages)
+        return stats
+
+    futures = [executor.submit(extract_page_range, file_path, start, stop, pages_dir) for start, stop in ranges]
+    try:
+        for future in as_completed(futures):
+            stats.extend(future.result())
+            if on_progress:
+                on_progress(len(stats) / total_pages)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    stats.sort()
+    return stats
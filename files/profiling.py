@@ -0,0 +1,179 @@
+import math
+import numpy as np
+import pandas as pd
+from .columnar import CHUNK_ROWS
+
+# 2 ** 12 registers: about 1.6% standard error in 4 KB per column
+HLL_PRECISION = 12
+TOP_VALUES = 5
+# Distinct values tracked per column for top values; rarer ones are dropped
+TOP_VALUES_CAPACITY = 1000
+BOOLEAN_VALUES = {'true', 'false', 'yes', 'no'}
+ISO_DATETIME = r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$'
+
+
+class HyperLogLog:
+    """Distinct count estimate from 64-bit hashes, in 2 ** precision registers"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        if not len(hashes):
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # frexp's exponent is the bit length; rest < 2 ** 52 so the float is exact
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        np.maximum.at(self.registers, index, (width - bit_length + 1).astype(np.uint8))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / empty)))
+        return int(round(raw))
+
+
+def _python_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _finite(value):
+    """``value``, or None when it is infinite; profiles are stored as JSON, which has no infinities"""
+    return value if value is None or math.isfinite(value) else None
+
+
+class ColumnProfiler:
+    """Accumulates statistics for one column, one chunk of values at a time"""
+
+    def __init__(self, name, column_type):
+        self.name = name
+        self.column_type = column_type
+        self.count = 0
+        self.null_count = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.infinite_count = 0
+        self.sketch = HyperLogLog()
+        self.top = {}
+        # String columns stay candidates for these types until a value disagrees
+        self.boolean = self.datetime = column_type == 'string'
+
+    def add_numbers(self, values):
+        if self.column_type == 'float64':
+            nulls = np.isnan(values)
+            self.null_count += int(np.count_nonzero(nulls))
+            values = values[~nulls]
+            # Infinities count as values but are left out of the statistics
+            infinite = np.isinf(values)
+            self.infinite_count += int(np.count_nonzero(infinite))
+            self.count += int(np.count_nonzero(infinite))
+            values = values[~infinite]
+        self._add_valid(pd.Series(values))
+        if len(values):
+            self._extend(values.min(), values.max())
+            self.total += float(values.sum(dtype=np.float64))
+
+    def add_strings(self, values):
+        series = pd.Series(values, dtype=object)
+        # Blank cells are as good as missing in a table
+        nulls = series.isna() | (series == '')
+        self.null_count += int(nulls.sum())
+        series = series[~nulls]
+        self._add_valid(series)
+        if not len(series):
+            return
+        if self.boolean:
+            self.boolean = bool(series.str.lower().isin(BOOLEAN_VALUES).all())
+        if self.datetime:
+            self.datetime = bool(series.str.match(ISO_DATETIME).all())
+        if self.datetime:
+            dates = pd.to_datetime(series, format='ISO8601', errors='coerce')
+            if dates.isna().any():
+                self.datetime = False
+            else:
+                self._extend(dates.min(), dates.max())
+
+    def _add_valid(self, series):
+        self.count += len(series)
+        self.sketch.add_hashes(pd.util.hash_array(series.to_numpy()))
+        # Only each chunk's most common values are merged, which keeps this
+        # cheap for unique columns; counts of rare values may run low
+        for value, count in series.value_counts().head(TOP_VALUES_CAPACITY).items():
+            value = _python_value(value)
+            self.top[value] = self.top.get(value, 0) + int(count)
+        if len(self.top) > TOP_VALUES_CAPACITY:
+            kept = sorted(self.top.items(), key=lambda item: -item[1])[:TOP_VALUES_CAPACITY]
+            self.top = dict(kept)
+
+    def _extend(self, low, high):
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def inferred_type(self):
+        if not self.count:
+            return 'empty'
+        if self.column_type == 'int64':
+            return 'integer'
+        if self.column_type == 'float64':
+            return 'float'
+        if self.boolean:
+            return 'boolean'
+        if self.datetime:
+            return 'datetime'
+        return 'string'
+
+    def result(self):
+        inferred_type = self.inferred_type()
+        profile = {
+            'name': self.name,
+            'type': inferred_type,
+            'count': self.count,
+            'null_count': self.null_count,
+            'distinct_estimate': min(self.sketch.estimate(), self.count),
+            'top_values': [
+                {'value': value, 'count': count}
+                for value, count in sorted(self.top.items(), key=lambda item: -item[1])[:TOP_VALUES]
+            ]
+        }
+        if inferred_type in ('integer', 'float'):
+            finite_count = self.count - self.infinite_count
+            profile['min'] = _python_value(self.minimum)
+            profile['max'] = _python_value(self.maximum)
+            # The sum of huge values can overflow
+            profile['mean'] = _finite(self.total / finite_count) if finite_count else None
+        elif inferred_type == 'datetime':
+            profile['min'] = self.minimum.isoformat()
+            profile['max'] = self.maximum.isoformat()
+        return profile
+
+
+def profile_dataset(dataset, chunk_rows=CHUNK_ROWS):
+    """Per-column statistics of a ColumnarDataset, in header order.
+
+    Columns are read ``chunk_rows`` at a time straight from the dataset's
+    memory-mapped files: numeric columns as NumPy arrays, text columns from
+    one read per chunk. Each column gets its inferred type, non-null and null
+    counts, a HyperLogLog distinct estimate, its most common values and, for
+    numbers and dates, min/max (and mean for numbers).
+    """
+    profiles = []
+    for index, spec in enumerate(dataset.meta['columns']):
+        profiler = ColumnProfiler(spec['name'], spec['type'])
+        column = dataset.column(index)
+        for start in range(0, dataset.num_rows, chunk_rows):
+            stop = min(start + chunk_rows, dataset.num_rows)
+            if spec['type'] == 'string':
+                profiler.add_strings(column.values(start, stop))
+            else:
+                profiler.add_numbers(np.asarray(column[start:stop]))
+        profiles.append(profiler.result())
+    return profiles
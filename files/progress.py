@@ -0,0 +1,277 @@
+import asyncio
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.db import transaction
+from .metrics import stage
+from .models import FileUpload, UserFileStats
+
+PROGRESS_CACHE_TIMEOUT = 3600
+# A file's owner never changes, so it can be cached for much longer
+OWNER_CACHE_TIMEOUT = 86400
+FINAL_STATUSES = ('ready', 'failed')
+
+
+def progress_cache_key(file_id):
+    return f'file_progress_{file_id}'
+
+
+def owner_cache_key(file_id):
+    return f'file_owner_{file_id}'
+
+
+def write_progress(file_id, status, progress, error_message=None, **fields):
+    """Write status and progress to the cache and the database right away.
+
+    Only the named columns are updated, so the parsed_content JSON is never
+    rewritten just to move a progress bar. Extra model ``fields`` can be
+    written in the same UPDATE. Only a status change also moves the file
+    between UserFileStats buckets, under a row lock.
+    """
+    progress_data = {
+        'status': status,
+        'progress': progress
+    }
+    if error_message:
+        progress_data['error'] = error_message
+    with stage('cache_write'):
+        cache.set(progress_cache_key(file_id), progress_data, timeout=PROGRESS_CACHE_TIMEOUT)
+
+    fields.update(status=status, progress=progress, updated_at=timezone.now())
+    if error_message:
+        fields['error_message'] = error_message
+    with stage('db_save'):
+        # Most writes are progress flushes within a status, which take a
+        # single UPDATE; when no row matched the status it is changing
+        if not FileUpload.objects.filter(id=file_id, status=status).update(**fields):
+            with transaction.atomic():
+                _move_stats(file_id, status, fields)
+                FileUpload.objects.filter(id=file_id).update(**fields)
+    progress_hub.publish(file_id, progress_data)
+
+
+def _move_stats(file_id, status, fields):
+    """Move a file between UserFileStats buckets when its status changes"""
+    row = FileUpload.objects.select_for_update().filter(id=file_id).values(
+        'user_id', 'status', 'mime_type', 'file_size', 'processing_started_at', 'processed_at'
+    ).first()
+    if row is None or row['status'] == status:
+        return
+    UserFileStats.remove_file(row)
+    if status == 'ready':
+        fields.setdefault('processed_at', fields['updated_at'])
+    row.update(status=status, **{
+        key: fields[key] for key in ('processing_started_at', 'processed_at') if key in fields
+    })
+    UserFileStats.add_file(row)
+
+
+def read_progress(file_id):
+    """Current progress from the cache, falling back to the database"""
+    progress_data = cache.get(progress_cache_key(file_id))
+    if progress_data:
+        return progress_data
+    row = FileUpload.objects.filter(id=file_id).values('status', 'progress', 'error_message').first()
+    if row is None:
+        return None
+    return _progress_from_row(row)
+
+
+# Off the shared sync thread: every open stream polls, and one thread would
+# serialize all of their reads
+aread_progress = sync_to_async(read_progress, thread_sensitive=False)
+
+
+def _progress_from_row(row):
+    progress_data = {'status': row['status'], 'progress': row['progress']}
+    if row['error_message']:
+        progress_data['error'] = row['error_message']
+    return progress_data
+
+
+def read_progress_many(file_ids, user_id):
+    """Progress of the files among ``file_ids`` that belong to ``user_id``.
+
+    Progress and owners come from one ``cache.get_many``; files missing from
+    either are read with one query, which also caches their owners for the
+    next call. Returns ``{file_id: progress_data}``; other users' and
+    unknown files are left out.
+    """
+    file_ids = [str(file_id) for file_id in file_ids]
+    cached = cache.get_many(
+        [progress_cache_key(file_id) for file_id in file_ids]
+        + [owner_cache_key(file_id) for file_id in file_ids]
+    )
+    found = {}
+    misses = []
+    for file_id in file_ids:
+        owner = cached.get(owner_cache_key(file_id))
+        progress_data = cached.get(progress_cache_key(file_id))
+        if owner is not None and owner != user_id:
+            continue
+        if owner is None or not progress_data:
+            misses.append(file_id)
+        else:
+            found[file_id] = progress_data
+
+    if misses:
+        rows = FileUpload.objects.filter(id__in=misses, user_id=user_id).values(
+            'id', 'status', 'progress', 'error_message'
+        )
+        owners = {}
+        for row in rows:
+            file_id = str(row['id'])
+            # write_progress updates the cache before the row, so cached progress is never older
+            found[file_id] = cached.get(progress_cache_key(file_id)) or _progress_from_row(row)
+            owners[owner_cache_key(file_id)] = user_id
+        cache.set_many(owners, timeout=OWNER_CACHE_TIMEOUT)
+    return found
+
+
+class ProgressHub:
+    """In-process fan-out of progress updates to watchers.
+
+    Workers publish from their threads; each watcher registers a callback.
+    Updates made in other processes only reach the cache, so watchers also
+    poll it (see watch_progress).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers = {}
+
+    def subscribe(self, file_id, callback):
+        with self._lock:
+            self._watchers.setdefault(str(file_id), set()).add(callback)
+
+    def unsubscribe(self, file_id, callback):
+        with self._lock:
+            watchers = self._watchers.get(str(file_id))
+            if watchers is not None:
+                watchers.discard(callback)
+                if not watchers:
+                    del self._watchers[str(file_id)]
+
+    def publish(self, file_id, progress_data):
+        with self._lock:
+            watchers = list(self._watchers.get(str(file_id), ()))
+        for callback in watchers:
+            callback(progress_data)
+
+    def watcher_count(self):
+        with self._lock:
+            return sum(len(watchers) for watchers in self._watchers.values())
+
+
+progress_hub = ProgressHub()
+
+
+async def watch_progress(file_id, poll_interval=None):
+    """Async generator yielding progress whenever it changes.
+
+    Yields the current state first and stops after a final status. Between
+    pushes from this process the cache is re-read every ``poll_interval``
+    seconds; ``None`` is yielded when nothing changed so callers can send
+    keep-alives.
+    """
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'FILE_PROGRESS_STREAM_POLL_INTERVAL', 5)
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+
+    def notify(progress_data):
+        try:
+            loop.call_soon_threadsafe(updates.put_nowait, progress_data)
+        except RuntimeError:
+            # The watcher's event loop has already closed
+            pass
+
+    progress_hub.subscribe(file_id, notify)
+    try:
+        last = None
+        current = await aread_progress(file_id)
+        while current is not None:
+            if current != last:
+                yield current
+                last = current
+                if current['status'] in FINAL_STATUSES:
+                    return
+            else:
+                yield None
+            try:
+                current = await asyncio.wait_for(updates.get(), poll_interval)
+            except asyncio.TimeoutError:
+                current = await aread_progress(file_id)
+    finally:
+        progress_hub.unsubscribe(file_id, notify)
+
+
+class ProgressReporter:
+    """Coalesces progress updates for one file.
+
+    Updates are held in memory and written once FILE_PROGRESS_FLUSH_INTERVAL
+    seconds have passed or progress moved by FILE_PROGRESS_FLUSH_DELTA points
+    since the last write. Status changes and errors are written immediately.
+    """
+
+    def __init__(self, file_id, min_interval=None, min_delta=None, writer=write_progress):
+        self.file_id = file_id
+        self.min_interval = (
+            getattr(settings, 'FILE_PROGRESS_FLUSH_INTERVAL', 1.0) if min_interval is None else min_interval
+        )
+        self.min_delta = getattr(settings, 'FILE_PROGRESS_FLUSH_DELTA', 5) if min_delta is None else min_delta
+        self.writer = writer
+        self._lock = threading.Lock()
+        self._written = None
+        self._written_at = 0.0
+        self._pending = None
+
+    def update(self, status, progress, error_message=None):
+        with self._lock:
+            self._pending = (status, progress, error_message)
+            written = self._written
+            if (
+                written is None
+                or error_message
+                or status != written[0]
+                or abs(progress - written[1]) >= self.min_delta
+                or time.monotonic() - self._written_at >= self.min_interval
+            ):
+                self._flush_locked()
+
+    def flush(self):
+        """Write any pending update now"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending is None or self._pending == self._written:
+            return
+        status, progress, error_message = self._pending
+        self.writer(self.file_id, status, progress, error_message)
+        self._written = self._pending
+        self._written_at = time.monotonic()
+
+
+_reporters = {}
+_reporters_lock = threading.Lock()
+
+
+def get_reporter(file_id):
+    """Reporter shared by everything updating progress for ``file_id`` in this process"""
+    with _reporters_lock:
+        reporter = _reporters.get(file_id)
+        if reporter is None:
+            reporter = _reporters[file_id] = ProgressReporter(file_id)
+        return reporter
+
+
+def close_reporter(file_id, flush=True):
+    """Forget the reporter for ``file_id``, writing its pending update first"""
+    with _reporters_lock:
+        reporter = _reporters.pop(file_id, None)
+    if reporter is not None and flush:
+        reporter.flush()
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from .artifacts import artifacts_dir, file_lock, to_media_path
+
+RESULT_FILE = 'result.json'
+ARTIFACTS = 'artifacts'
+# Size of every entry, kept at the cache root so eviction never walks the tree
+INDEX_FILE = 'index.json'
+INDEX_LOCK = '.index.lock'
+# Stands in for an upload's artifacts directory inside cached parsed_content
+ARTIFACTS_PLACEHOLDER = '@artifacts'
+
+_index_lock = threading.Lock()
+
+
+def _rebase(value, old, new):
+    """Copy of ``value`` with path strings under ``old`` moved under ``new``"""
+    if isinstance(value, dict):
+        return {key: _rebase(item, old, new) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rebase(item, old, new) for item in value]
+    if isinstance(value, str) and (value == old or value.startswith(old + '/')):
+        return new + value[len(old):]
+    return value
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _entry_size(path):
+    """(own, shared) bytes under ``path``: files only the cache holds, and ones
+    hard-linked with an upload's artifacts, whose space that upload accounts for"""
+    own = shared = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            if stat.st_nlink == 1:
+                own += stat.st_size
+            else:
+                shared += stat.st_size
+    return own, shared
+
+
+class ParseResultCache:
+    """On-disk cache of parse results, bounded to ``max_bytes`` with LRU eviction.
+
+    Entries live in ``<root>/<parser>/v<version>/<key>/`` where the key hashes
+    the content hash and parse options. Each holds the parsed_content JSON and
+    hard links to the artifacts it points at, so a hit restores the dataset
+    and row index without parsing. Storing a result drops every other
+    version of that parser, and a hit refreshes the entry's mtime, which is
+    what eviction orders by.
+
+    Each entry's size is recorded in an index when it is stored. Only bytes
+    the cache holds alone count towards the budget; artifacts still linked
+    with a live upload are counted again once that upload's blob is deleted
+    (see recount).
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _entry(self, content_hash, parser_type, version, options):
+        key = hashlib.sha256(json.dumps([content_hash, options], sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.root, parser_type, f'v{version}', key)
+
+    def get(self, content_hash, parser_type, version, options, file_path):
+        """Cached parsed_content for ``file_path``, with its artifacts restored, or None"""
+        entry = self._entry(content_hash, parser_type, version, options)
+        result_path = os.path.join(entry, RESULT_FILE)
+        target = artifacts_dir(file_path)
+        staging = f'{target}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(result_path, 'r', encoding='utf-8') as result_file:
+                parsed_content = json.load(result_file)
+            os.utime(result_path)
+            if os.path.isdir(os.path.join(entry, ARTIFACTS)):
+                shutil.copytree(os.path.join(entry, ARTIFACTS), staging, copy_function=_link_or_copy)
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(staging, target)
+        except FileNotFoundError:
+            # Missing, or evicted while being read
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Discarding parse cache entry {entry}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.rmtree(entry, ignore_errors=True)
+            self._forget(entry)
+            return None
+        return _rebase(parsed_content, ARTIFACTS_PLACEHOLDER, to_media_path(target))
+
+    def put(self, content_hash, parser_type, version, options, file_path, parsed_content):
+        """Store a result and the artifacts of ``file_path`` it points at"""
+        entry = self._entry(content_hash, parser_type, version, options)
+        if os.path.exists(entry):
+            return
+        staging = os.path.join(self.root, '.tmp', uuid.uuid4().hex)
+        try:
+            os.makedirs(staging)
+            source = artifacts_dir(file_path)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(staging, ARTIFACTS), copy_function=_link_or_copy)
+            with open(os.path.join(staging, RESULT_FILE), 'w', encoding='utf-8') as result_file:
+                json.dump(
+                    _rebase(parsed_content, to_media_path(source), ARTIFACTS_PLACEHOLDER),
+                    result_file, default=str
+                )
+            own, shared = _entry_size(staging)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(staging, entry)
+        except OSError as e:
+            # Another process stored it first, or the disk is full; either way not fatal
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.exists(entry):
+                print(f"Error caching parse result: {e}")
+            return
+        with self._index() as index:
+            self._drop_other_versions(parser_type, version, index)
+            index[os.path.relpath(entry, self.root)] = {'own': own, 'shared': shared, 'content_hash': content_hash}
+            self._evict(index)
+
+    @contextmanager
+    def _index(self):
+        """The entry index, locked against other threads and processes and saved on exit"""
+        os.makedirs(self.root, exist_ok=True)
+        with _index_lock, file_lock(os.path.join(self.root, INDEX_LOCK)):
+            index = self._read_index()
+            yield index
+            staging = os.path.join(self.root, f'{INDEX_FILE}.{uuid.uuid4().hex}.tmp')
+            with open(staging, 'w', encoding='utf-8') as index_file:
+                json.dump(index, index_file)
+            os.replace(staging, os.path.join(self.root, INDEX_FILE))
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), 'r', encoding='utf-8') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            pass
+        # No index yet, or a damaged one: measure the entries once to rebuild it
+        index = {}
+        for path in self._entry_paths():
+            own, shared = _entry_size(path)
+            index[os.path.relpath(path, self.root)] = {'own': own, 'shared': shared, 'content_hash': None}
+        return index
+
+    def _entry_paths(self):
+        for parser_type in os.listdir(self.root):
+            parser_dir = os.path.join(self.root, parser_type)
+            if parser_type.startswith('.') or not os.path.isdir(parser_dir):
+                continue
+            for version in os.listdir(parser_dir):
+                version_dir = os.path.join(parser_dir, version)
+                for key in os.listdir(version_dir):
+                    yield os.path.join(version_dir, key)
+
+    def _drop_other_versions(self, parser_type, version, index):
+        parser_dir = os.path.join(self.root, parser_type)
+        for name in os.listdir(parser_dir):
+            if name != f'v{version}':
+                shutil.rmtree(os.path.join(parser_dir, name), ignore_errors=True)
+        keep = os.path.join(parser_type, f'v{version}') + os.sep
+        for name in list(index):
+            if name.startswith(parser_type + os.sep) and not name.startswith(keep):
+                del index[name]
+
+    def _forget(self, entry):
+        with self._index() as index:
+            index.pop(os.path.relpath(entry, self.root), None)
+
+    def recount(self, content_hash):
+        """Re-measure the entries of ``content_hash`` after its upload's artifacts went away.
+
+        Their hard-linked artifacts are now held by the cache alone, so they
+        start counting towards the budget.
+        """
+        if not os.path.isdir(self.root):
+            return
+        with self._index() as index:
+            for name, record in index.items():
+                if record['content_hash'] == content_hash and record['shared']:
+                    own, shared = _entry_size(os.path.join(self.root, name))
+                    record.update(own=own, shared=shared)
+            self._evict(index)
+
+    def entries(self):
+        """(last used, size, path) of every entry, sizes as recorded in the index"""
+        if not os.path.isdir(self.root):
+            return []
+        with self._index() as index:
+            return [
+                (self._last_used(name), record['own'], os.path.join(self.root, name))
+                for name, record in index.items()
+            ]
+
+    def _last_used(self, name):
+        try:
+            return os.stat(os.path.join(self.root, name, RESULT_FILE)).st_mtime
+        except OSError:
+            # Gone already; evict its record first
+            return 0
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        if os.path.isdir(self.root):
+            with self._index() as index:
+                self._evict(index)
+
+    def _evict(self, index):
+        total = sum(record['own'] for record in index.values())
+        if total <= self.max_bytes:
+            return
+        for _, name in sorted((self._last_used(name), name) for name in index):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            total -= index.pop(name)['own']
+
+
+def get_result_cache():
+    """Cache configured by PARSE_CACHE_DIR and PARSE_CACHE_MAX_BYTES, or None if disabled"""
+    max_bytes = getattr(settings, 'PARSE_CACHE_MAX_BYTES', 0)
+    if max_bytes <= 0:
+        return None
+    root = getattr(settings, 'PARSE_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'parse_cache')
+    return ParseResultCache(root, max_bytes)
@@ -0,0 +1,171 @@
+import os
+import re
+import sqlite3
+import threading
+from django.conf import settings
+from .artifacts import from_media_path
+from .columnar import open_dataset
+from .pdf_pages import read_page
+
+# Table rows are indexed in blocks, so a hit points at a range of rows
+ROWS_PER_DOCUMENT = 500
+MAX_QUERY_TERMS = 16
+SNIPPET_TOKENS = 12
+
+_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    owner, part UNINDEXED, body, tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS document_files (
+    doc_id INTEGER PRIMARY KEY,
+    file_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS document_files_file_id ON document_files (file_id);
+'''
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def index_path():
+    return getattr(settings, 'SEARCH_INDEX_PATH', None) or os.path.join(settings.MEDIA_ROOT, 'search', 'index.sqlite3')
+
+
+def connect():
+    """Open the search index, creating it on first use.
+
+    The index is its own SQLite database with an FTS5 table, so it works the
+    same whichever database Django uses. WAL mode lets searches run while
+    workers write.
+    """
+    path = index_path()
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                connection = sqlite3.connect(path, timeout=30)
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(_SCHEMA)
+                connection.close()
+                _schema_ready.add(path)
+    return sqlite3.connect(path, timeout=30)
+
+
+def _owner(user_id):
+    return f'u{user_id}'
+
+
+def iter_documents(original_name, parsed_content):
+    """Yield ``(part, text)`` for everything searchable in a parsed file"""
+    yield 'name', original_name
+    content = parsed_content or {}
+
+    if content.get('type') == 'pdf' and content.get('pages_path'):
+        pages_dir = from_media_path(content['pages_path'])
+        for page_number in range(1, content.get('pages', 0) + 1):
+            text = read_page(pages_dir, page_number)
+            if text:
+                yield f'page {page_number}', text
+        return
+
+    if 'sheet_details' in content:
+        tables = [(f"sheet {sheet['name']} ", sheet.get('dataset')) for sheet in content['sheet_details']]
+    else:
+        tables = [('', content.get('dataset'))]
+    for label, pointer in tables:
+        if not pointer:
+            continue
+        dataset = open_dataset(pointer)
+        yield f'{label}headers', ' '.join(dataset.headers)
+        for start in range(0, dataset.num_rows, ROWS_PER_DOCUMENT):
+            rows = dataset.rows(start, start + ROWS_PER_DOCUMENT)
+            text = '\n'.join(' '.join('' if v is None else str(v) for v in row.values()) for row in rows)
+            yield f'{label}rows {start + 1}-{start + len(rows)}', text
+
+
+def index_file(file_id, user_id, original_name, parsed_content):
+    """(Re)index one file, replacing whatever was indexed for it before"""
+    file_id = str(file_id)
+    connection = connect()
+    try:
+        with connection:
+            _delete(connection, file_id)
+            owner = _owner(user_id)
+            for part, text in iter_documents(original_name, parsed_content):
+                cursor = connection.execute(
+                    'INSERT INTO documents (owner, part, body) VALUES (?, ?, ?)', (owner, part, text)
+                )
+                connection.execute(
+                    'INSERT INTO document_files (doc_id, file_id) VALUES (?, ?)', (cursor.lastrowid, file_id)
+                )
+    finally:
+        connection.close()
+
+
+def _delete(connection, file_id):
+    connection.execute(
+        'DELETE FROM documents WHERE rowid IN (SELECT doc_id FROM document_files WHERE file_id = ?)', (file_id,)
+    )
+    connection.execute('DELETE FROM document_files WHERE file_id = ?', (file_id,))
+
+
+def remove_file(file_id):
+    connection = connect()
+    try:
+        with connection:
+            _delete(connection, str(file_id))
+    finally:
+        connection.close()
+
+
+def build_match(query):
+    """FTS5 query for the words in ``query``; a trailing * makes a word a prefix.
+
+    Every word must match. Words are quoted, so user input can't inject FTS5
+    syntax. Returns None when there is nothing to search for.
+    """
+    terms = []
+    for word, star in re.findall(r'(\w+)(\*?)', query)[:MAX_QUERY_TERMS]:
+        terms.append(f'"{word}"{star}')
+    if not terms:
+        return None
+    return ' '.join(terms)
+
+
+def search(user_id, query, limit=20):
+    """Files of ``user_id`` matching ``query``, best first.
+
+    Returns ``[{'file_id', 'score', 'matches', 'hits': [{'part', 'snippet'}]}]``
+    where hits are the file's best-ranked parts (at most three).
+    """
+    match = build_match(query)
+    if match is None:
+        return []
+    connection = connect()
+    try:
+        rows = connection.execute(
+            '''
+            SELECT f.file_id, d.part, snippet(documents, 2, '<mark>', '</mark>', '...', ?),
+                   bm25(documents, 0.0, 0.0, 1.0) AS score
+            FROM documents d JOIN document_files f ON f.doc_id = d.rowid
+            WHERE documents MATCH ?
+            ORDER BY score
+            LIMIT ?
+            ''',
+            (SNIPPET_TOKENS, f'owner:"{_owner(user_id)}" AND body:({match})', limit * 10)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    results = {}
+    for file_id, part, snippet, score in rows:
+        result = results.get(file_id)
+        if result is None:
+            if len(results) == limit:
+                continue
+            # bm25 is lower for better matches; flip it so higher is better
+            result = results[file_id] = {'file_id': file_id, 'score': -score, 'matches': 0, 'hits': []}
+        result['matches'] += 1
+        if len(result['hits']) < 3:
+            result['hits'].append({'part': part, 'snippet': snippet})
+    return list(results.values())
@@ -1,5 +1,11 @@
+import math
+import mimetypes
+from django.conf import settings
 from rest_framework import serializers
-from .models import FileUpload
+from .models import FileUpload, UploadSession
+from .artifacts import from_media_path
+from .columnar import open_dataset
+from .csv_stream import PREVIEW_ROWS, read_csv_rows
 
 
 class FileUploadSerializer(serializers.ModelSerializer):
@@ -13,7 +19,7 @@ class FileUploadSerializer(serializers.ModelSerializer):
             'mime_type', 'status', 'progress', 'created_at', 'updated_at', 'file_url'
         ]
         read_only_fields = [
-            'id', 'filename', 'file_size', 'mime_type', 'status', 
+            'id', 'filename', 'original_name', 'file_size', 'mime_type', 'status', 
             'progress', 'created_at', 'updated_at'
         ]
     
@@ -24,6 +30,10 @@ class FileUploadSerializer(serializers.ModelSerializer):
         validated_data['file_size'] = file_obj.size
         validated_data['mime_type'] = file_obj.content_type or 'application/octet-stream'
         validated_data['user'] = self.context['request'].user
+        # Point at already stored identical content instead of saving the upload again
+        stored_name = validated_data.pop('stored_name', None)
+        if stored_name:
+            validated_data['file'] = stored_name
         return super().create(validated_data)
 
 
@@ -45,8 +55,76 @@ class FileProgressSerializer(serializers.ModelSerializer):
 
 
 class FileContentSerializer(serializers.ModelSerializer):
-    content = serializers.JSONField(source='parsed_content')
+    content = serializers.SerializerMethodField()
     
     class Meta:
         model = FileUpload
-        fields = ['id', 'filename', 'original_name', 'status', 'content']
\ No newline at end of file
+        fields = ['id', 'filename', 'original_name', 'status', 'content']
+    
+    def get_content(self, obj):
+        content = obj.parsed_content
+        if not isinstance(content, dict) or 'data' in content:
+            return content
+        if 'row_index' in content:
+            # CSV previews carry the original strings, as sample_data and the rows endpoint do
+            rows = read_csv_rows(
+                obj.file.path,
+                from_media_path(content['row_index']['path']),
+                content['row_index'],
+                content['headers'],
+                0,
+                PREVIEW_ROWS
+            )
+            return {**content, 'data': rows}
+        if 'dataset' in content:
+            # Excel rows live in a columnar dataset; serve the preview from it
+            return {**content, 'data': open_dataset(content['dataset']).rows(0, PREVIEW_ROWS)}
+        return content
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    upload_id = serializers.CharField(source='id', read_only=True)
+    file_id = serializers.CharField(source='file_upload_id', read_only=True)
+    mime_type = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    chunk_size = serializers.IntegerField(required=False)
+    received_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'upload_id', 'filename', 'file_size', 'mime_type', 'chunk_size',
+            'total_chunks', 'received_chunks', 'status', 'file_id', 'created_at'
+        ]
+        read_only_fields = ['total_chunks', 'status', 'created_at']
+    
+    def get_received_chunks(self, obj):
+        return list(obj.chunks.values_list('index', flat=True))
+    
+    def validate_file_size(self, value):
+        if value < 0:
+            raise serializers.ValidationError('File size cannot be negative.')
+        if value > settings.MAX_CHUNKED_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f'File size too large. Maximum size is {settings.MAX_CHUNKED_UPLOAD_SIZE} bytes.'
+            )
+        return value
+    
+    def validate_chunk_size(self, value):
+        if not settings.MIN_UPLOAD_CHUNK_SIZE <= value <= settings.MAX_UPLOAD_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f'Chunk size must be between {settings.MIN_UPLOAD_CHUNK_SIZE} '
+                f'and {settings.MAX_UPLOAD_CHUNK_SIZE} bytes.'
+            )
+        return value
+    
+    def create(self, validated_data):
+        chunk_size = validated_data.get('chunk_size') or settings.UPLOAD_CHUNK_SIZE
+        validated_data['chunk_size'] = chunk_size
+        validated_data['total_chunks'] = math.ceil(validated_data['file_size'] / chunk_size)
+        validated_data['mime_type'] = (
+            validated_data.get('mime_type')
+            or mimetypes.guess_type(validated_data['filename'])[0]
+            or 'application/octet-stream'
+        )
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
@@ -1,228 +1,446 @@
 import os
 import json
-import csv
-import pandas as pd
-import threading
+import shutil
+import tempfile
 import time
+from concurrent.futures.process import BrokenProcessPool
 from io import StringIO
-from PyPDF2 import PdfReader
+import pandas as pd
 from django.conf import settings
-from django.core.cache import cache
 from django.utils import timezone
 from .models import FileUpload
+from .artifacts import artifacts_dir, parse_lock, to_media_path, remove_artifacts
+from .columnar import dataset_pointer, open_dataset
+from . import csv_stream, metrics, search
+from .csv_stream import parse_csv_path
+from .csv_pandas import UnsupportedDialect, parse_csv_pandas
+from .csv_parallel import parse_csv_parallel, segment_count
+from .excel_stream import parse_excel_path
+from .pdf_pages import extract_pages
+from .profiling import profile_dataset
+from .result_cache import get_result_cache
+from .progress import close_reporter, get_reporter, write_progress
+from .workers import QueueFull, get_worker_pool, get_process_pool, parser_process_count, reset_process_pool
 
 
 def process_file_background(file_id):
-    """Process file in background thread"""
-    def process():
+    """Queue file processing on the shared worker pool.
+
+    Raises ``files.workers.QueueFull`` when FILE_PROCESSING_QUEUE_SIZE is set
+    and that many jobs are already waiting.
+    """
+    get_worker_pool().submit(process_file, file_id, time.perf_counter())
+
+
+def process_files_background(file_ids):
+    """Queue processing of several files at once; all are queued or none are"""
+    queued_at = time.perf_counter()
+    get_worker_pool().submit_many(process_file, [(file_id, queued_at) for file_id in file_ids])
+
+
+def detect_parser_type(mime_type, name):
+    """Pick the parser for a file from its MIME type and name, or None"""
+    if mime_type.startswith('text/') or name.endswith('.csv'):
+        return 'csv'
+    if mime_type in ['application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
+                     'application/vnd.ms-excel'] or name.endswith(('.xlsx', '.xls')):
+        return 'excel'
+    if mime_type == 'application/pdf' or name.endswith('.pdf'):
+        return 'pdf'
+    return None
+
+
+def index_for_search(file_id):
+    """Add a ready file to the search index; failures only cost searchability"""
+    try:
+        row = FileUpload.objects.filter(id=file_id).values('user_id', 'original_name', 'parsed_content').first()
+        if row:
+            search.index_file(file_id, row['user_id'], row['original_name'], row['parsed_content'])
+    except Exception as e:
+        print(f"Error indexing file {file_id}: {e}")
+
+
+def index_for_search_background(file_id):
+    """Index a file on the worker pool, for files that became ready in a request"""
+    try:
+        get_worker_pool().submit(index_for_search, file_id)
+    except QueueFull:
+        print(f"Search indexing of file {file_id} skipped: queue is full (run rebuild_search_index)")
+
+
+def find_parse_result(file_upload, parser_type):
+    """parsed_content of a ready upload with the same stored content and parser, or None"""
+    if not file_upload.content_hash:
+        return None
+    siblings = FileUpload.objects.filter(
+        content_hash=file_upload.content_hash, file=file_upload.file.name, status='ready'
+    ).exclude(id=file_upload.id).values_list('id', 'mime_type', 'original_name')
+    for sibling_id, mime_type, original_name in siblings:
+        if detect_parser_type(mime_type, original_name) != parser_type:
+            continue
+        parsed_content = FileUpload.objects.values_list('parsed_content', flat=True).get(id=sibling_id)
+        if parsed_content is None:
+            continue
+        if 'filename' in parsed_content:
+            parsed_content['filename'] = file_upload.original_name
+        return parsed_content
+    return None
+
+
+def process_file(file_id, queued_at=None):
+    """Parse an uploaded file and store the result.
+
+    Every stage is timed; the times feed the metrics and are saved as the
+    file's stage_timings. ``queued_at`` is the time.perf_counter() reading
+    from when the job was queued.
+    """
+    file_type, file_size, outcome = 'other', 0, 'failed'
+    metrics.IN_FLIGHT.inc()
+    with metrics.timing_stages() as timer:
+        if queued_at is not None:
+            timer.add({'queue_wait': time.perf_counter() - queued_at})
         try:
             file_upload = FileUpload.objects.get(id=file_id)
-            
-            # Update status to processing
-            file_upload.status = 'processing'
-            file_upload.progress = 10
-            file_upload.processing_started_at = timezone.now()
-            file_upload.save()
-            
-            # Cache progress for real-time updates
-            cache.set(f'file_progress_{file_id}', {
-                'status': 'processing',
-                'progress': 10
-            }, timeout=3600)
-            
-            # Get file path
-            file_path = file_upload.file.path
-            
-            # Determine file type and parse accordingly
-            if file_upload.mime_type.startswith('text/') or file_upload.original_name.endswith('.csv'):
-                parsed_content = parse_csv_file(file_path, file_id)
-            elif file_upload.mime_type in ['application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-                                           'application/vnd.ms-excel'] or file_upload.original_name.endswith(('.xlsx', '.xls')):
-                parsed_content = parse_excel_file(file_path, file_id)
-            elif file_upload.mime_type == 'application/pdf' or file_upload.original_name.endswith('.pdf'):
-                parsed_content = parse_pdf_file(file_path, file_id)
-            else:
-                # For other file types, just store basic info
-                parsed_content = {
-                    'filename': file_upload.original_name,
-                    'size': file_upload.file_size,
-                    'type': file_upload.mime_type,
-                    'message': 'File uploaded successfully. Parsing not supported for this file type.'
-                }
-            
-            # Update progress
-            file_upload.progress = 90
-            file_upload.save()
-            cache.set(f'file_progress_{file_id}', {
-                'status': 'processing',
-                'progress': 90
-            }, timeout=3600)
-            
-            # Save parsed content
-            file_upload.parsed_content = parsed_content
-            file_upload.status = 'ready'
-            file_upload.progress = 100
-            file_upload.save()
-            
-            # Cache final progress
-            cache.set(f'file_progress_{file_id}', {
-                'status': 'ready',
-                'progress': 100
-            }, timeout=3600)
-            
-            print(f"File {file_id} processed successfully")
-            
+            file_size = file_upload.file_size
+            with metrics.stage('sniff'):
+                parser_type = detect_parser_type(file_upload.mime_type, file_upload.original_name)
+            file_type = parser_type or 'other'
+            outcome = parse_and_store(file_upload, parser_type)
         except FileUpload.DoesNotExist:
+            outcome = None
             print(f"File {file_id} not found")
         except Exception as e:
             # Handle errors
+            metrics.FAILURES.inc(file_type=file_type, stage=timer.failed_stage or 'other')
             try:
-                file_upload = FileUpload.objects.get(id=file_id)
-                file_upload.status = 'failed'
-                file_upload.error_message = str(e)
-                file_upload.save()
-                cache.set(f'file_progress_{file_id}', {
-                    'status': 'failed',
-                    'progress': file_upload.progress,
-                    'error': str(e)
-                }, timeout=3600)
+                close_reporter(file_id)
+                progress = FileUpload.objects.filter(id=file_id).values_list('progress', flat=True).first()
+                write_progress(file_id, 'failed', progress or 0, error_message=str(e))
             except:
                 pass
             print(f"Error processing file {file_id}: {str(e)}")
+        finally:
+            metrics.IN_FLIGHT.dec()
+    if outcome:
+        record_stage_timings(file_id, timer, file_type, file_size, outcome)
+
+
+def record_stage_timings(file_id, timer, file_type, file_size, outcome):
+    """Add a finished job's stage times to the metrics and save them on the file"""
+    metrics.record_job(timer, file_type, file_size, outcome)
+    try:
+        FileUpload.objects.filter(id=file_id).update(stage_timings=timer.rounded())
+    except Exception as e:
+        print(f"Error saving stage timings of file {file_id}: {e}")
+
+
+def parse_and_store(file_upload, parser_type):
+    """Parse a file, or reuse an earlier result, and save it; returns the outcome"""
+    file_id = str(file_upload.id)
+    file_path = file_upload.file.path
+    
+    # Duplicates share a file and its artifacts, so parse each file once at a time
+    with parse_lock(file_path):
+        with metrics.stage('dedup_lookup'):
+            parsed_content = find_parse_result(file_upload, parser_type)
+        if parsed_content is not None:
+            write_progress(
+                file_id, 'ready', 100, parsed_content=parsed_content, processing_started_at=timezone.now()
+            )
+            print(f"File {file_id} reused the parse result of identical content")
+            index_for_search(file_id)
+            return 'reused'
+        
+        # Update status to processing
+        write_progress(file_id, 'processing', 10, processing_started_at=timezone.now())
+        
+        if parser_type:
+            parsed_content = parse_with_cache(file_upload, parser_type, file_path)
+        else:
+            # For other file types, just store basic info
+            parsed_content = {
+                'filename': file_upload.original_name,
+                'size': file_upload.file_size,
+                'type': file_upload.mime_type,
+                'message': 'File uploaded successfully. Parsing not supported for this file type.'
+            }
+        
+        # Drop coalesced parser updates; the final state supersedes them
+        close_reporter(file_id, flush=False)
+        
+        # Save parsed content and final progress in one write
+        write_progress(file_id, 'ready', 100, parsed_content=parsed_content)
     
-    # Start processing in background thread
-    thread = threading.Thread(target=process)
-    thread.daemon = True
-    thread.start()
+    index_for_search(file_id)
+    print(f"File {file_id} processed successfully")
+    return 'ready'
 
 
-def parse_csv_file(file_path, file_id):
-    """Parse CSV file and return structured data"""
+def parse_csv_file(file_path, file_id, executor=None):
+    """Parse CSV file and return structured data.
+
+    With an ``executor`` (the parser process pool), files big enough to split
+    are parsed on several cores with parse_csv_parallel.
+    """
     try:
         # Update progress
         update_progress(file_id, 'processing', 30)
         
-        data = []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            # Try to detect delimiter
-            sample = file.read(1024)
-            file.seek(0)
-            
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-            
-            reader = csv.DictReader(file, delimiter=delimiter)
-            
-            # Update progress
-            update_progress(file_id, 'processing', 50)
-            
-            for i, row in enumerate(reader):
-                data.append(dict(row))
-                # Update progress every 100 rows
-                if i % 100 == 0:
-                    progress = min(50 + (i * 30 / 1000), 80)
-                    update_progress(file_id, 'processing', int(progress))
+        # Stream the file: rows are counted, only the preview is kept in memory
+        def on_progress(fraction):
+            update_progress(file_id, 'processing', int(30 + fraction * 50))
         
-        return {
-            'type': 'csv',
-            'headers': list(data[0].keys()) if data else [],
-            'rows': len(data),
-            'data': data[:100],  # Limit to first 100 rows for API response
-            'total_rows': len(data),
-            'sample_data': data[:5] if data else []
-        }
+        artifacts = artifacts_dir(file_path, create=True)
+        dataset_path = os.path.join(artifacts, 'dataset')
+        index_path = os.path.join(artifacts, 'rows.idx')
+        result = None
+        segments = segment_count(os.path.getsize(file_path), parser_process_count()) if executor else 1
+        if segments > 1:
+            try:
+                result = parse_csv_parallel(
+                    file_path, executor, segments, on_progress=on_progress,
+                    dataset_path=dataset_path, index_path=index_path
+                )
+            except (UnsupportedDialect, pd.errors.ParserError) as e:
+                print(f"Parsing {file_path} on one core: {e}")
+                shutil.rmtree(dataset_path, ignore_errors=True)
+        if result is None and csv_engine_for(file_path) == 'pandas':
+            try:
+                result = parse_csv_pandas(
+                    file_path, on_progress=on_progress, dataset_path=dataset_path, index_path=index_path
+                )
+            except (UnsupportedDialect, pd.errors.ParserError) as e:
+                print(f"Falling back to the csv module for {file_path}: {e}")
+                shutil.rmtree(dataset_path, ignore_errors=True)
+        if result is None:
+            result = parse_csv_path(
+                file_path, on_progress=on_progress, dataset_path=dataset_path, index_path=index_path
+            )
+        return csv_parsed_content(result, artifacts)
     except Exception as e:
         raise Exception(f"Error parsing CSV file: {str(e)}")
 
 
+def csv_engine_for(file_path):
+    """'pandas' or 'python', per CSV_ENGINE; 'auto' picks pandas for large files"""
+    engine = getattr(settings, 'CSV_ENGINE', 'python')
+    if engine == 'auto':
+        return 'pandas' if os.path.getsize(file_path) >= settings.CSV_PANDAS_MIN_BYTES else 'python'
+    return engine
+
+
+def csv_parsed_content(result, artifacts):
+    """Turn a parse_csv_stream result into parsed_content for ``artifacts``.
+
+    The full table lives in the columnar dataset, so only pointers are kept.
+    """
+    del result['data']
+    result['dataset'] = dataset_pointer(result.pop('dataset_meta'), os.path.join(artifacts, 'dataset'))
+    with metrics.stage('profile'):
+        result['profile'] = profile_dataset(open_dataset(result['dataset']))
+    result['row_index']['path'] = to_media_path(os.path.join(artifacts, 'rows.idx'))
+    return result
+
+
 def parse_excel_file(file_path, file_id):
-    """Parse Excel file and return structured data"""
+    """Parse every sheet of an Excel file and return structured data"""
     try:
         # Update progress
         update_progress(file_id, 'processing', 30)
         
-        # Read Excel file
-        df = pd.read_excel(file_path)
+        def on_progress(fraction):
+            update_progress(file_id, 'processing', int(30 + fraction * 50))
         
-        # Update progress
-        update_progress(file_id, 'processing', 60)
-        
-        # Convert to list of dictionaries
-        data = df.to_dict('records')
+        # Stream all sheets; each sheet's rows go to its own columnar dataset
+        dataset_path = os.path.join(artifacts_dir(file_path, create=True), 'dataset')
+        sheets = parse_excel_path(file_path, on_progress=on_progress, dataset_path=dataset_path)
+        for sheet in sheets:
+            if 'dataset_meta' in sheet:
+                sheet['dataset'] = dataset_pointer(sheet.pop('dataset_meta'), sheet.pop('dataset_path'))
+                with metrics.stage('profile'):
+                    sheet['profile'] = profile_dataset(open_dataset(sheet['dataset']))
         
-        # Update progress
-        update_progress(file_id, 'processing', 80)
-        
-        return {
+        # The first sheet is also described at the top level, as before
+        first = sheets[0] if sheets else {'headers': [], 'rows': 0, 'sample_data': []}
+        parsed_content = {
             'type': 'excel',
-            'headers': list(df.columns),
-            'rows': len(data),
-            'data': data[:100],  # Limit to first 100 rows
-            'total_rows': len(data),
-            'sample_data': data[:5] if data else [],
-            'sheets': 1  # For simplicity, we're only reading the first sheet
+            'headers': first['headers'],
+            'rows': first['rows'],
+            'total_rows': first['rows'],
+            'sample_data': first['sample_data'],
+            'sheets': len(sheets),
+            'sheet_details': sheets
         }
+        if 'dataset' in first:
+            parsed_content['dataset'] = first['dataset']
+            parsed_content['profile'] = first['profile']
+        return parsed_content
     except Exception as e:
         raise Exception(f"Error parsing Excel file: {str(e)}")
 
 
-def parse_pdf_file(file_path, file_id):
-    """Parse PDF file and extract text content"""
+def parse_pdf_file(file_path, file_id, executor=None):
+    """Parse PDF file and extract text content.
+
+    Pages are extracted into ``<upload>.parsed/pages/`` as they complete, in
+    parallel across ``executor`` when one is given, and are served from
+    there one at a time.
+    """
     try:
         # Update progress
         update_progress(file_id, 'processing', 30)
         
-        reader = PdfReader(file_path)
-        text_content = []
-        
-        total_pages = len(reader.pages)
-        
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
-            text_content.append({
-                'page': i + 1,
-                'content': text
-            })
-            
-            # Update progress
-            progress = 30 + (i * 50 / total_pages)
-            update_progress(file_id, 'processing', int(progress))
+        def on_progress(fraction):
+            update_progress(file_id, 'processing', int(30 + fraction * 50))
         
-        # Combine all text
-        full_text = ' '.join([page['content'] for page in text_content])
+        pages_dir = os.path.join(artifacts_dir(file_path, create=True), 'pages')
+        stats = extract_pages(file_path, pages_dir, executor=executor, on_progress=on_progress)
         
+        # Page texts stay in their files; only the totals are kept here
         return {
             'type': 'pdf',
-            'pages': total_pages,
-            'content': text_content,
-            'full_text': full_text,
-            'word_count': len(full_text.split()),
-            'character_count': len(full_text)
+            'pages': len(stats),
+            'pages_path': to_media_path(pages_dir),
+            'word_count': sum(words for _, words, _ in stats),
+            'character_count': sum(characters for _, _, characters in stats)
         }
+    except BrokenProcessPool:
+        raise
     except Exception as e:
         raise Exception(f"Error parsing PDF file: {str(e)}")
 
 
+PARSERS = {
+    'csv': parse_csv_file,
+    'excel': parse_excel_file,
+    'pdf': parse_pdf_file,
+}
+
+# Parsers that split their work across the process pool themselves instead
+# of running in it whole
+FAN_OUT_PARSERS = {'pdf'}
+
+
+def fans_out(parser_type, file_path):
+    """Whether the parser splits this file across the process pool itself.
+
+    CSVs only do when they are big enough for more than one segment.
+    """
+    if parser_type == 'csv':
+        return segment_count(os.path.getsize(file_path), parser_process_count()) > 1
+    return parser_type in FAN_OUT_PARSERS
+
+
+# Bump a parser's version whenever its output changes; cached results of
+# older versions are dropped.
+PARSER_VERSIONS = {
+    'csv': 2,
+    'excel': 4,
+    'pdf': 3,
+}
+
+
+def parser_options(parser_type):
+    """Settings that change a parser's output, so they are part of its cache key"""
+    if parser_type == 'csv':
+        return {
+            'preview_rows': csv_stream.PREVIEW_ROWS,
+            'sample_rows': csv_stream.SAMPLE_ROWS,
+            'row_index_interval': csv_stream.ROW_INDEX_INTERVAL
+        }
+    return {}
+
+
+def parse_with_cache(file_upload, parser_type, file_path):
+    """Run a parser unless the parse cache already has its result for this content"""
+    file_id = str(file_upload.id)
+    result_cache = get_result_cache() if file_upload.content_hash else None
+    if result_cache:
+        with metrics.stage('result_cache'):
+            parsed_content = result_cache.get(
+                file_upload.content_hash, parser_type, PARSER_VERSIONS[parser_type],
+                parser_options(parser_type), file_path
+            )
+        if parsed_content is not None:
+            print(f"File {file_id} parse result served from cache")
+            return parsed_content
+    
+    # Artifacts are always rebuilt in a fresh directory: cached copies share their inodes
+    remove_artifacts(file_path)
+    with metrics.stage('parse'):
+        parsed_content = run_parser(parser_type, file_path, file_id)
+    with metrics.stage('cache_write'):
+        cache_parse_result(file_upload, parser_type, file_path, parsed_content)
+    return parsed_content
+
+
+def cache_parse_result(file_upload, parser_type, file_path, parsed_content):
+    result_cache = get_result_cache() if file_upload.content_hash else None
+    if result_cache:
+        result_cache.put(
+            file_upload.content_hash, parser_type, PARSER_VERSIONS[parser_type],
+            parser_options(parser_type), file_path, parsed_content
+        )
+
+
+def run_parser(parser_type, file_path, file_id):
+    """Run a parser in this thread or in the parser process pool.
+
+    The mode comes from FILE_PARSER_EXECUTION, so CPU-bound parsers can run
+    on other cores without holding the GIL of the web worker.
+    """
+    mode = getattr(settings, 'FILE_PARSER_EXECUTION', {}).get(parser_type, 'thread')
+    if mode != 'process':
+        return PARSERS[parser_type](file_path, file_id)
+    
+    try:
+        if fans_out(parser_type, file_path):
+            return PARSERS[parser_type](file_path, file_id, executor=get_process_pool())
+        result_path = get_process_pool().submit(
+            run_parser_job, parser_type, file_path, file_id
+        ).result()
+    except BrokenProcessPool:
+        reset_process_pool()
+        raise Exception(f"Parser process for {parser_type} file crashed")
+    
+    try:
+        with open(result_path, 'r', encoding='utf-8') as result_file:
+            job = json.load(result_file)
+    finally:
+        os.remove(result_path)
+    # Stages timed in the parser process are part of this job's parse
+    timer = metrics.current_timer()
+    if timer:
+        timer.add(job['stages'])
+    return job['parsed_content']
+
+
+def run_parser_job(parser_type, file_path, file_id):
+    """Entry point inside a parser process.
+
+    The result is written to a JSON spool file and only its path is sent back,
+    so parser intermediates (DataFrames, page objects) never cross the
+    process boundary and the pipe carries a few bytes instead of the content.
+    The spool file also holds the times of the stages run in this process.
+    """
+    with metrics.timing_stages() as timer:
+        try:
+            parsed_content = PARSERS[parser_type](file_path, file_id)
+        finally:
+            close_reporter(file_id)
+    fd, result_path = tempfile.mkstemp(prefix='parsed-', suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as result_file:
+        json.dump({'parsed_content': parsed_content, 'stages': timer.stages}, result_file, default=str)
+    return result_path
+
+
 def update_progress(file_id, status, progress, error_message=None):
-    """Update progress in cache and database"""
+    """Update progress in cache and database.
+
+    Writes are coalesced per file by a ProgressReporter, so parsers can call
+    this as often as they like; status changes and errors are written at once.
+    """
     try:
-        # Update cache for real-time access
-        progress_data = {
-            'status': status,
-            'progress': progress
-        }
-        if error_message:
-            progress_data['error'] = error_message
-            
-        cache.set(f'file_progress_{file_id}', progress_data, timeout=3600)
-        
-        # Also update database
-        file_upload = FileUpload.objects.get(id=file_id)
-        file_upload.status = status
-        file_upload.progress = progress
-        if error_message:
-            file_upload.error_message = error_message
-        file_upload.save()
-        
+        get_reporter(file_id).update(status, progress, error_message)
     except Exception as e:
-        print(f"Error updating progress: {e}")
\ No newline at end of file
+        print(f"Error updating progress: {e}")
@@ -5,8 +5,21 @@ urlpatterns = [
     # File operations
     path('files/', views.FileUploadView.as_view(), name='file-upload'),
     path('files/list/', views.FileListView.as_view(), name='file-list'),
+    path('files/batch/', views.batch_upload_view, name='batch-upload'),
+    path('files/batch/<uuid:pk>/', views.batch_progress_view, name='batch-progress'),
+    path('files/progress/', views.file_progress_many_view, name='file-progress-many'),
+    path('files/search/', views.file_search_view, name='file-search'),
+    path('files/stats/', views.file_stats_view, name='file-stats'),
+    path('files/uploads/', views.UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('files/uploads/<uuid:pk>/', views.UploadSessionDetailView.as_view(), name='upload-session-detail'),
+    path('files/uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk_view, name='upload-chunk'),
+    path('files/uploads/<uuid:upload_id>/complete/', views.complete_upload_view, name='upload-complete'),
     path('files/<uuid:pk>/', views.FileDetailView.as_view(), name='file-detail'),
     path('files/<uuid:file_id>/progress/', views.file_progress_view, name='file-progress'),
+    path('files/<uuid:file_id>/progress/stream/', views.file_progress_stream_view, name='file-progress-stream'),
+    path('files/<uuid:file_id>/progress/wait/', views.file_progress_wait_view, name='file-progress-wait'),
+    path('files/<uuid:pk>/rows/', views.file_rows_view, name='file-rows'),
+    path('files/<uuid:pk>/pages/<int:page>/', views.file_page_view, name='file-page'),
     
     # Health and docs
     path('health/', views.health_check_view, name='health-check'),
@@ -1,21 +1,60 @@
 import os
+import hmac
+import json
+import uuid
+import asyncio
 import magic
+from asgiref.sync import sync_to_async
 from rest_framework import status, generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 
-from .models import FileUpload
+from .models import FileUpload, FileBlob, UploadBatch, UploadSession, UploadChunk, UserFileStats
 from .serializers import (
     FileUploadSerializer, FileListSerializer, 
-    FileProgressSerializer, FileContentSerializer
+    FileProgressSerializer, FileContentSerializer,
+    UploadSessionSerializer
 )
-from .tasks import process_file_background
+from .chunked import (
+    ChunkError, UploadClosed, create_partial_file, write_chunk, lock_partial_file,
+    finalize_partial_file, restore_partial_file, remove_partial_file, hash_partial_file
+)
+from .tasks import (
+    process_file_background, process_files_background, detect_parser_type, csv_parsed_content,
+    find_parse_result, cache_parse_result, index_for_search_background
+)
+from .ingest import IngestUploadHandler, hash_upload
+from .workers import QueueFull, get_worker_pool
+from .pagination import KeysetPagination
+from .artifacts import artifacts_dir, from_media_path, parse_lock
+from .columnar import open_dataset
+from .csv_stream import read_csv_rows
+from .pdf_pages import extract_page, read_page
+from . import metrics, search
+from .progress import aread_progress, read_progress_many, watch_progress, write_progress
+
+ROWS_PAGE_SIZE = 100
+MAX_ROWS_PAGE_SIZE = 1000
+LONG_POLL_TIMEOUT = 25
+MAX_LONG_POLL_TIMEOUT = 60
+PDF_PAGE_CACHE_TIMEOUT = 3600
+MAX_PROGRESS_FILE_IDS = 500
+SEARCH_PAGE_SIZE = 20
+# Seconds an upload waits for a free worker slot before its file is queued instead
+INLINE_SLOT_TIMEOUT = 5
+MAX_SEARCH_PAGE_SIZE = 100
 
 
 class FileUploadView(generics.CreateAPIView):
@@ -25,21 +64,76 @@ class FileUploadView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        # Validate file size
-        file_obj = request.FILES.get('file')
-        if file_obj.size > settings.MAX_FILE_SIZE:
+        # Must be installed before request.data is first read. Every upload is
+        # hashed; CSVs are also parsed mid-transfer when that is enabled.
+        parser_type_for = detect_parser_type if settings.FILE_INGEST_WHILE_UPLOADING else None
+        request.upload_handlers.insert(
+            0, IngestUploadHandler(request._request, parser_type_for, max_size=settings.MAX_FILE_SIZE)
+        )
+        try:
+            return self.create_upload(request)
+        finally:
+            ingest = getattr(request._request, 'upload_ingest', None)
+            if ingest and ingest.csv_ingest:
+                ingest.csv_ingest.discard()
+    
+    def create_upload(self, request):
+        data = request.data
+        # The upload handler already stopped storing an oversized file
+        if getattr(request._request, 'upload_too_large', False):
             return Response({
                 'error': f'File size too large. Maximum size is {settings.MAX_FILE_SIZE} bytes.'
             }, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        
+        ingest = getattr(request._request, 'upload_ingest', None)
+        content_hash = ingest.content_hash if ingest else None
         
-        # Create file record
-        file_upload = serializer.save()
+        # Create file record; identical content is stored once and shared
+        stored_name = FileBlob.acquire(content_hash)
+        if stored_name:
+            try:
+                file_upload = serializer.save(content_hash=content_hash, stored_name=stored_name)
+            except Exception:
+                FileBlob.release(content_hash, stored_name)
+                raise
+        else:
+            file_upload = serializer.save(content_hash=content_hash)
+            FileBlob.register(content_hash, file_upload.file.name, file_upload.file_size)
         
-        # Start background processing
-        process_file_background(str(file_upload.id))
+        file_id = str(file_upload.id)
+        parser_type = detect_parser_type(file_upload.mime_type, file_upload.original_name)
+        csv_ingest = ingest.csv_ingest if ingest else None
+        with parse_lock(file_upload.file.path):
+            # Reuse the parse result of an earlier copy of the same content
+            parsed_content = find_parse_result(file_upload, parser_type) if stored_name else None
+            
+            # CSVs were parsed while they were being received; store the result
+            if parsed_content is None and csv_ingest:
+                parsed_content = self.store_ingested_csv(file_upload, ingest)
+            
+            if parsed_content is not None:
+                write_progress(
+                    file_id, 'ready', 100,
+                    parsed_content=parsed_content, processing_started_at=file_upload.created_at
+                )
+                index_for_search_background(file_id)
+                return Response({
+                    'file_id': file_id,
+                    'message': 'File uploaded and parsed successfully.',
+                    'status': 'ready',
+                    'progress': 100
+                }, status=status.HTTP_201_CREATED)
+        
+        # Queue background processing
+        try:
+            process_file_background(str(file_upload.id))
+        except QueueFull:
+            file_upload.delete()
+            return Response({
+                'error': 'Server is busy processing other files. Please retry later.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
         return Response({
             'file_id': str(file_upload.id),
@@ -47,15 +141,328 @@ class FileUploadView(generics.CreateAPIView):
             'status': file_upload.status,
             'progress': file_upload.progress
         }, status=status.HTTP_201_CREATED)
+    
+    def store_ingested_csv(self, file_upload, ingest):
+        """Profile and cache a CSV parsed during the transfer, or None to process it as usual.
+
+        This is the heavy part of an upload, so it runs in one of the worker
+        pool's slots; when none frees up in time the file is queued instead.
+        """
+        try:
+            with get_worker_pool().slot(timeout=INLINE_SLOT_TIMEOUT):
+                csv_ingest = ingest.csv_ingest
+                if not csv_ingest.finish():
+                    return None
+                artifacts = csv_ingest.attach(file_upload.file.path)
+                parsed_content = csv_parsed_content(csv_ingest.result, artifacts)
+                ingest.csv_ingest = None
+                cache_parse_result(file_upload, 'csv', file_upload.file.path, parsed_content)
+                return parsed_content
+        except QueueFull:
+            return None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def batch_upload_view(request):
+    """Upload many files in one request, sent as repeated ``files`` fields.
+    
+    The files are stored, inserted with one bulk INSERT and queued together,
+    so a batch costs a handful of queries instead of several per file.
+    """
+    file_objs = request.FILES.getlist('files')
+    if not file_objs:
+        return Response({'error': 'No files provided.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(file_objs) > settings.MAX_BATCH_FILES:
+        return Response({
+            'error': f'Too many files. Maximum is {settings.MAX_BATCH_FILES} per batch.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    batch = UploadBatch(user=request.user)
+    uploads = []
+    pending = []
+    results = []
+    for file_obj in file_objs:
+        if file_obj.size > settings.MAX_FILE_SIZE:
+            results.append({
+                'original_name': file_obj.name,
+                'error': f'File size too large. Maximum size is {settings.MAX_FILE_SIZE} bytes.'
+            })
+            continue
+        upload = FileUpload(
+            user=request.user,
+            batch=batch,
+            filename=file_obj.name,
+            original_name=file_obj.name,
+            file_size=file_obj.size,
+            mime_type=file_obj.content_type or 'application/octet-stream',
+            content_hash=hash_upload(file_obj)
+        )
+        uploads.append(upload)
+        pending.append((upload, file_obj))
+        results.append(upload)
+    
+    stored_names = []
+    try:
+        with transaction.atomic():
+            for upload, file_obj in pending:
+                # Identical content is stored once and shared, as with single
+                # uploads; the references roll back with the batch
+                stored_name = FileBlob.acquire(upload.content_hash)
+                if not stored_name:
+                    stored_name = default_storage.save(f'uploads/{file_obj.name}', file_obj)
+                    stored_names.append(stored_name)
+                    FileBlob.register(upload.content_hash, stored_name, file_obj.size)
+                upload.file = stored_name
+            batch.file_count = len(uploads)
+            batch.save()
+            FileUpload.objects.bulk_create(uploads)
+            # bulk_create skips FileUpload.save(), which keeps the stats buckets current
+            buckets = {}
+            for upload in uploads:
+                key = (upload.status, upload.mime_type)
+                files, size = buckets.get(key, (0, 0))
+                buckets[key] = (files + 1, size + upload.file_size)
+            for (file_status, mime_type), (files, size) in buckets.items():
+                UserFileStats.add(request.user.id, file_status, mime_type, files, size)
+    except Exception:
+        # Nothing references the files stored for a batch that didn't commit
+        for stored_name in stored_names:
+            default_storage.delete(stored_name)
+        raise
+    
+    try:
+        process_files_background([str(upload.id) for upload in uploads])
+    except QueueFull:
+        for upload in uploads:
+            upload.delete()
+        batch.delete()
+        return Response({
+            'error': 'Server is busy processing other files. Please retry later.'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    return Response({
+        'batch_id': str(batch.id),
+        'file_count': batch.file_count,
+        'files': [
+            result if isinstance(result, dict) else {
+                'file_id': str(result.id),
+                'original_name': result.original_name,
+                'status': result.status,
+                'progress': result.progress
+            }
+            for result in results
+        ]
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def batch_progress_view(request, pk):
+    """Aggregate progress of the files in a batch, from one GROUP BY query"""
+    batch = get_object_or_404(UploadBatch, id=pk, user=request.user)
+    counts = {}
+    total_progress = 0
+    for row in batch.files.values('status').annotate(count=Count('id'), progress=Sum('progress')):
+        counts[row['status']] = row['count']
+        total_progress += row['progress'] or 0
+    file_count = sum(counts.values())
+    finished = counts.get('ready', 0) + counts.get('failed', 0)
+    return Response({
+        'batch_id': str(batch.id),
+        'file_count': file_count,
+        'status': 'completed' if finished == file_count else 'processing',
+        'progress': round(total_progress / file_count) if file_count else 100,
+        'status_counts': counts
+    })
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """Start a resumable chunked upload"""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        session = serializer.save()
+        create_partial_file(session)
+
+
+class UploadSessionDetailView(generics.RetrieveDestroyAPIView):
+    """Check which chunks have arrived, or abort the upload"""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+    
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=kwargs['pk'])
+            if session.status == 'completing':
+                return Response({
+                    'error': 'Upload is completing.'
+                }, status=status.HTTP_409_CONFLICT)
+            remove_partial_file(session)
+            session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk_view(request, upload_id, index):
+    """Write one chunk of a chunked upload; chunks may arrive in any order"""
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    if session.status != 'active':
+        return Response({
+            'error': f'Upload is {session.status}.'
+        }, status=status.HTTP_409_CONFLICT)
+    
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        # The raw body is streamed to disk; request.data is never parsed
+        size = write_chunk(session, index, request.stream, content_length)
+    except UploadClosed as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    except (ChunkError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    with transaction.atomic():
+        # Completion may have claimed the upload while this chunk was written
+        session = UploadSession.objects.select_for_update().get(id=session.id)
+        if session.status != 'active':
+            return Response({
+                'error': f'Upload is {session.status}.'
+            }, status=status.HTTP_409_CONFLICT)
+        UploadChunk.objects.update_or_create(session=session, index=index, defaults={'size': size})
+    return Response({
+        'upload_id': str(session.id),
+        'index': index,
+        'size': size,
+        'received': session.chunks.count(),
+        'total_chunks': session.total_chunks
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload_view(request, upload_id):
+    """Assemble a chunked upload into a file and start processing it"""
+    with transaction.atomic():
+        session = get_object_or_404(
+            UploadSession.objects.select_for_update(), id=upload_id, user=request.user
+        )
+        if session.status != 'active':
+            return Response({
+                'error': f'Upload is {session.status}.'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        received = set(session.chunks.values_list('index', flat=True))
+        missing = [i for i in range(session.total_chunks) if i not in received]
+        if missing:
+            return Response({
+                'error': 'Upload is incomplete.',
+                'missing_chunks': missing
+            }, status=status.HTTP_409_CONFLICT)
+        # Claimed: other completions, new chunks and aborts now get a 409
+        session.status = 'completing'
+        session.save(update_fields=['status', 'updated_at'])
+    
+    try:
+        # Waits for chunk writes in progress; later ones find the file gone
+        with lock_partial_file(session):
+            # Identical content is stored once; the assembled copy is then dropped
+            content_hash = hash_partial_file(session)
+            stored_name = FileBlob.acquire(content_hash)
+            name = stored_name or finalize_partial_file(session)
+    except UploadClosed:
+        session.status = 'aborted'
+        session.save(update_fields=['status', 'updated_at'])
+        return Response({
+            'error': 'Upload data is gone. Please start a new upload.'
+        }, status=status.HTTP_409_CONFLICT)
+    except BaseException:
+        session.status = 'active'
+        session.save(update_fields=['status', 'updated_at'])
+        raise
+    try:
+        with transaction.atomic():
+            file_upload = FileUpload.objects.create(
+                user=request.user,
+                filename=os.path.basename(session.filename) if stored_name else os.path.basename(name),
+                original_name=session.filename,
+                file=name,
+                file_size=session.file_size,
+                mime_type=session.mime_type,
+                content_hash=content_hash
+            )
+            if not stored_name:
+                FileBlob.register(content_hash, name, session.file_size)
+    except BaseException:
+        # Undo the reference or the finalized file so completion can be retried
+        if stored_name:
+            FileBlob.release(content_hash, stored_name)
+        else:
+            restore_partial_file(session, name)
+        session.status = 'active'
+        session.save(update_fields=['status', 'updated_at'])
+        raise
+    
+    parser_type = detect_parser_type(file_upload.mime_type, file_upload.original_name)
+    parsed_content = find_parse_result(file_upload, parser_type) if stored_name else None
+    if parsed_content is not None:
+        write_progress(
+            str(file_upload.id), 'ready', 100,
+            parsed_content=parsed_content, processing_started_at=file_upload.created_at
+        )
+        file_upload.status, file_upload.progress = 'ready', 100
+        index_for_search_background(str(file_upload.id))
+    else:
+        try:
+            process_file_background(str(file_upload.id))
+        except QueueFull:
+            if stored_name:
+                file_upload.delete()
+            else:
+                # Put the data back so the client can simply retry completion
+                FileBlob.release(content_hash, name)
+                FileUpload.objects.filter(id=file_upload.id).delete()
+                restore_partial_file(session, name)
+            session.status = 'active'
+            session.save(update_fields=['status', 'updated_at'])
+            return Response({
+                'error': 'Server is busy processing other files. Please retry later.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    if stored_name:
+        remove_partial_file(session)
+    session.status = 'completed'
+    session.file_upload = file_upload
+    session.save(update_fields=['status', 'file_upload', 'updated_at'])
+    session.chunks.all().delete()
+    
+    return Response({
+        'file_id': str(file_upload.id),
+        'message': (
+            'File uploaded and parsed successfully.' if file_upload.status == 'ready'
+            else 'File uploaded successfully. Processing started.'
+        ),
+        'status': file_upload.status,
+        'progress': file_upload.progress
+    }, status=status.HTTP_201_CREATED)
 
 
 class FileListView(generics.ListAPIView):
-    """List all files for the authenticated user"""
+    """List all files for the authenticated user, newest first"""
     serializer_class = FileListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    # The keyset order is fixed, so client-chosen ordering isn't offered
+    filter_backends = []
     
     def get_queryset(self):
-        return FileUpload.objects.filter(user=self.request.user)
+        # Only the listed columns; parsed_content can be megabytes per row
+        return FileUpload.objects.filter(user=self.request.user).only(*FileListSerializer.Meta.fields)
 
 
 class FileDetailView(generics.RetrieveDestroyAPIView):
@@ -114,6 +521,253 @@ def file_progress_view(request, file_id):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def file_progress_many_view(request):
+    """Get progress of many files at once, given as ``{"file_ids": [...]}``"""
+    file_ids = request.data.get('file_ids')
+    if not isinstance(file_ids, list) or not file_ids:
+        return Response({'error': 'file_ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(file_ids) > MAX_PROGRESS_FILE_IDS:
+        return Response({
+            'error': f'Too many file_ids. Maximum is {MAX_PROGRESS_FILE_IDS}.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        file_ids = list(dict.fromkeys(str(uuid.UUID(str(file_id))) for file_id in file_ids))
+    except ValueError:
+        return Response({'error': 'file_ids must be file UUIDs.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    found = read_progress_many(file_ids, request.user.id)
+    return Response({
+        'files': [{'file_id': file_id, **found[file_id]} for file_id in file_ids if file_id in found],
+        'not_found': [file_id for file_id in file_ids if file_id not in found]
+    })
+
+
+async def authenticate_jwt(request):
+    """Resolve the JWT user for a plain async view, or None.
+
+    DRF views are sync-only, so the streaming endpoints authenticate here.
+    The token may also come from a ``token`` query parameter because browser
+    EventSource connections cannot set an Authorization header.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is None:
+        return None
+    try:
+        validated_token = auth.get_validated_token(raw_token)
+        return await sync_to_async(auth.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def get_watchable_file(request, file_id):
+    """Return (file_id, None) for an owned file or (None, error response)"""
+    if request.method != 'GET':
+        return None, JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    user = await authenticate_jwt(request)
+    if user is None:
+        return None, JsonResponse({
+            'detail': 'Authentication credentials were not provided or are invalid.'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    if not await FileUpload.objects.filter(id=file_id, user=user).aexists():
+        return None, JsonResponse({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    return str(file_id), None
+
+
+async def file_progress_stream_view(request, file_id):
+    """Stream file progress as Server-Sent Events until processing finishes"""
+    file_id, error_response = await get_watchable_file(request, file_id)
+    if error_response:
+        return error_response
+    
+    async def events():
+        yield 'retry: 2000\n\n'
+        async for progress_data in watch_progress(file_id):
+            if progress_data is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: progress\ndata: {json.dumps({'file_id': file_id, **progress_data})}\n\n"
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def file_progress_wait_view(request, file_id):
+    """Long-poll for progress.
+
+    Returns as soon as status/progress differ from the ``status`` and
+    ``progress`` query parameters the client already has, or after
+    ``timeout`` seconds with the current state.
+    """
+    file_id, error_response = await get_watchable_file(request, file_id)
+    if error_response:
+        return error_response
+    
+    known_status = request.GET.get('status')
+    known_progress = request.GET.get('progress')
+    try:
+        timeout = min(float(request.GET.get('timeout', LONG_POLL_TIMEOUT)), MAX_LONG_POLL_TIMEOUT)
+    except ValueError:
+        return JsonResponse({'error': 'timeout must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    async def next_change():
+        async for progress_data in watch_progress(file_id):
+            if progress_data is None:
+                continue
+            if progress_data['status'] != known_status or str(progress_data['progress']) != known_progress:
+                return progress_data
+        return None
+    
+    try:
+        progress_data = await asyncio.wait_for(next_change(), max(timeout, 0))
+    except asyncio.TimeoutError:
+        progress_data = None
+    if progress_data is None:
+        progress_data = await aread_progress(file_id)
+    return JsonResponse({'file_id': file_id, **(progress_data or {})})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def file_rows_view(request, pk):
+    """Get a page of rows from a parsed CSV or Excel file"""
+    file_upload = get_object_or_404(FileUpload, id=pk, user=request.user)
+    
+    if file_upload.status != 'ready':
+        return Response({
+            'error': 'File is not ready.',
+            'status': file_upload.status,
+            'progress': file_upload.progress
+        }, status=status.HTTP_409_CONFLICT)
+    
+    try:
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', ROWS_PAGE_SIZE))
+    except ValueError:
+        return Response({
+            'error': 'offset and limit must be integers.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if offset < 0 or limit < 1:
+        return Response({
+            'error': 'offset must be >= 0 and limit must be >= 1.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(limit, MAX_ROWS_PAGE_SIZE)
+    
+    content = file_upload.parsed_content or {}
+    if 'row_index' in content:
+        # Seek straight to the page through the byte-offset index
+        rows = read_csv_rows(
+            file_upload.file.path,
+            from_media_path(content['row_index']['path']),
+            content['row_index'],
+            content['headers'],
+            offset,
+            limit
+        )
+    elif 'dataset' in content:
+        rows = open_dataset(content['dataset']).rows(offset, offset + limit)
+    else:
+        return Response({
+            'error': 'Row access is not supported for this file type.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'file_id': str(file_upload.id),
+        'offset': offset,
+        'limit': limit,
+        'total_rows': content.get('total_rows'),
+        'headers': content.get('headers', []),
+        'rows': rows
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def file_page_view(request, pk, page):
+    """Get the text of one PDF page, extracting it on demand"""
+    file_upload = get_object_or_404(FileUpload, id=pk, user=request.user)
+    
+    if detect_parser_type(file_upload.mime_type, file_upload.original_name) != 'pdf':
+        return Response({
+            'error': 'Page access is only supported for PDF files.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    pages = (file_upload.parsed_content or {}).get('pages')
+    if page < 1 or (pages is not None and page > pages):
+        return Response({'error': 'Page not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    cache_key = f'pdf_page_{file_upload.id}_{page}'
+    text = cache.get(cache_key)
+    if text is None:
+        # Pages extracted so far are on disk, even while the file is still processing
+        pages_dir = os.path.join(artifacts_dir(file_upload.file.path), 'pages')
+        text = read_page(pages_dir, page)
+        if text is None:
+            try:
+                text = extract_page(file_upload.file.path, page, pages_dir)
+            except IndexError:
+                return Response({'error': 'Page not found.'}, status=status.HTTP_404_NOT_FOUND)
+            except Exception as e:
+                return Response({
+                    'error': f'Could not extract page: {str(e)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        cache.set(cache_key, text, timeout=PDF_PAGE_CACHE_TIMEOUT)
+    
+    return Response({
+        'file_id': str(file_upload.id),
+        'page': page,
+        'pages': pages,
+        'content': text,
+        'word_count': len(text.split()),
+        'character_count': len(text)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def file_stats_view(request):
+    """Storage and processing totals for the user's files"""
+    return Response(UserFileStats.summary(request.user))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def file_search_view(request):
+    """Search the contents of the user's files"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = search.search(request.user.id, query, limit=limit)
+    # Drop hits for files deleted since they were indexed
+    names = {
+        str(file_id): name for file_id, name in FileUpload.objects.filter(
+            user=request.user, id__in=[result['file_id'] for result in results]
+        ).values_list('id', 'original_name')
+    }
+    results = [
+        {'original_name': names[result['file_id']], **result}
+        for result in results if result['file_id'] in names
+    ]
+    return Response({
+        'query': query,
+        'count': len(results),
+        'results': results
+    })
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check_view(request):
@@ -125,6 +779,19 @@ def health_check_view(request):
     })
 
 
+@require_GET
+def metrics_view(request):
+    """File processing metrics of this process in the Prometheus text format.
+
+    Open unless METRICS_TOKEN is set, in which case scrapers must send it
+    as a bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def api_docs_view(request):
@@ -140,11 +807,26 @@ def api_docs_view(request):
             'POST /api/auth/logout/': 'Logout user',
             'GET /api/auth/profile/': 'Get user profile',
             'POST /api/files/': 'Upload a file',
+            'POST /api/files/batch/': 'Upload several files at once (repeated "files" fields)',
+            'GET /api/files/batch/{batch_id}/': 'Get aggregate progress of a batch upload',
+            'POST /api/files/uploads/': 'Start a chunked upload',
+            'PUT /api/files/uploads/{upload_id}/chunks/{n}/': 'Upload chunk n (raw body, any order)',
+            'GET /api/files/uploads/{upload_id}/': 'Get received chunks of a chunked upload',
+            'POST /api/files/uploads/{upload_id}/complete/': 'Assemble a chunked upload and process it',
+            'DELETE /api/files/uploads/{upload_id}/': 'Abort a chunked upload',
             'GET /api/files/': 'List all files',
             'GET /api/files/{id}/': 'Get file content',
             'GET /api/files/{id}/progress/': 'Get file progress',
+            'POST /api/files/progress/': 'Get progress of many files ({"file_ids": [...]})',
+            'GET /api/files/{id}/progress/stream/': 'Stream file progress (Server-Sent Events)',
+            'GET /api/files/{id}/progress/wait/?status=S&progress=P': 'Long-poll until file progress changes',
+            'GET /api/files/{id}/rows/?offset=N&limit=M': 'Get a page of rows from a CSV or Excel file',
+            'GET /api/files/{id}/pages/{n}/': 'Get the text of page n of a PDF file',
+            'GET /api/files/search/?q=TERMS': 'Search the contents of your files',
+            'GET /api/files/stats/': 'Get file counts, bytes by status and type, and average processing time',
             'DELETE /api/files/{id}/': 'Delete a file',
             'GET /health/': 'Health check',
+            'GET /metrics': 'File processing metrics in the Prometheus text format',
         },
-        'websocket': 'ws://localhost:8000/ws/files/{file_id}/ for real-time progress updates'
+        'progress_stream': 'GET /api/files/{id}/progress/stream/ (text/event-stream, ?token= accepted) for real-time progress updates'
     })
\ No newline at end of file
@@ -0,0 +1,301 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the processing queue cannot accept another job"""
+
+
+class WorkerPool:
+    """Bounded pool of worker threads consuming a FIFO job queue.
+
+    At most ``max_workers`` jobs run at once, so a burst of uploads costs a
+    fixed number of threads and database connections instead of one per file.
+    Jobs beyond that wait in the queue; ``max_queue_size`` of 0 means unbounded.
+    Work run in other threads through slot() counts towards the same limit.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=0, name='file-worker'):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._active = 0
+        # Jobs a worker has taken off the queue but that wait for a slot held through slot()
+        self._waiting = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for execution on a worker thread"""
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit jobs after shutdown')
+            if self.max_queue_size and self._queued_locked() >= self.max_queue_size:
+                raise QueueFull(f'Processing queue is full ({self.max_queue_size} jobs waiting)')
+            self._queue.put_nowait((fn, args, kwargs))
+            self._submitted += 1
+            self._start_workers_locked(1)
+
+    def submit_many(self, fn, args_list):
+        """Queue ``fn(*args)`` for every entry of ``args_list`` in one step.
+
+        Either all jobs are queued or, if the queue hasn't room for all of
+        them, none are and QueueFull is raised.
+        """
+        args_list = list(args_list)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit jobs after shutdown')
+            # Only submitters change the queue's size upwards, and they hold the lock
+            if self.max_queue_size and self._queued_locked() + len(args_list) > self.max_queue_size:
+                raise QueueFull(
+                    f'Processing queue has no room for {len(args_list)} jobs ({self.max_queue_size} max waiting)'
+                )
+            for args in args_list:
+                self._queue.put_nowait((fn, tuple(args), {}))
+            self._submitted += len(args_list)
+            self._start_workers_locked(len(args_list))
+
+    def _start_workers_locked(self, jobs):
+        # Workers are started lazily so idle processes don't carry threads
+        while jobs > 0 and len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self._worker,
+                name=f'{self.name}-{len(self._threads) + 1}',
+                daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+            jobs -= 1
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            fn, args, kwargs = job
+            with self._lock:
+                self._waiting += 1
+            self._slots.acquire()
+            with self._lock:
+                self._waiting -= 1
+                self._active += 1
+            close_old_connections()
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.exception('Background job %r failed', fn)
+                with self._lock:
+                    self._failed += 1
+            finally:
+                # Give the connection back instead of holding one per idle thread
+                connection.close()
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                self._slots.release()
+                self._queue.task_done()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold one of the ``max_workers`` slots while working in the calling thread.
+
+        Requests that do heavy work inline use this so it can't run on top of
+        a full pool. Raises QueueFull if no slot frees up within ``timeout``.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise QueueFull(f'All {self.max_workers} workers are busy')
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def _queued_locked(self):
+        return self._queue.qsize() + self._waiting
+
+    def queue_depth(self):
+        """Number of jobs waiting for a free worker, including those dequeued but waiting for a slot"""
+        with self._lock:
+            return self._queued_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue_size': self.max_queue_size,
+                'workers': len(self._threads),
+                'active': self._active,
+                'queued': self._queued_locked(),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+            }
+
+    def join(self):
+        """Block until every queued job has finished"""
+        self._queue.join()
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop accepting jobs and let the workers drain the queue.
+
+        Returns True if every worker exited within ``timeout`` seconds.
+        """
+        with self._lock:
+            if self._shutdown:
+                return True
+            self._shutdown = True
+            threads = list(self._threads)
+        for _ in threads:
+            # Sentinels go behind the pending jobs, so the queue drains first
+            self._queue.put(None)
+        if not wait:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        drained = not any(thread.is_alive() for thread in threads)
+        if not drained:
+            logger.warning('%s: shutdown timed out with %d jobs still queued', self.name, self.queue_depth())
+        return drained
+
+
+class InlineExecutor:
+    """Runs jobs synchronously in the caller; used when FILE_PROCESSING_WORKERS is 0"""
+    max_workers = 0
+    max_queue_size = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._submitted += 1
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._completed += 1
+
+    def submit_many(self, fn, args_list):
+        for args in args_list:
+            self.submit(fn, *args)
+
+    def slot(self, timeout=None):
+        return nullcontext()
+
+    def queue_depth(self):
+        return 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': 0, 'max_queue_size': 0, 'workers': 0, 'active': 0, 'queued': 0,
+                'submitted': self._submitted, 'completed': self._completed, 'failed': self._failed,
+            }
+
+    def join(self):
+        pass
+
+    def shutdown(self, wait=True, timeout=None):
+        return True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Return the process-wide pool, creating it from settings on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                max_workers = getattr(settings, 'FILE_PROCESSING_WORKERS', 4)
+                if max_workers == 0:
+                    _pool = InlineExecutor()
+                else:
+                    _pool = WorkerPool(
+                        max_workers=max_workers,
+                        max_queue_size=getattr(settings, 'FILE_PROCESSING_QUEUE_SIZE', 0),
+                    )
+                    atexit.register(_drain_on_exit, _pool)
+    return _pool
+
+
+def _drain_on_exit(pool):
+    pool.shutdown(wait=True, timeout=getattr(settings, 'FILE_PROCESSING_DRAIN_TIMEOUT', 30))
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _init_parser_process(settings_module):
+    # Spawned children start from a blank interpreter, so Django needs setting up
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def parser_process_count():
+    """Size of the parser process pool"""
+    return getattr(settings, 'FILE_PARSER_PROCESSES', None) or os.cpu_count()
+
+
+def get_process_pool():
+    """Return the process pool used for CPU-bound parsers, creating it on first use"""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                # spawn rather than fork: forking a threaded web worker can
+                # copy held locks and open database connections into the child
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=parser_process_count(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_parser_process,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'file_parser_project.settings'),),
+                )
+                atexit.register(_process_pool.shutdown, wait=True)
+    return _process_pool
+
+
+def reset_process_pool():
+    """Discard the process pool, e.g. after a child died and broke it"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
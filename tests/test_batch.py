@@ -0,0 +1,128 @@
+import os
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from files import views
+from files.models import FileUpload, FileBlob, UploadBatch, UserFileStats
+from files.progress import write_progress
+from files.workers import QueueFull
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestBatchUpload:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        self.queued = []
+        monkeypatch.setattr(views, 'process_files_background', self.queued.append)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, *files):
+        return self.client.post(reverse('batch-upload'), {'files': list(files)}, format='multipart')
+
+    def test_batch_is_stored_and_queued_together(self):
+        """Test that every file in a batch is created and queued in one call"""
+        response = self.upload(
+            SimpleUploadedFile('a.csv', b'a,b\n1,2\n', content_type='text/csv'),
+            SimpleUploadedFile('b.csv', b'a,b\n1,2\n', content_type='text/csv'),
+            SimpleUploadedFile('c.pdf', b'%PDF-1.4', content_type='application/pdf')
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['file_count'] == 3
+        file_ids = [f['file_id'] for f in response.data['files']]
+        assert self.queued == [file_ids]
+        batch = UploadBatch.objects.get(id=response.data['batch_id'])
+        assert batch.files.count() == 3
+        # Identical content is stored once
+        a, b = FileUpload.objects.filter(original_name__in=['a.csv', 'b.csv']).order_by('original_name')
+        assert a.file.name == b.file.name
+        assert FileBlob.objects.get(content_hash=a.content_hash).ref_count == 2
+        assert UserFileStats.summary(self.user)['bytes_by_mime_type'] == {'text/csv': 16, 'application/pdf': 8}
+
+    def test_oversized_files_are_reported_per_file(self, settings):
+        """Test that a file over the size limit fails alone"""
+        settings.MAX_FILE_SIZE = 10
+        response = self.upload(
+            SimpleUploadedFile('small.csv', b'a\n1\n', content_type='text/csv'),
+            SimpleUploadedFile('big.csv', b'a\n' + b'1\n' * 20, content_type='text/csv')
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['file_count'] == 1
+        assert 'error' in response.data['files'][1]
+        assert FileUpload.objects.count() == 1
+
+    def test_queue_full_rolls_back_batch(self, monkeypatch):
+        """Test that a batch the queue can't take leaves nothing behind"""
+        def reject(file_ids):
+            raise QueueFull()
+        monkeypatch.setattr(views, 'process_files_background', reject)
+
+        response = self.upload(SimpleUploadedFile('a.csv', b'a\n1\n', content_type='text/csv'))
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert not FileUpload.objects.exists()
+        assert not UploadBatch.objects.exists()
+        assert not FileBlob.objects.exists()
+        assert UserFileStats.summary(self.user)['file_count'] == 0
+
+    def test_failed_batch_leaves_no_files_behind(self, tmp_path, monkeypatch):
+        """Test that stored files and blob references are undone when the batch can't be saved"""
+        def broken(objs, *args, **kwargs):
+            raise RuntimeError('insert failed')
+        monkeypatch.setattr(FileUpload.objects, 'bulk_create', broken)
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('batch-upload'), {'files': [
+            SimpleUploadedFile('a.csv', b'a,b\n1,2\n', content_type='text/csv'),
+            SimpleUploadedFile('b.csv', b'a,b\n3,4\n', content_type='text/csv'),
+        ]}, format='multipart')
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert not FileBlob.objects.exists()
+        assert not UploadBatch.objects.exists()
+        assert os.listdir(tmp_path / 'uploads') == []
+
+    def test_batch_progress_aggregates_files(self):
+        """Test that batch progress sums up the state of its files"""
+        response = self.upload(
+            SimpleUploadedFile('a.csv', b'a\n1\n', content_type='text/csv'),
+            SimpleUploadedFile('b.csv', b'a\n2\n', content_type='text/csv')
+        )
+        first, second = [f['file_id'] for f in response.data['files']]
+        url = reverse('batch-progress', kwargs={'pk': response.data['batch_id']})
+
+        write_progress(first, 'ready', 100)
+        write_progress(second, 'processing', 50)
+        progress = self.client.get(url).data
+        assert progress['status'] == 'processing'
+        assert progress['progress'] == 75
+        assert progress['status_counts'] == {'ready': 1, 'processing': 1}
+
+        write_progress(second, 'failed', 0)
+        assert self.client.get(url).data['status'] == 'completed'
+
+    def test_batch_progress_is_private(self):
+        """Test that another user's batch is not found"""
+        response = self.upload(SimpleUploadedFile('a.csv', b'a\n1\n', content_type='text/csv'))
+        other = User.objects.create_user(username='o', email='o@example.com', password='pass12345')
+        self.client.force_authenticate(user=other)
+
+        progress = self.client.get(reverse('batch-progress', kwargs={'pk': response.data['batch_id']}))
+
+        assert progress.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_empty_batch_is_rejected(self):
+        """Test that a batch needs at least one file"""
+        response = self.client.post(reverse('batch-upload'), {}, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,63 @@
+import pytest
+from files import benchmarks
+
+
+@pytest.fixture
+def tiny_sizes(monkeypatch):
+    monkeypatch.setitem(benchmarks.SIZES, 'tiny', {'rows': 60, 'pages': 2})
+
+
+class TestBenchmarks:
+    def test_corpora_are_deterministic(self, tmp_path):
+        """Test that the same seed writes byte-identical files"""
+        for name, write in [
+            ('a.csv', lambda path: benchmarks.write_csv(path, 20, wide=True)),
+            ('a.xlsx', lambda path: benchmarks.write_xlsx(path, 30)),
+            ('a.pdf', lambda path: benchmarks.write_pdf(path, 2)),
+        ]:
+            first = write(str(tmp_path / f'1-{name}'))
+            second = write(str(tmp_path / f'2-{name}'))
+            with open(first, 'rb') as a, open(second, 'rb') as b:
+                assert a.read() == b.read()
+
+    def test_run_measures_every_case(self, tmp_path, tiny_sizes):
+        """Test that every parser runs on its corpus and the results are complete"""
+        results = benchmarks.run(
+            str(tmp_path), list(benchmarks.CORPORA), ['tiny'], ['python', 'pandas'], isolate=False
+        )
+
+        cases = {result['case']: result for result in results['results']}
+        assert set(cases) == {
+            'csv-narrow/tiny/python', 'csv-narrow/tiny/pandas', 'csv-wide/tiny/python',
+            'csv-wide/tiny/pandas', 'xlsx-multi/tiny', 'pdf-text/tiny'
+        }
+        assert cases['csv-narrow/tiny/pandas']['rows'] == 60
+        assert cases['csv-wide/tiny/python']['rows'] == 6
+        assert cases['xlsx-multi/tiny']['rows'] == 6
+        assert cases['pdf-text/tiny']['rows'] == 2
+        for result in cases.values():
+            assert result['seconds'] > 0
+            assert result['rows_per_second'] > 0
+            assert result['mb_per_second'] > 0
+            assert result['peak_rss_bytes'] > 0
+            assert result['tracemalloc_peak_bytes'] > 0
+        assert results['environment']['python']
+        # Parse artifacts are cleaned up; only the corpora are left
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'csv-narrow-tiny.csv', 'csv-wide-tiny.csv', 'pdf-text-tiny.pdf', 'xlsx-multi-tiny.xlsx'
+        ]
+
+    def test_compare_flags_slower_cases(self):
+        """Test that only cases slower by more than the threshold are regressions"""
+        baseline = {'results': [
+            {'case': 'a', 'seconds': 1.0}, {'case': 'b', 'seconds': 1.0}, {'case': 'gone', 'seconds': 1.0}
+        ]}
+        current = {'results': [
+            {'case': 'a', 'seconds': 1.05}, {'case': 'b', 'seconds': 1.5}, {'case': 'new', 'seconds': 1.0}
+        ]}
+
+        rows, regressions = benchmarks.compare(baseline, current, threshold=0.1)
+
+        assert [row[0] for row in rows] == ['a', 'b']
+        assert rows[1][3] == pytest.approx(0.5)
+        assert regressions == ['b']
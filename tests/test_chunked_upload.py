@@ -0,0 +1,205 @@
+import os
+import uuid
+from datetime import timedelta
+from io import StringIO
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from files import views
+from files.models import FileBlob, FileUpload, UploadSession
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestChunkedUpload:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.MIN_UPLOAD_CHUNK_SIZE = 1
+        self.processed = []
+        monkeypatch.setattr(views, 'process_file_background', self.processed.append)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def start_upload(self, content, chunk_size):
+        url = reverse('upload-session-create')
+        response = self.client.post(url, {
+            'filename': 'data.csv',
+            'file_size': len(content),
+            'chunk_size': chunk_size
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.data['upload_id']
+
+    def put_chunk(self, upload_id, index, data):
+        url = reverse('upload-chunk', kwargs={'upload_id': upload_id, 'index': index})
+        return self.client.put(url, data=data, content_type='application/octet-stream')
+
+    def test_out_of_order_chunks_assemble_into_file(self):
+        """Test that chunks sent out of order produce the original file"""
+        content = b'id,name\n1,alpha\n2,beta\n3,gamma\n'
+        upload_id = self.start_upload(content, chunk_size=10)
+        session = UploadSession.objects.get(id=upload_id)
+        assert session.total_chunks == 4
+        assert session.mime_type == 'text/csv'
+
+        for index in [3, 1, 0, 2]:
+            chunk = content[index * 10:(index + 1) * 10]
+            response = self.put_chunk(upload_id, index, chunk)
+            assert response.status_code == status.HTTP_200_OK
+
+        response = self.client.post(reverse('upload-complete', kwargs={'upload_id': upload_id}))
+
+        assert response.status_code == status.HTTP_201_CREATED
+        file_upload = FileUpload.objects.get(id=response.data['file_id'])
+        with open(file_upload.file.path, 'rb') as f:
+            assert f.read() == content
+        assert file_upload.original_name == 'data.csv'
+        assert self.processed == [str(file_upload.id)]
+
+    def test_missing_chunks_block_completion(self):
+        """Test that completion lists missing chunks so only those are retried"""
+        content = b'x' * 25
+        upload_id = self.start_upload(content, chunk_size=10)
+        self.put_chunk(upload_id, 1, content[10:20])
+
+        detail = self.client.get(reverse('upload-session-detail', kwargs={'pk': upload_id}))
+        assert detail.data['received_chunks'] == [1]
+
+        response = self.client.post(reverse('upload-complete', kwargs={'upload_id': upload_id}))
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['missing_chunks'] == [0, 2]
+
+    def test_wrong_chunk_size_is_rejected(self):
+        """Test that a chunk whose length doesn't match the layout is refused"""
+        upload_id = self.start_upload(b'x' * 25, chunk_size=10)
+
+        assert self.put_chunk(upload_id, 0, b'x' * 9).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.put_chunk(upload_id, 2, b'x' * 5).status_code == status.HTTP_200_OK
+        assert self.put_chunk(upload_id, 3, b'x').status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_abort_removes_partial_file(self):
+        """Test that deleting an upload session removes its data"""
+        upload_id = self.start_upload(b'x' * 25, chunk_size=10)
+        session = UploadSession.objects.get(id=upload_id)
+
+        response = self.client.delete(reverse('upload-session-detail', kwargs={'pk': upload_id}))
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not UploadSession.objects.filter(id=upload_id).exists()
+        assert not os.path.exists(session.partial_path)
+
+    def test_duplicate_content_is_not_stored_twice(self):
+        """Test that completing an upload of known content reuses the stored file"""
+        content = b'id,name\n1,alpha\n'
+        file_ids = []
+        for _ in range(2):
+            upload_id = self.start_upload(content, chunk_size=len(content))
+            self.put_chunk(upload_id, 0, content)
+            response = self.client.post(reverse('upload-complete', kwargs={'upload_id': upload_id}))
+            assert response.status_code == status.HTTP_201_CREATED
+            file_ids.append(response.data['file_id'])
+
+        first, second = (FileUpload.objects.get(id=file_id) for file_id in file_ids)
+        assert second.file.name == first.file.name
+        assert second.content_hash == first.content_hash
+        assert sorted(os.listdir(os.path.dirname(first.file.path))) == ['data.csv', 'partial']
+
+    def test_chunks_after_completion_conflict(self):
+        """Test that completed uploads refuse further chunks and completions"""
+        content = b'id,name\n1,alpha\n'
+        upload_id = self.start_upload(content, chunk_size=len(content))
+        self.put_chunk(upload_id, 0, content)
+        complete_url = reverse('upload-complete', kwargs={'upload_id': upload_id})
+        assert self.client.post(complete_url).status_code == status.HTTP_201_CREATED
+
+        assert self.put_chunk(upload_id, 0, content).status_code == status.HTTP_409_CONFLICT
+        assert self.client.post(complete_url).status_code == status.HTTP_409_CONFLICT
+        assert FileUpload.objects.count() == 1
+
+    def test_chunk_for_finalized_file_conflicts(self):
+        """Test that a chunk whose partial file was moved away is refused, not written"""
+        upload_id = self.start_upload(b'x' * 20, chunk_size=10)
+        session = UploadSession.objects.get(id=upload_id)
+        os.remove(session.partial_path)
+
+        assert self.put_chunk(upload_id, 0, b'x' * 10).status_code == status.HTTP_409_CONFLICT
+        assert not session.chunks.exists()
+
+    def test_failed_completion_can_be_retried(self, monkeypatch):
+        """Test that a completion failing to save the file leaves the session retryable and refs intact"""
+        content = b'id,name\n1,alpha\n'
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=self.user)
+        create = FileUpload.objects.create
+        calls = []
+        def failing_create(**kwargs):
+            # The first attempt to complete each upload fails
+            calls.append(kwargs)
+            if len(calls) % 2:
+                raise RuntimeError('insert failed')
+            return create(**kwargs)
+        monkeypatch.setattr(FileUpload.objects, 'create', failing_create)
+        upload_ids = []
+        # New content, then the same content again, which is shared with the first upload
+        for _ in range(2):
+            upload_id = self.start_upload(content, chunk_size=len(content))
+            self.put_chunk(upload_id, 0, content)
+            url = reverse('upload-complete', kwargs={'upload_id': upload_id})
+
+            failed = client.post(url)
+            session = UploadSession.objects.get(id=upload_id)
+            assert failed.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+            assert session.status == 'active'
+            assert os.path.exists(session.partial_path)
+            assert FileBlob.objects.filter(ref_count__gt=len(upload_ids)).count() == 0
+
+            assert client.post(url).status_code == status.HTTP_201_CREATED
+            upload_ids.append(upload_id)
+
+        assert FileBlob.objects.get().ref_count == 2
+        assert FileUpload.objects.count() == 2
+
+    def test_idle_sessions_expire(self):
+        """Test that abandoned uploads and orphaned partial files are cleaned up"""
+        idle_id = self.start_upload(b'x' * 20, chunk_size=10)
+        self.put_chunk(idle_id, 0, b'x' * 10)
+        fresh_id = self.start_upload(b'x' * 20, chunk_size=10)
+        idle = UploadSession.objects.get(id=idle_id)
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        UploadSession.objects.filter(id=idle_id).update(updated_at=an_hour_ago)
+        idle.chunks.update(created_at=an_hour_ago)
+        orphan = os.path.join(UploadSession.partial_dir(), 'gone.part')
+        open(orphan, 'wb').close()
+        os.utime(orphan, (an_hour_ago.timestamp(), an_hour_ago.timestamp()))
+
+        call_command('expire_upload_sessions', hours=0.5, stdout=StringIO())
+
+        assert list(UploadSession.objects.values_list('id', flat=True)) == [uuid.UUID(fresh_id)]
+        assert not os.path.exists(idle.partial_path)
+        assert not os.path.exists(orphan)
+        assert os.path.exists(UploadSession.objects.get(id=fresh_id).partial_path)
+
+    def test_stale_ingest_staging_directories_expire(self):
+        """Test that the sweep removes staging directories left by an interrupted ingest"""
+        fresh_id = self.start_upload(b'x' * 20, chunk_size=10)
+        an_hour_ago = (timezone.now() - timedelta(hours=1)).timestamp()
+        staging = os.path.join(UploadSession.partial_dir(), f'{uuid.uuid4()}.parsed')
+        os.makedirs(os.path.join(staging, 'dataset'))
+        open(os.path.join(staging, 'dataset', 'meta.json'), 'w').close()
+        os.utime(staging, (an_hour_ago, an_hour_ago))
+
+        call_command('expire_upload_sessions', hours=0.5, stdout=StringIO())
+
+        assert not os.path.exists(staging)
+        assert os.path.exists(UploadSession.objects.get(id=fresh_id).partial_path)
@@ -0,0 +1,65 @@
+import math
+import numpy as np
+from files.columnar import ColumnarWriter, ColumnarDataset
+
+
+class TestColumnarStorage:
+    def test_round_trip_with_type_inference(self, tmp_path):
+        """Test that columns get typed storage and read back as rows"""
+        path = str(tmp_path / 'dataset')
+        writer = ColumnarWriter(path, ['id', 'price', 'name', 'zip'], chunk_rows=2)
+        writer.append(['1', '9.5', 'Widget', '02134'])
+        writer.append(['2', '', 'Gadget, large', '10001'])
+        writer.append(['3', '4', None])
+        meta = writer.close()
+
+        types = {c['name']: c['type'] for c in meta['columns']}
+        assert meta['num_rows'] == 3
+        assert types == {'id': 'int64', 'price': 'float64', 'name': 'string', 'zip': 'string'}
+
+        dataset = ColumnarDataset(path)
+        assert isinstance(dataset.column('id'), np.memmap)
+        assert dataset.column('id').sum() == 6
+        rows = dataset.rows()
+        assert rows[0] == {'id': 1, 'price': 9.5, 'name': 'Widget', 'zip': '02134'}
+        assert rows[1]['price'] is None
+        assert rows[2] == {'id': 3, 'price': 4.0, 'name': None, 'zip': None}
+        assert dataset.rows(1, 2) == [rows[1]]
+
+    def test_float_column_memory_maps_nan_for_blanks(self, tmp_path):
+        """Test that blanks in numeric columns are stored as NaN"""
+        path = str(tmp_path / 'dataset')
+        writer = ColumnarWriter(path, ['value'])
+        for value in ['1.5', '', '2.5']:
+            writer.append([value])
+        writer.close()
+
+        column = ColumnarDataset(path).column('value')
+        assert column.dtype == np.float64
+        assert math.isnan(column[1])
+        assert np.nansum(column) == 4.0
+
+    def test_empty_dataset(self, tmp_path):
+        """Test that a header-only table can be written and read"""
+        path = str(tmp_path / 'dataset')
+        ColumnarWriter(path, ['a', 'b']).close()
+
+        dataset = ColumnarDataset(path)
+        assert dataset.num_rows == 0
+        assert dataset.rows() == []
+
+    def test_non_finite_numbers_stay_text(self, tmp_path):
+        """Test that columns holding inf or overflowing values are not typed numeric"""
+        path = str(tmp_path / 'dataset')
+        writer = ColumnarWriter(path, ['a', 'b', 'c'])
+        writer.append(['1', 'inf', '2'])
+        writer.append(['2', '3.5', '1e999'])
+        writer.append(['3', '-Infinity', '4'])
+        meta = writer.close()
+
+        types = {c['name']: c['type'] for c in meta['columns']}
+        assert types == {'a': 'int64', 'b': 'string', 'c': 'string'}
+        assert ColumnarDataset(path).rows(0, 2) == [
+            {'a': 1, 'b': 'inf', 'c': '2'},
+            {'a': 2, 'b': '3.5', 'c': '1e999'},
+        ]
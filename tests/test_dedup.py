@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from files import views
+from files.artifacts import parse_lock
+from files.models import FileUpload, FileBlob
+
+User = get_user_model()
+
+CSV_CONTENT = b'Name,Age\nJohn,25\nJane,30\n'
+
+
+@pytest.mark.django_db
+class TestDeduplication:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        self.queued = []
+        monkeypatch.setattr(views, 'process_file_background', self.queued.append)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, content_type):
+        uploaded_file = SimpleUploadedFile(name, content, content_type=content_type)
+        response = self.client.post(reverse('file-upload'), {'file': uploaded_file}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+        return FileUpload.objects.get(id=response.data['file_id']), response
+
+    def test_duplicate_shares_file_and_parse_result(self, settings):
+        """Test that identical content is stored once and not parsed again"""
+        settings.FILE_INGEST_WHILE_UPLOADING = False
+        first, _ = self.upload('a.csv', CSV_CONTENT, 'text/csv')
+        parsed_content = {'type': 'csv', 'total_rows': 2}
+        FileUpload.objects.filter(id=first.id).update(status='ready', progress=100, parsed_content=parsed_content)
+
+        second, response = self.upload('b.csv', CSV_CONTENT, 'text/csv')
+
+        assert response.data['status'] == 'ready'
+        assert self.queued == [str(first.id)]
+        assert second.file.name == first.file.name
+        assert second.parsed_content == parsed_content
+        # One stored copy, next to the lock file its parses share
+        assert sorted(os.listdir(os.path.dirname(first.file.path))) == ['a.csv', 'a.csv.lock']
+        assert FileBlob.objects.get(content_hash=first.content_hash).ref_count == 2
+
+    def test_different_parser_is_not_reused(self):
+        """Test that a result is only reused for the same parser type"""
+        first, _ = self.upload('a.csv', CSV_CONTENT, 'text/csv')
+        assert first.status == 'ready'
+
+        second, response = self.upload('b.bin', CSV_CONTENT, 'application/octet-stream')
+
+        assert response.data['status'] == 'uploading'
+        assert self.queued == [str(second.id)]
+        assert second.file.name == first.file.name
+
+    def test_delete_keeps_shared_file_until_last_reference(self):
+        """Test that the stored file outlives all but the last upload using it"""
+        first, _ = self.upload('a.csv', CSV_CONTENT, 'text/csv')
+        second, _ = self.upload('b.csv', CSV_CONTENT, 'text/csv')
+        path = first.file.path
+
+        first.delete()
+        assert os.path.exists(path)
+        assert os.path.isdir(path + '.parsed')
+        assert FileBlob.objects.get(content_hash=second.content_hash).ref_count == 1
+
+        second.delete()
+        assert not os.path.exists(path)
+        assert not os.path.exists(path + '.parsed')
+        assert not os.path.exists(path + '.lock')
+        assert not FileBlob.objects.exists()
+
+
+class TestParseLock:
+    def test_lock_excludes_other_processes(self, tmp_path):
+        """Test that a parse in another worker process waits for the lock on the same file"""
+        path = str(tmp_path / 'data.csv')
+        child = (
+            'import sys\n'
+            'from files.artifacts import parse_lock\n'
+            'print("waiting", flush=True)\n'
+            'with parse_lock(sys.argv[1]):\n'
+            '    print("locked", flush=True)\n'
+        )
+        with parse_lock(path):
+            process = subprocess.Popen(
+                [sys.executable, '-c', child, path], stdout=subprocess.PIPE, text=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            assert process.stdout.readline() == 'waiting\n'
+            with pytest.raises(subprocess.TimeoutExpired):
+                process.wait(timeout=0.5)
+        output, _ = process.communicate(timeout=30)
+
+        assert output == 'locked\n'
+        assert process.returncode == 0
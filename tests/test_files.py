@@ -1,11 +1,15 @@
+import hashlib
 import pytest
 import tempfile
 import os
+from datetime import timedelta
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
+from files import csv_stream, tasks
 from files.models import FileUpload
 
 User = get_user_model()
@@ -13,6 +17,11 @@ User = get_user_model()
 
 @pytest.mark.django_db
 class TestFileOperations:
+    @pytest.fixture(autouse=True)
+    def isolate_media(self, tmp_path, settings):
+        # Uploads, their artifacts and the search index are written under MEDIA_ROOT
+        settings.MEDIA_ROOT = str(tmp_path)
+
     def setup_method(self):
         self.client = APIClient()
         self.user = User.objects.create_user(
@@ -24,8 +33,26 @@ class TestFileOperations:
 
     def test_file_upload(self):
         """Test file upload endpoint"""
-        # Create a test CSV file
-        csv_content = "Name,Age,City\nJohn,25,New York\nJane,30,Los Angeles"
+        # Create a test file of a type that is parsed in the background
+        uploaded_file = SimpleUploadedFile(
+            "test.pdf",
+            b"%PDF-1.4 not really a pdf",
+            content_type="application/pdf"
+        )
+        
+        url = reverse('file-upload')
+        response = self.client.post(url, {'file': uploaded_file}, format='multipart')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'file_id' in response.data
+        assert response.data['status'] == 'uploading'
+
+    def test_csv_parsed_while_uploading(self, tmp_path, monkeypatch):
+        """Test that a CSV upload is parsed during the transfer and ready on return"""
+        from files import views
+        queued = []
+        monkeypatch.setattr(views, 'process_file_background', queued.append)
+        csv_content = "Name,Age,City\nJohn,25,\"New\nYork\"\nJane,30,Los Angeles\n"
         uploaded_file = SimpleUploadedFile(
             "test.csv",
             csv_content.encode('utf-8'),
@@ -36,8 +63,54 @@ class TestFileOperations:
         response = self.client.post(url, {'file': uploaded_file}, format='multipart')
         
         assert response.status_code == status.HTTP_201_CREATED
-        assert 'file_id' in response.data
-        assert response.data['status'] == 'uploading'
+        assert response.data['status'] == 'ready'
+        assert queued == []
+        file_upload = FileUpload.objects.get(id=response.data['file_id'])
+        assert file_upload.status == 'ready'
+        assert file_upload.parsed_content['total_rows'] == 2
+        assert file_upload.parsed_content['sample_data'][0]['City'] == 'New\nYork'
+        assert file_upload.content_hash == hashlib.sha256(csv_content.encode('utf-8')).hexdigest()
+        assert os.path.isdir(file_upload.file.path + '.parsed')
+        assert os.listdir(tmp_path / 'uploads' / 'partial') == []
+
+    def test_oversized_upload_is_stopped_while_receiving(self, tmp_path, settings, monkeypatch):
+        """Test that a file over MAX_FILE_SIZE is refused before it is stored or parsed"""
+        from files import ingest, views
+        settings.MAX_FILE_SIZE = 1000
+        parsed = []
+        monkeypatch.setattr(ingest, 'parse_csv_stream', lambda stream, **kwargs: parsed.append(stream.read()))
+        monkeypatch.setattr(views, 'process_file_background', lambda file_id: None)
+        uploaded_file = SimpleUploadedFile("big.csv", b'a,b\n' + b'1,2\n' * 1000, content_type="text/csv")
+        
+        response = self.client.post(reverse('file-upload'), {'file': uploaded_file}, format='multipart')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'too large' in response.data['error']
+        assert not FileUpload.objects.exists()
+        assert os.listdir(tmp_path / 'uploads' / 'partial') == []
+        # The parser saw at most the chunks before the limit, not the whole body
+        assert all(len(data) <= 1000 for data in parsed)
+
+    def test_file_upload_queue_full(self, monkeypatch):
+        """Test that uploads are rejected when the processing queue is full"""
+        from files import views
+        from files.workers import QueueFull
+
+        def reject(file_id):
+            raise QueueFull('full')
+
+        monkeypatch.setattr(views, 'process_file_background', reject)
+        uploaded_file = SimpleUploadedFile(
+            "test.pdf",
+            b"%PDF-1.4 not really a pdf",
+            content_type="application/pdf"
+        )
+        
+        url = reverse('file-upload')
+        response = self.client.post(url, {'file': uploaded_file}, format='multipart')
+        
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert not FileUpload.objects.filter(user=self.user).exists()
 
     def test_file_list(self):
         """Test file listing endpoint"""
@@ -96,6 +169,73 @@ class TestFileOperations:
         assert response.status_code == status.HTTP_200_OK
         assert 'content' in response.data
 
+    def create_parsed_csv(self, tmp_path, csv_content):
+        upload_path = tmp_path / 'uploads' / 'test.csv'
+        upload_path.parent.mkdir()
+        upload_path.write_text(csv_content)
+        content = tasks.parse_csv_file(str(upload_path), 'unused')
+        return FileUpload.objects.create(
+            user=self.user,
+            filename='test.csv',
+            original_name='test.csv',
+            file='uploads/test.csv',
+            file_size=upload_path.stat().st_size,
+            mime_type='text/csv',
+            status='ready',
+            progress=100,
+            parsed_content=content
+        )
+
+    def test_file_content_from_dataset(self, tmp_path):
+        """Test that the detail view serves the CSV preview as the original strings"""
+        file_upload = self.create_parsed_csv(tmp_path, "Name,Age\nJohn,25\nJane,30\n")
+        
+        assert 'data' not in file_upload.parsed_content
+        url = reverse('file-detail', kwargs={'pk': file_upload.id})
+        response = self.client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['content']['data'] == [
+            {'Name': 'John', 'Age': '25'},
+            {'Name': 'Jane', 'Age': '30'},
+        ]
+        assert response.data['content']['sample_data'] == response.data['content']['data']
+        
+        file_upload.delete()
+        assert not (tmp_path / 'uploads' / 'test.csv.parsed').exists()
+
+    def test_non_finite_values_render(self, tmp_path):
+        """Test that values like inf don't break rendering the detail and rows responses"""
+        file_upload = self.create_parsed_csv(tmp_path, "a,b\n1,inf\n2,3.5\n")
+        
+        response = self.client.get(reverse('file-detail', kwargs={'pk': file_upload.id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['content']['data'] == [{'a': '1', 'b': 'inf'}, {'a': '2', 'b': '3.5'}]
+        
+        response = self.client.get(reverse('file-rows', kwargs={'pk': file_upload.id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['rows'][0] == {'a': '1', 'b': 'inf'}
+
+    def test_file_rows(self, tmp_path, monkeypatch):
+        """Test paging through CSV rows with the byte-offset index"""
+        monkeypatch.setattr(csv_stream, 'ROW_INDEX_INTERVAL', 4)
+        lines = ''.join(f'{i},"line {i}\nsecond line"\n' for i in range(10))
+        file_upload = self.create_parsed_csv(tmp_path, 'id,text\n' + lines)
+        
+        url = reverse('file-rows', kwargs={'pk': file_upload.id})
+        response = self.client.get(url, {'offset': 5, 'limit': 4})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_rows'] == 10
+        assert [row['id'] for row in response.data['rows']] == ['5', '6', '7', '8']
+        assert response.data['rows'][0]['text'] == 'line 5\nsecond line'
+        
+        response = self.client.get(url, {'offset': 8, 'limit': 100})
+        assert [row['id'] for row in response.data['rows']] == ['8', '9']
+        
+        response = self.client.get(url, {'offset': -1})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_file_content_processing(self):
         """Test getting file content while processing"""
         file_upload = FileUpload.objects.create(
@@ -138,4 +278,61 @@ class TestFileOperations:
         url = reverse('file-list')
         response = self.client.get(url)
         
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+class TestFileListPagination:
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        self.files = []
+        for i in range(5):
+            file_upload = FileUpload.objects.create(
+                user=self.user, filename=f'{i}.csv', original_name=f'{i}.csv', file_size=1,
+                mime_type='text/csv', parsed_content={'big': 'x' * 1000}
+            )
+            # Two files share a timestamp, so the id has to break the tie
+            FileUpload.objects.filter(id=file_upload.id).update(created_at=now - timedelta(minutes=min(i, 3)))
+            self.files.append(file_upload)
+        self.expected = [
+            str(f.id) for f in FileUpload.objects.filter(user=self.user).order_by('-created_at', '-id')
+        ]
+
+    def test_cursor_walks_forward_and_back(self):
+        """Test that next and previous cursors cover every file exactly once"""
+        url = reverse('file-list')
+        seen = []
+        response = self.client.get(url, {'page_size': 2})
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(response)
+        for page in pages:
+            seen.extend(str(item['id']) for item in page.data['results'])
+
+        assert seen == self.expected
+        assert 'count' not in pages[0].data
+        assert pages[0].data['previous'] is None
+
+        back = self.client.get(pages[-1].data['previous'])
+        assert [str(item['id']) for item in back.data['results']] == self.expected[2:4]
+
+    def test_list_query_skips_parsed_content(self, django_assert_num_queries):
+        """Test that the list is one query that doesn't select parsed_content"""
+        with django_assert_num_queries(1) as context:
+            response = self.client.get(reverse('file-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'parsed_content' not in context.captured_queries[0]['sql']
+
+    def test_invalid_cursor(self):
+        """Test that a garbled cursor is a 404, not a server error"""
+        response = self.client.get(reverse('file-list'), {'cursor': 'bm9wZQ=='})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
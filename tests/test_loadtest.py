@@ -0,0 +1,55 @@
+import pytest
+from files import loadtest, views
+
+
+class TestLoadTestHelpers:
+    def test_parse_mix(self):
+        """Test that weights are parsed and unknown operations are rejected"""
+        assert loadtest.parse_mix('upload:1, progress:4,list') == {'upload': 1, 'progress': 4, 'list': 1}
+        with pytest.raises(ValueError):
+            loadtest.parse_mix('upload:1,delete:2')
+        with pytest.raises(ValueError):
+            loadtest.parse_mix('list:0')
+
+    def test_latency_summary(self):
+        """Test percentiles, the cumulative histogram and error counting"""
+        stats = loadtest.LatencyStats()
+        for i in range(1, 101):
+            stats.record(i / 1000, 200 if i <= 98 else 503)
+
+        summary = stats.summary(elapsed=2)
+
+        assert summary['requests'] == 100
+        assert summary['throughput'] == 50
+        assert summary['errors'] == 2
+        assert summary['statuses'] == {'200': 98, '503': 2}
+        assert (summary['p50'], summary['p95'], summary['p99']) == (0.05, 0.095, 0.099)
+        buckets = {bucket['le']: bucket['count'] for bucket in summary['histogram']}
+        assert buckets[0.005] == 5
+        assert buckets[0.1] == 100
+        assert buckets['inf'] == 100
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadTest:
+    def test_run_against_live_server(self, live_server, settings, monkeypatch, tmp_path):
+        """Test a short run: a user signs up and runs the mix, and unprocessed uploads show as backlog"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_INGEST_WHILE_UPLOADING = False
+        monkeypatch.setattr(views, 'process_file_background', lambda file_id: None)
+
+        results = loadtest.run(
+            f'{live_server.url}/api', [1], duration=1.5, mix={'upload': 1, 'progress': 1, 'list': 1},
+            payload=loadtest.csv_payload(5), sample_interval=0.5
+        )
+
+        stage = results['stages'][0]
+        assert stage['user_errors'] == []
+        assert stage['requests'] > 0
+        assert stage['error_rate'] == 0
+        assert set(stage['operations']) <= {'upload', 'progress', 'list'}
+        assert 'upload' in stage['operations']
+        # Nothing processes the uploads, so none of them get past uploading
+        assert stage['backlog'][-1]['backlog'] > 0
+        assert stage['backlog'][-1]['statuses'] == {'uploading': stage['backlog'][-1]['backlog']}
+        assert results['saturation']['users'] == 1
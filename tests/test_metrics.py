@@ -0,0 +1,165 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from django.contrib.auth import get_user_model
+from files import metrics, tasks
+from files.models import FileUpload
+
+User = get_user_model()
+
+
+def sample(metric, **labels):
+    """Current value of one sample of a counter or gauge, or (counts, sum) of a histogram"""
+    return metric._values.get(metric._key(labels))
+
+
+class TestMetrics:
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test the exposition format of a labelled histogram"""
+        histogram = metrics.Histogram('job_seconds', 'Job time', ['kind'], buckets=(0.1, 1))
+        histogram.observe(0.05, kind='a"b')
+        histogram.observe(0.5, kind='a"b')
+        histogram.observe(5, kind='a"b')
+
+        assert histogram.render() == [
+            '# HELP job_seconds Job time',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{kind="a\\"b",le="0.1"} 1',
+            'job_seconds_bucket{kind="a\\"b",le="1"} 2',
+            'job_seconds_bucket{kind="a\\"b",le="+Inf"} 3',
+            'job_seconds_sum{kind="a\\"b"} 5.55',
+            'job_seconds_count{kind="a\\"b"} 3',
+        ]
+
+    def test_labels_must_match(self):
+        """Test that a sample with the wrong label names is refused"""
+        counter = metrics.Counter('jobs_total', 'Jobs', ['outcome'])
+        with pytest.raises(ValueError):
+            counter.inc(result='ok')
+
+    def test_nested_stages_are_exclusive(self):
+        """Test that an inner stage's time is not counted again in the outer one"""
+        with metrics.timing_stages() as timer:
+            with metrics.stage('parse'):
+                time.sleep(0.03)
+                with metrics.stage('profile'):
+                    time.sleep(0.05)
+                timer.add({'db_save': 0.01})
+            with pytest.raises(KeyError):
+                with metrics.stage('db_save'):
+                    raise KeyError('x')
+
+        assert 0.05 <= timer.stages['profile'] < 0.1
+        # 0.03s of its own less the 0.01s added inside it
+        assert 0.02 <= timer.stages['parse'] < 0.05
+        assert timer.stages['db_save'] >= 0.01
+        assert timer.failed_stage == 'db_save'
+        # Outside of a job, stages cost nothing and record nothing
+        with metrics.stage('parse'):
+            pass
+        assert metrics.current_timer() is None
+
+    def test_size_buckets(self):
+        assert metrics.size_bucket(0) == '<1MB'
+        assert metrics.size_bucket(5 * 1024 * 1024) == '1-10MB'
+        assert metrics.size_bucket(10 ** 9) == '>=100MB'
+
+
+@pytest.mark.django_db
+class TestProcessModeStages:
+    def test_stages_come_back_with_the_result(self, tmp_path, settings, monkeypatch):
+        """Test that stages timed in a parser process are added to the job's"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_PARSER_EXECUTION = {'csv': 'process'}
+        path = tmp_path / 'a.csv'
+        path.write_bytes(b'Name,Age\nJohn,25\n')
+        executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(tasks, 'get_process_pool', lambda: executor)
+
+        with metrics.timing_stages() as timer:
+            with metrics.stage('parse'):
+                result = tasks.run_parser('csv', str(path), str(uuid.uuid4()))
+        executor.shutdown()
+
+        assert result['headers'] == ['Name', 'Age']
+        assert 'profile' in timer.stages
+
+
+@pytest.mark.django_db
+class TestStageTimings:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings):
+        settings.MEDIA_ROOT = str(tmp_path)
+        os.makedirs(tmp_path / 'uploads')
+        (tmp_path / 'uploads' / 'a.csv').write_bytes(b'Name,Age\nJohn,25\nJane,30\n')
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.file_upload = FileUpload.objects.create(
+            user=self.user, filename='a.csv', original_name='a.csv', file='uploads/a.csv',
+            file_size=26, mime_type='text/csv'
+        )
+
+    def test_processing_records_every_stage(self):
+        """Test that stage times are saved on the file and added to the metrics"""
+        labels = {'stage': 'parse', 'file_type': 'csv', 'size_bucket': '<1MB'}
+        parses_before = (sample(metrics.STAGE_SECONDS, **labels) or ([0], 0))[0][-1]
+        ready_before = sample(metrics.PROCESSED_FILES, file_type='csv', size_bucket='<1MB', outcome='ready') or 0
+
+        tasks.process_file(str(self.file_upload.id), queued_at=time.perf_counter() - 0.5)
+
+        self.file_upload.refresh_from_db()
+        timings = self.file_upload.stage_timings
+        assert self.file_upload.status == 'ready'
+        assert set(timings) == {
+            'queue_wait', 'sniff', 'dedup_lookup', 'parse', 'profile', 'db_save', 'cache_write', 'total'
+        }
+        assert timings['queue_wait'] >= 0.5
+        assert timings['total'] == pytest.approx(sum(v for k, v in timings.items() if k != 'total'), abs=0.01)
+        assert sample(metrics.STAGE_SECONDS, **labels)[0][-1] == parses_before + 1
+        assert sample(
+            metrics.PROCESSED_FILES, file_type='csv', size_bucket='<1MB', outcome='ready'
+        ) == ready_before + 1
+        assert sample(metrics.IN_FLIGHT) == 0
+
+    def test_cache_lookups_have_their_own_stages(self):
+        """Test that looking up earlier results is not counted as sniffing"""
+        FileUpload.objects.filter(id=self.file_upload.id).update(content_hash='a' * 64)
+
+        with metrics.timing_stages() as timer:
+            tasks.parse_and_store(FileUpload.objects.get(id=self.file_upload.id), 'csv')
+
+        assert {'dedup_lookup', 'result_cache'} <= set(timer.stages)
+        assert 'sniff' not in timer.stages
+
+    def test_failure_is_counted_by_stage(self, monkeypatch):
+        """Test that a parser error counts as a parse failure and timings are still saved"""
+        def broken(file_path, file_id):
+            raise ValueError('bad file')
+        monkeypatch.setitem(tasks.PARSERS, 'csv', broken)
+        failures_before = sample(metrics.FAILURES, file_type='csv', stage='parse') or 0
+
+        tasks.process_file(str(self.file_upload.id))
+
+        self.file_upload.refresh_from_db()
+        assert self.file_upload.status == 'failed'
+        assert 'parse' in self.file_upload.stage_timings
+        assert sample(metrics.FAILURES, file_type='csv', stage='parse') == failures_before + 1
+
+    def test_metrics_endpoint(self, client, settings):
+        """Test the scrape endpoint's format and optional bearer token"""
+        tasks.process_file(str(self.file_upload.id))
+
+        response = client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = response.content.decode()
+        assert '# TYPE file_processing_stage_seconds histogram' in body
+        assert 'file_processing_stage_seconds_count{stage="parse",file_type="csv",size_bucket="<1MB"}' in body
+        assert 'file_processing_queue_depth 0' in body
+        assert 'file_processing_in_flight 0' in body
+
+        settings.METRICS_TOKEN = 'secret'
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code == 200
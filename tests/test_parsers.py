@@ -0,0 +1,286 @@
+import datetime
+import os
+import tracemalloc
+import uuid
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import Workbook
+from files import csv_pandas, csv_parallel, csv_stream, tasks
+from files.columnar import ColumnarDataset, dataset_pointer, open_dataset
+from files.csv_pandas import UnsupportedDialect, parse_csv_pandas
+from files.csv_parallel import parse_csv_parallel
+from files.csv_stream import parse_csv_path
+from files.excel_stream import parse_excel_path
+
+
+def write_file(tmp_path, name, content):
+    path = tmp_path / name
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode) as f:
+        f.write(content)
+    return str(path)
+
+
+@pytest.mark.django_db
+class TestParserExecution:
+    def setup_method(self):
+        self.file_id = str(uuid.uuid4())
+
+    def test_thread_mode_runs_parser_inline(self, tmp_path, settings):
+        """Test that thread mode calls the parser directly"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_PARSER_EXECUTION = {'csv': 'thread'}
+        path = write_file(tmp_path, 'test.csv', "Name,Age\nJohn,25\nJane,30\n")
+
+        result = tasks.run_parser('csv', path, self.file_id)
+
+        assert result['type'] == 'csv'
+        assert result['total_rows'] == 2
+
+    def test_process_mode_returns_result_through_spool_file(self, tmp_path, settings, monkeypatch):
+        """Test that process mode ships the result back as a JSON file and cleans it up"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_PARSER_EXECUTION = {'csv': 'process'}
+        path = write_file(tmp_path, 'test.csv', "Name,Age\nJohn,25\n")
+        spooled = []
+        original_job = tasks.run_parser_job
+
+        def job(*args):
+            result_path = original_job(*args)
+            spooled.append(result_path)
+            return result_path
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(tasks, 'get_process_pool', lambda: executor)
+        monkeypatch.setattr(tasks, 'run_parser_job', job)
+
+        result = tasks.run_parser('csv', path, self.file_id)
+        executor.shutdown()
+
+        assert result['headers'] == ['Name', 'Age']
+        assert result['sample_data'] == [{'Name': 'John', 'Age': '25'}]
+        assert len(spooled) == 1
+        assert not os.path.exists(spooled[0])
+
+
+class TestStreamingCSV:
+    def test_matches_dictreader_contract(self, tmp_path):
+        """Test the parsed_content shape for a small file"""
+        path = write_file(tmp_path, 'test.csv', 'Name,Age,City\nJohn,25,"New\nYork"\n\nJane,30\n')
+
+        result = parse_csv_path(path)
+
+        assert result['type'] == 'csv'
+        assert result['headers'] == ['Name', 'Age', 'City']
+        assert result['rows'] == result['total_rows'] == 2
+        assert result['data'][0] == {'Name': 'John', 'Age': '25', 'City': 'New\nYork'}
+        assert result['data'][1] == {'Name': 'Jane', 'Age': '30', 'City': None}
+        assert result['sample_data'] == result['data']
+
+    def test_preview_is_bounded(self, tmp_path):
+        """Test that all rows are counted but only the preview is kept"""
+        rows = ''.join(f'{i},value {i}\n' for i in range(50000))
+        path = write_file(tmp_path, 'big.csv', 'id,label\n' + rows)
+        progress = []
+
+        tracemalloc.start()
+        result = parse_csv_path(path, on_progress=progress.append)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert result['total_rows'] == 50000
+        assert len(result['data']) == 100
+        assert len(result['sample_data']) == 5
+        assert progress and progress[-1] <= 1
+        assert peak < 2 * 1024 * 1024
+
+
+class TestPandasCSV:
+    def parse_both(self, tmp_path, content):
+        path = write_file(tmp_path, 'test.csv', content)
+        fast = parse_csv_pandas(path, dataset_path=str(tmp_path / 'fast'), index_path=str(tmp_path / 'fast.idx'))
+        slow = parse_csv_path(path, dataset_path=str(tmp_path / 'slow'), index_path=str(tmp_path / 'slow.idx'))
+        return fast, slow
+
+    def test_matches_csv_module_output(self, tmp_path, monkeypatch):
+        """Test that the pandas engine returns the same result, dataset and row index"""
+        monkeypatch.setattr(csv_stream, 'ROW_INDEX_INTERVAL', 3)
+        monkeypatch.setattr(csv_pandas, 'ROW_INDEX_INTERVAL', 3)
+        rows = ''.join(f'{i},"value, {i}","say ""{i}"""\n' for i in range(20))
+        content = 'id,label,quote\n' + rows + '\n\n"20","multi\nline",x\n21,last,row'
+
+        fast, slow = self.parse_both(tmp_path, content)
+
+        assert fast == slow
+        assert fast['rows'] == 22
+        assert (tmp_path / 'fast.idx').read_bytes() == (tmp_path / 'slow.idx').read_bytes()
+        assert ColumnarDataset(str(tmp_path / 'fast')).rows() == ColumnarDataset(str(tmp_path / 'slow')).rows()
+
+    @pytest.mark.parametrize('content', ['a,b\n', 'a,b', 'a,b\n\n'])
+    def test_header_only_matches_csv_module_output(self, tmp_path, content):
+        """Test that a file with no records gives the same empty result from both engines"""
+        fast, slow = self.parse_both(tmp_path, content)
+
+        assert fast == slow
+        assert fast['rows'] == 0
+        assert (tmp_path / 'fast.idx').read_bytes() == (tmp_path / 'slow.idx').read_bytes()
+        assert ColumnarDataset(str(tmp_path / 'fast')).rows() == []
+
+    @pytest.mark.parametrize('content', [
+        'a,b\n1,2\n3\n',
+        'a,b\n1,2,3\n',
+        'a,b\n5" screen,2\n',
+        'a,b\n1,2\n \n3,4\n',
+    ])
+    def test_irregular_files_are_rejected(self, tmp_path, content):
+        """Test that files the C tokenizer would read differently raise UnsupportedDialect"""
+        path = write_file(tmp_path, 'test.csv', content)
+
+        with pytest.raises(UnsupportedDialect):
+            parse_csv_pandas(path)
+
+    def test_parse_csv_file_falls_back_to_csv_module(self, tmp_path, settings):
+        """Test that a ragged file still parses when the pandas engine is selected"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.CSV_ENGINE = 'pandas'
+        path = write_file(tmp_path, 'test.csv', 'Name,Age\nJohn,25\nJane\n')
+
+        result = tasks.parse_csv_file(path, str(uuid.uuid4()))
+
+        assert result['total_rows'] == 2
+        assert result['sample_data'][1] == {'Name': 'Jane', 'Age': None}
+
+    def test_auto_engine_depends_on_size(self, tmp_path, settings):
+        """Test that CSV_ENGINE='auto' uses pandas from CSV_PANDAS_MIN_BYTES"""
+        settings.CSV_ENGINE = 'auto'
+        settings.CSV_PANDAS_MIN_BYTES = 10
+        small = write_file(tmp_path, 'small.csv', 'a\n1\n')
+        large = write_file(tmp_path, 'large.csv', 'a\n1\n2\n3\n4\n5\n')
+
+        assert tasks.csv_engine_for(small) == 'python'
+        assert tasks.csv_engine_for(large) == 'pandas'
+
+
+class TestParallelCSV:
+    @pytest.fixture(autouse=True)
+    def small_segments(self, monkeypatch):
+        monkeypatch.setattr(csv_parallel, 'MIN_SEGMENT_BYTES', 64)
+        monkeypatch.setattr(csv_pandas, 'SCAN_BLOCK_BYTES', 50)
+        monkeypatch.setattr(csv_stream, 'ROW_INDEX_INTERVAL', 7)
+        monkeypatch.setattr(csv_pandas, 'ROW_INDEX_INTERVAL', 7)
+        monkeypatch.setattr(csv_parallel, 'ROW_INDEX_INTERVAL', 7)
+
+    def test_matches_single_core_parse(self, tmp_path):
+        """Test that segments split at record boundaries merge into the same result"""
+        rows = ''.join(
+            f'{i},"note\n{i}, with ""quotes""",{i * 0.5}\n' if i % 3 == 0 else f'{i},plain {i},x\n'
+            for i in range(200)
+        )
+        path = write_file(tmp_path, 'test.csv', 'id,note,value\n' + rows + '\n200,"last\nrow",1')
+        progress = []
+
+        with ThreadPoolExecutor(4) as executor:
+            fast = parse_csv_parallel(
+                path, executor, 8, on_progress=progress.append,
+                dataset_path=str(tmp_path / 'parallel'), index_path=str(tmp_path / 'parallel.idx')
+            )
+        slow = parse_csv_path(path, dataset_path=str(tmp_path / 'slow'), index_path=str(tmp_path / 'slow.idx'))
+
+        assert fast == slow
+        assert (tmp_path / 'parallel.idx').read_bytes() == (tmp_path / 'slow.idx').read_bytes()
+        parallel_dataset = ColumnarDataset(str(tmp_path / 'parallel'))
+        assert parallel_dataset.meta == ColumnarDataset(str(tmp_path / 'slow')).meta
+        assert parallel_dataset.rows() == ColumnarDataset(str(tmp_path / 'slow')).rows()
+        assert not os.path.exists(str(tmp_path / 'parallel.parts'))
+        assert progress[-1] == 1
+
+    def test_unbalanced_quotes_are_rejected(self, tmp_path):
+        """Test that a file whose quotes never close is refused"""
+        path = write_file(tmp_path, 'test.csv', 'a,b\n' + '1,2\n' * 50 + '3,"open\n' + '4,5\n' * 50)
+
+        with ThreadPoolExecutor(2) as executor, pytest.raises(UnsupportedDialect):
+            parse_csv_parallel(path, executor, 4)
+
+    def test_parse_csv_file_uses_executor_for_big_files(self, tmp_path, settings):
+        """Test that parse_csv_file splits a file across the executor it is given"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_PARSER_PROCESSES = 4
+        path = write_file(tmp_path, 'test.csv', 'a,b\n' + ''.join(f'{i},{i}\n' for i in range(100)))
+        executor = ThreadPoolExecutor(4)
+        submitted = []
+        submit = executor.submit
+        executor.submit = lambda fn, *args: submitted.append(fn) or submit(fn, *args)
+
+        with executor:
+            result = tasks.parse_csv_file(path, str(uuid.uuid4()), executor=executor)
+
+        assert result['total_rows'] == 100
+        assert submitted.count(csv_parallel.parse_part) == 4
+        assert submitted.count(csv_parallel.count_records) == 4
+        assert tasks.fans_out('csv', path)
+
+
+class TestStreamingExcel:
+    def write_workbook(self, tmp_path):
+        workbook = Workbook()
+        people = workbook.active
+        people.title = 'People'
+        people.append(['Name', 'Joined', None])
+        people.append(['John', datetime.date(2020, 1, 2), 1])
+        people.append([None, None, None])
+        people.append(['Jane', datetime.date(2021, 3, 4), 2])
+        totals = workbook.create_sheet('Totals')
+        totals.append(['Total'])
+        totals.append([3])
+        workbook.create_sheet('Empty')
+        path = str(tmp_path / 'book.xlsx')
+        workbook.save(path)
+        return path
+
+    def test_parses_every_sheet(self, tmp_path):
+        """Test per-sheet headers, counts and previews"""
+        path = self.write_workbook(tmp_path)
+        progress = []
+
+        sheets = parse_excel_path(path, on_progress=progress.append)
+
+        assert [sheet['name'] for sheet in sheets] == ['People', 'Totals', 'Empty']
+        assert sheets[0]['headers'] == ['Name', 'Joined', 'Unnamed: 2']
+        assert sheets[0]['rows'] == 2
+        assert sheets[0]['sample_data'][1] == {'Name': 'Jane', 'Joined': '2021-03-04T00:00:00', 'Unnamed: 2': 2}
+        assert sheets[1]['sample_data'] == [{'Total': 3}]
+        assert sheets[2] == {'name': 'Empty', 'headers': [], 'rows': 0, 'sample_data': []}
+        assert progress[-1] == 1
+
+    def test_dataset_and_samples_convert_cells_alike(self, tmp_path, settings):
+        """Test that dates and booleans read back from the dataset as they appear in sample_data"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        workbook = Workbook()
+        workbook.active.append(['When', 'Active'])
+        workbook.active.append([datetime.datetime(2020, 1, 1, 9, 30), True])
+        workbook.active.append([datetime.datetime(2020, 1, 2), False])
+        path = str(tmp_path / 'book.xlsx')
+        workbook.save(path)
+
+        [sheet] = parse_excel_path(path, dataset_path=str(tmp_path / 'dataset'))
+        dataset = open_dataset(dataset_pointer(sheet['dataset_meta'], sheet['dataset_path']))
+
+        assert dataset.rows(0, 2) == sheet['sample_data'] == [
+            {'When': '2020-01-01T09:30:00', 'Active': 'TRUE'},
+            {'When': '2020-01-02T00:00:00', 'Active': 'FALSE'},
+        ]
+
+    def test_parsed_content_keeps_first_sheet_at_top_level(self, tmp_path, settings):
+        """Test that parse_excel_file writes a dataset per sheet"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        path = self.write_workbook(tmp_path)
+
+        result = tasks.parse_excel_file(path, str(uuid.uuid4()))
+
+        assert result['sheets'] == 3
+        assert result['headers'] == ['Name', 'Joined', 'Unnamed: 2']
+        assert result['total_rows'] == 2
+        assert result['dataset'] == result['sheet_details'][0]['dataset']
+        assert [column['type'] for column in result['profile']] == ['string', 'datetime', 'integer']
+        totals = open_dataset(result['sheet_details'][1]['dataset'])
+        assert list(totals.rows(0, 1)) == [{'Total': 3}]
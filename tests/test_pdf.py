@@ -0,0 +1,155 @@
+import os
+import uuid
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from files import pdf_pages, tasks
+from files.models import FileUpload
+from files.pdf_pages import extract_pages, read_page, write_page
+
+User = get_user_model()
+
+
+def make_pdf(path, texts):
+    """Write a PDF with one line of Helvetica text per page"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    for text in texts:
+        page = PageObject.create_blank_page(width=612, height=792)
+        stream = DecodedStreamObject()
+        stream.set_data(f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode())
+        page[NameObject('/Contents')] = stream
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return str(path)
+
+
+class TestPageExtraction:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pdf_pages, 'PAGES_PER_TASK', 3)
+        self.path = make_pdf(tmp_path / 'doc.pdf', [f'page {i} text' for i in range(1, 11)])
+        self.pages_dir = str(tmp_path / 'pages')
+
+    def test_sequential_extraction_writes_each_page(self):
+        """Test that every page ends up in its own file"""
+        progress = []
+
+        stats = extract_pages(self.path, self.pages_dir, on_progress=progress.append)
+
+        assert stats == [(i, 3, len(f'page {i} text')) for i in range(1, 11)]
+        assert read_page(self.pages_dir, 7) == 'page 7 text'
+        assert read_page(self.pages_dir, 11) is None
+        assert progress == [0.3, 0.6, 0.9, 1.0]
+
+    def test_parallel_extraction_merges_in_page_order(self):
+        """Test that page ranges fanned out to an executor come back in order"""
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            stats = extract_pages(self.path, self.pages_dir, executor=executor)
+
+        assert [page for page, _, _ in stats] == list(range(1, 11))
+        assert sorted(os.listdir(self.pages_dir), key=lambda name: int(name.split('.')[0])) == [
+            f'{i}.txt' for i in range(1, 11)
+        ]
+
+    def test_concurrent_writes_of_a_page(self):
+        """Test that writers racing on the same page each finish and leave no temporary files"""
+        os.makedirs(self.pages_dir)
+        with ThreadPoolExecutor(8) as executor:
+            for future in [executor.submit(write_page, self.pages_dir, 1, f'text {i}') for i in range(200)]:
+                future.result()
+
+        assert read_page(self.pages_dir, 1).startswith('text ')
+        assert os.listdir(self.pages_dir) == ['1.txt']
+
+
+@pytest.mark.django_db
+class TestParsePDF:
+    def test_process_mode_fans_pages_out(self, tmp_path, settings, monkeypatch):
+        """Test that the PDF parser splits pages across the pool instead of running in it"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.FILE_PARSER_EXECUTION = {'pdf': 'process'}
+        path = make_pdf(tmp_path / 'doc.pdf', ['alpha beta', 'gamma'])
+        submitted = []
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        class RecordingPool:
+            def submit(self, fn, *args):
+                submitted.append(fn)
+                return executor.submit(fn, *args)
+
+        monkeypatch.setattr(tasks, 'get_process_pool', RecordingPool)
+
+        result = tasks.run_parser('pdf', path, str(uuid.uuid4()))
+        executor.shutdown()
+
+        assert submitted == [pdf_pages.extract_page_range]
+        assert result['pages'] == 2
+        assert result['pages_path'] == 'doc.pdf.parsed/pages'
+        assert 'content' not in result and 'full_text' not in result
+        assert read_page(str(tmp_path / 'doc.pdf.parsed' / 'pages'), 2) == 'gamma'
+        assert result['word_count'] == 3
+        assert result['character_count'] == 15
+
+
+@pytest.mark.django_db
+class TestPageEndpoint:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings):
+        settings.MEDIA_ROOT = str(tmp_path)
+        os.makedirs(tmp_path / 'uploads')
+        make_pdf(tmp_path / 'uploads' / 'doc.pdf', ['first page', 'second page here'])
+        self.tmp_path = tmp_path
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_file(self, **kwargs):
+        return FileUpload.objects.create(
+            user=self.user, filename='doc.pdf', original_name='doc.pdf', file='uploads/doc.pdf',
+            file_size=100, mime_type='application/pdf', **kwargs
+        )
+
+    def test_page_is_extracted_on_demand_and_cached(self):
+        """Test that an unparsed page is extracted, stored and cached on first access"""
+        file_upload = self.create_file(status='processing')
+        url = reverse('file-page', kwargs={'pk': file_upload.id, 'page': 2})
+
+        response = self.client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['content'] == 'second page here'
+        assert response.data['word_count'] == 3
+        assert read_page(str(self.tmp_path / 'uploads' / 'doc.pdf.parsed' / 'pages'), 2) == 'second page here'
+        assert cache.get(f'pdf_page_{file_upload.id}_2') == 'second page here'
+
+    def test_page_out_of_range(self):
+        """Test that pages past the end return 404"""
+        file_upload = self.create_file(status='processing')
+
+        for page in (0, 3):
+            response = self.client.get(reverse('file-page', kwargs={'pk': file_upload.id, 'page': page}))
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_page_requires_pdf(self):
+        """Test that other file types are rejected"""
+        file_upload = self.create_file(status='ready')
+        FileUpload.objects.filter(id=file_upload.id).update(mime_type='text/csv', original_name='doc.csv')
+
+        response = self.client.get(reverse('file-page', kwargs={'pk': file_upload.id, 'page': 1}))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
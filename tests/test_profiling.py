@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import pandas as pd
+from files.columnar import ColumnarWriter, ColumnarDataset
+from files.profiling import ColumnProfiler, HyperLogLog, profile_dataset
+
+
+def write_dataset(tmp_path, headers, rows, chunk_rows=2):
+    path = str(tmp_path / 'dataset')
+    writer = ColumnarWriter(path, headers, chunk_rows=chunk_rows)
+    for row in rows:
+        writer.append(row)
+    writer.close()
+    return ColumnarDataset(path)
+
+
+class TestProfiling:
+    def test_hyperloglog_estimates_distinct_values(self):
+        """Test that the sketch is exact for few values and close for many"""
+        small = HyperLogLog()
+        small.add_hashes(pd.util.hash_array(np.array([1, 2, 3, 2, 1])))
+        assert small.estimate() == 3
+
+        large = HyperLogLog()
+        for start in range(0, 200000, 50000):
+            large.add_hashes(pd.util.hash_array(np.arange(start, start + 50000) % 100000))
+        assert abs(large.estimate() - 100000) < 5000
+
+    def test_profiles_each_column(self, tmp_path):
+        """Test inferred types, counts and statistics, computed across chunks"""
+        dataset = write_dataset(tmp_path, ['id', 'price', 'name', 'active', 'joined'], [
+            ['1', '9.5', 'Widget', 'true', '2021-03-04'],
+            ['2', '', 'Gadget', 'False', '2020-01-02 10:30'],
+            ['3', '4', 'Widget', 'yes', ''],
+            ['4', '2.5', '', 'no', '2022-12-31'],
+        ])
+
+        profiles = {p['name']: p for p in profile_dataset(dataset, chunk_rows=3)}
+
+        assert profiles['id'] == {
+            'name': 'id', 'type': 'integer', 'count': 4, 'null_count': 0, 'distinct_estimate': 4,
+            'top_values': profiles['id']['top_values'], 'min': 1, 'max': 4, 'mean': 2.5
+        }
+        assert profiles['price']['type'] == 'float'
+        assert profiles['price']['null_count'] == 1
+        assert profiles['price']['mean'] == 16 / 3
+        assert profiles['name']['type'] == 'string'
+        assert profiles['name']['null_count'] == 1
+        assert profiles['name']['distinct_estimate'] == 2
+        assert profiles['name']['top_values'][0] == {'value': 'Widget', 'count': 2}
+        assert 'min' not in profiles['name']
+        assert profiles['active']['type'] == 'boolean'
+        assert profiles['joined']['type'] == 'datetime'
+        assert profiles['joined']['min'] == '2020-01-02T10:30:00'
+        assert profiles['joined']['max'] == '2022-12-31T00:00:00'
+
+    def test_one_bad_value_demotes_a_column(self, tmp_path):
+        """Test that a later chunk can rule out boolean and datetime"""
+        dataset = write_dataset(tmp_path, ['flag', 'when'], [
+            ['true', '2021-03-04'], ['false', '2021-03-05'], ['maybe', 'soon'],
+        ])
+
+        profiles = profile_dataset(dataset, chunk_rows=2)
+
+        assert [p['type'] for p in profiles] == ['string', 'string']
+
+    def test_empty_column(self, tmp_path):
+        """Test that an all-blank column is reported as empty"""
+        dataset = write_dataset(tmp_path, ['a', 'b'], [['1', ''], ['2', None]])
+
+        profile = profile_dataset(dataset)[1]
+
+        assert profile['type'] == 'empty'
+        assert profile['null_count'] == 2
+        assert profile['distinct_estimate'] == 0
+
+    def test_statistics_stay_finite(self, tmp_path):
+        """Test that infinities and overflowing sums are left out so profiles serialize as JSON"""
+        dataset = write_dataset(tmp_path, ['big'], [['1e308'], ['1e308']])
+        profiler = ColumnProfiler('x', 'float64')
+        profiler.add_numbers(np.array([np.inf, 1.5, -np.inf, np.nan, 2.5]))
+
+        big = profile_dataset(dataset)[0]
+        profile = profiler.result()
+
+        assert big['type'] == 'float'
+        assert big['max'] == 1e308
+        assert big['mean'] is None
+        assert profile['count'] == 4
+        assert profile['null_count'] == 1
+        assert (profile['min'], profile['max'], profile['mean']) == (1.5, 2.5, 2.0)
+        assert [v['value'] for v in profile['top_values']] == [1.5, 2.5]
+        json.dumps([big, profile], allow_nan=False)
@@ -0,0 +1,252 @@
+import uuid
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from files.models import FileUpload
+from files.progress import (
+    ProgressHub, ProgressReporter, progress_cache_key, read_progress_many, write_progress
+)
+from files.tasks import update_progress
+from files import progress as progress_module
+
+User = get_user_model()
+
+
+class TestProgressReporter:
+    def setup_method(self):
+        self.writes = []
+
+    def writer(self, file_id, status, progress, error_message=None):
+        self.writes.append((status, progress, error_message))
+
+    def test_coalesces_small_updates(self):
+        """Test that updates within the interval and delta are held back"""
+        reporter = ProgressReporter('f', min_interval=60, min_delta=10, writer=self.writer)
+        for progress in range(30, 45):
+            reporter.update('processing', progress)
+
+        assert self.writes == [('processing', 30, None), ('processing', 40, None)]
+
+        reporter.flush()
+        assert self.writes[-1] == ('processing', 44, None)
+
+    def test_status_change_and_errors_are_written_immediately(self):
+        """Test that stage transitions bypass the throttle"""
+        reporter = ProgressReporter('f', min_interval=60, min_delta=50, writer=self.writer)
+        reporter.update('processing', 30)
+        reporter.update('processing', 31)
+        reporter.update('ready', 31)
+        reporter.update('ready', 31, error_message='boom')
+
+        assert [w[0] for w in self.writes] == ['processing', 'ready', 'ready']
+        assert self.writes[-1][2] == 'boom'
+
+    def test_interval_forces_a_write(self):
+        """Test that a zero interval writes every update"""
+        reporter = ProgressReporter('f', min_interval=0, min_delta=100, writer=self.writer)
+        reporter.update('processing', 30)
+        reporter.update('processing', 31)
+
+        assert len(self.writes) == 2
+
+    def test_hub_fans_out_to_subscribers(self):
+        """Test that published updates reach every watcher of that file only"""
+        hub = ProgressHub()
+        received = []
+        hub.subscribe('a', received.append)
+        hub.subscribe('b', lambda data: received.append(('b', data)))
+        hub.publish('a', {'status': 'processing', 'progress': 50})
+        hub.unsubscribe('a', received.append)
+        hub.publish('a', {'status': 'ready', 'progress': 100})
+
+        assert received == [{'status': 'processing', 'progress': 50}]
+        assert hub.watcher_count() == 1
+
+
+@pytest.mark.django_db
+class TestUpdateProgress:
+    def test_writes_only_progress_columns(self, django_assert_num_queries):
+        """Test that update_progress issues a single UPDATE and leaves parsed_content alone"""
+        user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        file_upload = FileUpload.objects.create(
+            user=user,
+            filename='test.csv',
+            original_name='test.csv',
+            file_size=100,
+            mime_type='text/csv',
+            status='processing',
+            parsed_content={'keep': True}
+        )
+        file_id = str(file_upload.id)
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                update_progress(file_id, 'processing', 40)
+            # The status is unchanged, so the stats are left alone and the row isn't locked
+            file_queries = [q['sql'] for q in queries if 'files_fileupload' in q['sql']]
+            assert len(file_queries) == 1
+            assert file_queries[0].startswith('UPDATE')
+            # Within the throttle window: nothing hits the database
+            with django_assert_num_queries(0):
+                update_progress(file_id, 'processing', 41)
+        finally:
+            progress_module.close_reporter(file_id, flush=False)
+
+        file_upload.refresh_from_db()
+        assert file_upload.progress == 40
+        assert file_upload.parsed_content == {'keep': True}
+        assert cache.get(progress_cache_key(file_id))['progress'] == 40
+
+
+# Streams read progress off the request thread, so test data has to be committed
+@pytest.mark.django_db(transaction=True)
+class TestProgressStreaming:
+    def setup_method(self):
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client = Client()
+
+    def create_file(self, **kwargs):
+        return FileUpload.objects.create(
+            user=self.user,
+            filename='test.csv',
+            original_name='test.csv',
+            file_size=100,
+            mime_type='text/csv',
+            **kwargs
+        )
+
+    def test_stream_requires_authentication(self):
+        """Test that the event stream rejects anonymous clients"""
+        file_upload = self.create_file(status='processing', progress=40)
+        url = reverse('file-progress-stream', kwargs={'file_id': file_upload.id})
+
+        assert self.client.get(url).status_code == 401
+
+    def test_stream_emits_events_until_final_status(self):
+        """Test that the event stream sends the current state and ends once ready"""
+        file_upload = self.create_file(status='ready', progress=100)
+        url = reverse('file-progress-stream', kwargs={'file_id': file_upload.id})
+
+        response = self.client.get(url, {'token': self.token})
+        body = b''.join(response).decode()
+
+        assert response['Content-Type'] == 'text/event-stream'
+        assert 'event: progress' in body
+        assert '"status": "ready"' in body
+
+    def test_stream_hides_other_users_files(self):
+        """Test that watching someone else's file returns 404"""
+        other = User.objects.create_user(username='o', email='o@example.com', password='pass12345')
+        file_upload = FileUpload.objects.create(
+            user=other, filename='x.csv', original_name='x.csv', file_size=1, mime_type='text/csv'
+        )
+        url = reverse('file-progress-stream', kwargs={'file_id': file_upload.id})
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        assert response.status_code == 404
+
+    def test_long_poll_returns_changed_state(self):
+        """Test that long-poll answers immediately when the client is behind"""
+        file_upload = self.create_file(status='processing', progress=60)
+        url = reverse('file-progress-wait', kwargs={'file_id': file_upload.id})
+
+        response = self.client.get(
+            url, {'status': 'processing', 'progress': '40'}, HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+
+        assert response.status_code == 200
+        assert response.json()['progress'] == 60
+
+    def test_long_poll_times_out_with_current_state(self):
+        """Test that long-poll returns the unchanged state after the timeout"""
+        file_upload = self.create_file(status='processing', progress=60)
+        url = reverse('file-progress-wait', kwargs={'file_id': file_upload.id})
+
+        response = self.client.get(
+            url, {'status': 'processing', 'progress': '60', 'timeout': '0.2'},
+            HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+
+        assert response.json() == {'file_id': str(file_upload.id), 'status': 'processing', 'progress': 60}
+
+
+@pytest.mark.django_db
+class TestProgressMany:
+    def setup_method(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+
+    def create_file(self, user=None, **fields):
+        return FileUpload.objects.create(
+            user=user or self.user, filename='a.csv', original_name='a.csv', file_size=1, mime_type='text/csv',
+            **fields
+        )
+
+    def post(self, file_ids):
+        return self.client.post(reverse('file-progress-many'), {'file_ids': file_ids}, format='json')
+
+    def test_returns_progress_in_request_order(self):
+        """Test that cached and stored progress are both returned"""
+        first = self.create_file(status='processing', progress=40)
+        second = self.create_file()
+        write_progress(str(second.id), 'failed', 0, error_message='boom')
+
+        response = self.post([str(second.id), str(first.id)])
+
+        assert response.status_code == 200
+        assert response.data['files'] == [
+            {'file_id': str(second.id), 'status': 'failed', 'progress': 0, 'error': 'boom'},
+            {'file_id': str(first.id), 'status': 'processing', 'progress': 40},
+        ]
+        assert response.data['not_found'] == []
+
+    def test_repeat_lookup_is_served_from_cache(self, django_assert_num_queries):
+        """Test that once owners are cached a lookup is a single cache read"""
+        file_ids = [str(self.create_file().id) for _ in range(5)]
+        for file_id in file_ids:
+            write_progress(file_id, 'processing', 20)
+        read_progress_many(file_ids, self.user.id)
+
+        with django_assert_num_queries(1):
+            found = read_progress_many(file_ids, self.user.id)
+
+        assert sorted(found) == sorted(file_ids)
+
+    def test_other_users_files_are_not_found(self):
+        """Test that ownership is checked for cached progress too"""
+        other = User.objects.create_user(username='o', email='o@example.com', password='pass12345')
+        theirs = self.create_file(user=other)
+        write_progress(str(theirs.id), 'processing', 30)
+        read_progress_many([str(theirs.id)], other.id)
+        missing = str(uuid.uuid4())
+
+        response = self.post([str(theirs.id), missing])
+
+        assert response.data == {'files': [], 'not_found': [str(theirs.id), missing]}
+
+    def test_deleted_files_are_not_found(self, tmp_path, settings, django_capture_on_commit_callbacks):
+        """Test that deleting a file drops its cached progress and owner"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        file_upload = self.create_file()
+        file_id = str(file_upload.id)
+        write_progress(file_id, 'processing', 30)
+        read_progress_many([file_id], self.user.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            file_upload.delete()
+
+        assert self.post([file_id]).data == {'files': [], 'not_found': [file_id]}
+
+    def test_rejects_invalid_ids(self):
+        """Test that file_ids must be a list of UUIDs"""
+        assert self.post(['nope']).status_code == 400
+        assert self.post([]).status_code == 400
@@ -0,0 +1,130 @@
+import os
+import shutil
+import pytest
+from django.contrib.auth import get_user_model
+from files import tasks
+from files.artifacts import artifacts_dir
+from files.models import FileUpload
+from files.result_cache import ParseResultCache
+
+User = get_user_model()
+
+
+def make_upload(media_root, name, artifact=b'data'):
+    """A stored file with one artifact, and parsed_content pointing at it"""
+    path = os.path.join(media_root, 'uploads', name)
+    os.makedirs(artifacts_dir(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'a,b\n1,2\n')
+    with open(os.path.join(artifacts_dir(path), 'rows.idx'), 'wb') as f:
+        f.write(artifact)
+    return path, {'type': 'csv', 'row_index': {'path': f'uploads/{name}.parsed/rows.idx'}}
+
+
+class TestParseResultCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings):
+        settings.MEDIA_ROOT = str(tmp_path)
+        self.media_root = str(tmp_path)
+        self.cache = ParseResultCache(str(tmp_path / 'cache'), max_bytes=10 ** 6)
+
+    def test_hit_restores_artifacts_for_another_file(self):
+        """Test that a hit rebuilds artifacts next to the new file and rewrites pointers"""
+        path, parsed_content = make_upload(self.media_root, 'a.csv')
+        self.cache.put('h', 'csv', 1, {}, path, parsed_content)
+        other, _ = make_upload(self.media_root, 'b.csv', artifact=b'stale')
+
+        result = self.cache.get('h', 'csv', 1, {}, other)
+
+        assert result == {'type': 'csv', 'row_index': {'path': 'uploads/b.csv.parsed/rows.idx'}}
+        with open(os.path.join(artifacts_dir(other), 'rows.idx'), 'rb') as f:
+            assert f.read() == b'data'
+
+    def test_key_includes_version_and_options(self):
+        """Test that a version bump drops only that parser's entries"""
+        path, parsed_content = make_upload(self.media_root, 'a.csv')
+        self.cache.put('h', 'csv', 1, {}, path, parsed_content)
+        self.cache.put('h', 'pdf', 1, {}, path, {'type': 'pdf'})
+
+        assert self.cache.get('h', 'csv', 1, {'preview_rows': 5}, path) is None
+
+        self.cache.put('h', 'csv', 2, {}, path, parsed_content)
+
+        assert self.cache.get('h', 'csv', 1, {}, path) is None
+        assert self.cache.get('h', 'csv', 2, {}, path) is not None
+        assert self.cache.get('h', 'pdf', 1, {}, path) == {'type': 'pdf'}
+
+    def test_evicts_least_recently_used(self):
+        """Test that the budget is enforced by dropping the entry used longest ago"""
+        path, parsed_content = make_upload(self.media_root, 'a.csv')
+        parsed_content['padding'] = 'x' * 1000
+        self.cache.max_bytes = 2500
+        for i, content_hash in enumerate(['h1', 'h2']):
+            self.cache.put(content_hash, 'csv', 1, {}, path, parsed_content)
+            result = os.path.join(self.cache._entry(content_hash, 'csv', 1, {}), 'result.json')
+            os.utime(result, (1000 + i, 1000 + i))
+        # Reading h1 makes h2 the least recently used
+        assert self.cache.get('h1', 'csv', 1, {}, path) is not None
+
+        self.cache.put('h3', 'csv', 1, {}, path, parsed_content)
+
+        assert self.cache.get('h2', 'csv', 1, {}, path) is None
+        assert self.cache.get('h1', 'csv', 1, {}, path) is not None
+        assert self.cache.get('h3', 'csv', 1, {}, path) is not None
+
+    def test_artifacts_shared_with_uploads_are_not_charged(self):
+        """Test that hard-linked artifacts count only once their upload is gone"""
+        self.cache.max_bytes = 2500
+        uploads = [make_upload(self.media_root, f'{name}.csv', artifact=b'x' * 1000) for name in 'abc']
+        for content_hash, (path, parsed_content) in zip(['h1', 'h2', 'h3'], uploads):
+            self.cache.put(content_hash, 'csv', 1, {}, path, parsed_content)
+
+        assert all(size < 1000 for _, size, _ in self.cache.entries())
+        assert self.cache.get('h1', 'csv', 1, {}, uploads[0][0]) is not None
+
+        for content_hash, (path, _) in zip(['h1', 'h2', 'h3'], uploads):
+            shutil.rmtree(artifacts_dir(path))
+            self.cache.recount(content_hash)
+
+        # Three entries of over 1000 bytes each no longer fit in 2500; h2 is the least recently used
+        assert len(self.cache.entries()) == 2
+        assert self.cache.get('h2', 'csv', 1, {}, uploads[1][0]) is None
+        assert self.cache.get('h1', 'csv', 1, {}, uploads[0][0]) is not None
+
+    def test_index_is_rebuilt_when_missing(self):
+        """Test that a lost index is rebuilt from the entries on disk"""
+        path, parsed_content = make_upload(self.media_root, 'a.csv')
+        self.cache.put('h', 'csv', 1, {}, path, parsed_content)
+        os.remove(os.path.join(self.cache.root, 'index.json'))
+
+        [(_, size, entry)] = self.cache.entries()
+
+        assert entry == self.cache._entry('h', 'csv', 1, {})
+        assert size == os.path.getsize(os.path.join(entry, 'result.json'))
+
+
+@pytest.mark.django_db
+class TestParseWithCache:
+    def test_reprocessing_is_a_cache_hit(self, tmp_path, settings, monkeypatch):
+        """Test that processing the same content twice runs the parser once"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        os.makedirs(tmp_path / 'uploads')
+        (tmp_path / 'uploads' / 'a.csv').write_bytes(b'Name,Age\nJohn,25\n')
+        file_upload = FileUpload.objects.create(
+            user=user, filename='a.csv', original_name='a.csv', file='uploads/a.csv',
+            file_size=17, mime_type='text/csv', content_hash='f' * 64
+        )
+        calls = []
+        run_parser = tasks.run_parser
+        monkeypatch.setattr(tasks, 'run_parser', lambda *args: calls.append(args) or run_parser(*args))
+
+        tasks.process_file(str(file_upload.id))
+        first = FileUpload.objects.get(id=file_upload.id).parsed_content
+        tasks.process_file(str(file_upload.id))
+
+        file_upload.refresh_from_db()
+        assert len(calls) == 1
+        assert file_upload.status == 'ready'
+        assert file_upload.parsed_content == first
+        assert os.path.isfile(tmp_path / 'uploads' / 'a.csv.parsed' / 'rows.idx')
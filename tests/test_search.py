@@ -0,0 +1,107 @@
+import io
+import sqlite3
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from files import search, tasks
+from files.models import FileUpload
+from files.pdf_pages import write_page
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestSearch:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, settings):
+        settings.MEDIA_ROOT = str(tmp_path)
+        self.tmp_path = tmp_path
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+
+    def create_pdf(self, user, name, pages):
+        pages_dir = self.tmp_path / f'{name}.parsed' / 'pages'
+        pages_dir.mkdir(parents=True)
+        for page_number, text in enumerate(pages, start=1):
+            write_page(str(pages_dir), page_number, text)
+        return FileUpload.objects.create(
+            user=user, filename=name, original_name=name, file_size=1, mime_type='application/pdf',
+            status='ready', parsed_content={'type': 'pdf', 'pages': len(pages), 'pages_path': f'{name}.parsed/pages'}
+        )
+
+    def test_ranked_hits_with_snippets(self):
+        """Test that matching files come back best first with the matching page"""
+        weak = self.create_pdf(self.user, 'weak.pdf', ['one mention of quokka among many other words here'])
+        strong = self.create_pdf(self.user, 'strong.pdf', ['intro', 'quokka quokka quokka'])
+        for file_upload in (weak, strong):
+            tasks.index_for_search(file_upload.id)
+
+        response = self.client.get(reverse('file-search'), {'q': 'Quokka'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['file_id'] for r in response.data['results']] == [str(strong.id), str(weak.id)]
+        best = response.data['results'][0]
+        assert best['original_name'] == 'strong.pdf'
+        assert best['hits'][0]['part'] == 'page 2'
+        assert '<mark>quokka</mark>' in best['hits'][0]['snippet']
+
+    def test_results_are_scoped_to_the_user(self):
+        """Test that other users' files never match"""
+        other = User.objects.create_user(username='o', email='o@example.com', password='pass12345')
+        tasks.index_for_search(self.create_pdf(other, 'secret.pdf', ['quokka']).id)
+
+        response = self.client.get(reverse('file-search'), {'q': 'quokka'})
+
+        assert response.data['results'] == []
+
+    def test_tables_are_indexed_and_delete_removes_file(self, tmp_path, django_capture_on_commit_callbacks):
+        """Test CSV rows are searchable and deleting a file drops it from the index"""
+        (tmp_path / 'uploads').mkdir()
+        path = tmp_path / 'uploads' / 'animals.csv'
+        path.write_text('name,habitat\nquokka,Rottnest\nwombat,burrow\n')
+        file_upload = FileUpload.objects.create(
+            user=self.user, filename='animals.csv', original_name='animals.csv', file='uploads/animals.csv',
+            file_size=path.stat().st_size, mime_type='text/csv', content_hash='a' * 64
+        )
+        tasks.process_file(str(file_upload.id))
+
+        assert [r['hits'][0]['part'] for r in search.search(self.user.id, 'rottnest')] == ['rows 1-2']
+        assert search.search(self.user.id, 'anim*')[0]['hits'][0]['part'] == 'name'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            FileUpload.objects.get(id=file_upload.id).delete()
+        assert search.search(self.user.id, 'rottnest') == []
+
+    def test_index_error_does_not_fail_delete(self, monkeypatch, django_capture_on_commit_callbacks):
+        """Test that the file is deleted even when the search index can't be updated"""
+        file_upload = self.create_pdf(self.user, 'doc.pdf', ['echidna'])
+        attempts = []
+        def broken(file_id):
+            attempts.append(file_id)
+            raise sqlite3.OperationalError('database is locked')
+        monkeypatch.setattr(search, 'remove_file', broken)
+
+        file_id = file_upload.id
+
+        with django_capture_on_commit_callbacks(execute=True):
+            file_upload.delete()
+
+        assert attempts == [file_id]
+        assert not FileUpload.objects.filter(id=file_id).exists()
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command indexes existing files"""
+        self.create_pdf(self.user, 'old.pdf', ['platypus'])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        assert len(search.search(self.user.id, 'platypus')) == 1
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Test that FTS5 operators in the query are treated as words"""
+        assert search.build_match('a" OR owner:u1 NEAR(') == '"a" "OR" "owner" "u1" "NEAR"'
+        assert self.client.get(reverse('file-search'), {'q': ''}).status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,94 @@
+import io
+from datetime import timedelta
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from files.models import FileUpload, UserFileStats
+from files.progress import write_progress
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestFileStats:
+    @pytest.fixture(autouse=True)
+    def isolate_media(self, tmp_path, settings):
+        # Deleting a file also updates the search index under MEDIA_ROOT
+        settings.MEDIA_ROOT = str(tmp_path)
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='u', email='u@example.com', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+
+    def create_file(self, name, size, mime_type):
+        return FileUpload.objects.create(
+            user=self.user, filename=name, original_name=name, file_size=size, mime_type=mime_type
+        )
+
+    def get_stats(self):
+        response = self.client.get(reverse('file-stats'))
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_counters_follow_uploads_status_and_deletes(self):
+        """Test that stats track creation, status changes and deletion"""
+        csv_file = self.create_file('a.csv', 100, 'text/csv')
+        pdf_file = self.create_file('b.pdf', 50, 'application/pdf')
+        started = timezone.now() - timedelta(seconds=30)
+        write_progress(str(csv_file.id), 'processing', 10, processing_started_at=started)
+        write_progress(str(csv_file.id), 'processing', 50)
+        write_progress(str(csv_file.id), 'ready', 100)
+
+        stats = self.get_stats()
+        assert stats['file_count'] == 2
+        assert stats['total_bytes'] == 150
+        assert stats['files_by_status'] == {'ready': 1, 'uploading': 1}
+        assert stats['bytes_by_status'] == {'ready': 100, 'uploading': 50}
+        assert stats['bytes_by_mime_type'] == {'text/csv': 100, 'application/pdf': 50}
+        assert 29 < stats['average_processing_seconds'] < 60
+        # The file passed through each status bucket once and only the last one still counts it
+        buckets = {
+            (row.status, row.mime_type): (row.file_count, row.total_bytes, row.timed_count)
+            for row in UserFileStats.objects.filter(user=self.user)
+        }
+        assert buckets == {
+            ('uploading', 'text/csv'): (0, 0, 0),
+            ('processing', 'text/csv'): (0, 0, 0),
+            ('ready', 'text/csv'): (1, 100, 1),
+            ('uploading', 'application/pdf'): (1, 50, 0),
+        }
+
+        FileUpload.objects.filter(id=pdf_file.id).delete()
+        FileUpload.objects.get(id=csv_file.id).delete()
+
+        stats = self.get_stats()
+        assert stats['file_count'] == 0
+        assert stats['bytes_by_mime_type'] == {}
+        assert stats['average_processing_seconds'] is None
+
+    def test_stats_are_per_user(self):
+        """Test that other users' files are not counted"""
+        other = User.objects.create_user(username='o', email='o@example.com', password='pass12345')
+        FileUpload.objects.create(user=other, filename='x', original_name='x', file_size=7, mime_type='text/csv')
+
+        assert self.get_stats()['file_count'] == 0
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test that --check reports drift and a rebuild fixes it"""
+        file_upload = self.create_file('a.csv', 100, 'text/csv')
+        # Bypasses the counters, like a bulk fix-up in the database would
+        FileUpload.objects.filter(id=file_upload.id).update(status='failed')
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_file_stats', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_file_stats', stdout=io.StringIO())
+
+        assert self.get_stats()['files_by_status'] == {'failed': 1}
+        call_command('rebuild_file_stats', '--check', stdout=io.StringIO())
@@ -0,0 +1,142 @@
+import threading
+import pytest
+from files.workers import InlineExecutor, WorkerPool, QueueFull
+
+
+class TestWorkerPool:
+    def test_runs_jobs_in_fifo_order(self):
+        """Test that a single worker processes jobs in submission order"""
+        pool = WorkerPool(max_workers=1)
+        results = []
+        for i in range(5):
+            pool.submit(results.append, i)
+        pool.join()
+        pool.shutdown()
+
+        assert results == [0, 1, 2, 3, 4]
+
+    def test_concurrency_is_bounded(self):
+        """Test that no more than max_workers jobs run at once"""
+        pool = WorkerPool(max_workers=2)
+        lock = threading.Lock()
+        running = {'now': 0, 'peak': 0}
+        release = threading.Event()
+
+        def job():
+            with lock:
+                running['now'] += 1
+                running['peak'] = max(running['peak'], running['now'])
+            release.wait(5)
+            with lock:
+                running['now'] -= 1
+
+        for _ in range(6):
+            pool.submit(job)
+        stats = pool.stats()
+        release.set()
+        pool.join()
+        pool.shutdown()
+
+        assert stats['workers'] == 2
+        assert running['peak'] <= 2
+
+    def test_full_queue_rejects_jobs(self):
+        """Test that a bounded queue raises QueueFull instead of growing"""
+        pool = WorkerPool(max_workers=1, max_queue_size=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        pool.submit(blocker)
+        started.wait(5)
+        pool.submit(lambda: None)
+
+        assert pool.queue_depth() == 1
+        with pytest.raises(QueueFull):
+            pool.submit(lambda: None)
+
+        release.set()
+        pool.shutdown()
+
+    def test_submit_many_is_all_or_nothing(self):
+        """Test that a batch is queued whole or rejected whole"""
+        pool = WorkerPool(max_workers=1, max_queue_size=3)
+        release = threading.Event()
+        started = threading.Event()
+        results = []
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        pool.submit(blocker)
+        started.wait(5)
+        with pytest.raises(QueueFull):
+            pool.submit_many(results.append, [(i,) for i in range(4)])
+        assert pool.queue_depth() == 0
+
+        pool.submit_many(results.append, [(i,) for i in range(3)])
+        release.set()
+        pool.shutdown()
+        assert results == [0, 1, 2]
+
+    def test_shutdown_drains_queue(self):
+        """Test that shutdown lets queued jobs finish before returning"""
+        pool = WorkerPool(max_workers=1)
+        results = []
+        for i in range(3):
+            pool.submit(results.append, i)
+
+        assert pool.shutdown(wait=True, timeout=5)
+        assert results == [0, 1, 2]
+        with pytest.raises(RuntimeError):
+            pool.submit(results.append, 4)
+
+    def test_slot_shares_the_worker_limit(self):
+        """Test that work holding a slot keeps a worker from starting a job"""
+        pool = WorkerPool(max_workers=1)
+        ran = threading.Event()
+
+        with pool.slot():
+            pool.submit(ran.set)
+            assert not ran.wait(0.2)
+            assert pool.stats()['active'] == 1
+            with pytest.raises(QueueFull):
+                with pool.slot(timeout=0):
+                    pass
+        assert ran.wait(5)
+        pool.shutdown()
+
+    def test_jobs_waiting_for_a_slot_count_as_queued(self):
+        """Test that a job a worker holds while slots are busy still counts towards the queue bound"""
+        pool = WorkerPool(max_workers=1, max_queue_size=1)
+        ran = threading.Event()
+
+        with pool.slot():
+            pool.submit(ran.set)
+            # Give the worker time to take the job off the queue
+            assert not ran.wait(0.2)
+            assert pool.queue_depth() == 1
+            assert pool.stats()['queued'] == 1
+            with pytest.raises(QueueFull):
+                pool.submit(lambda: None)
+        assert ran.wait(5)
+        pool.shutdown()
+        assert pool.queue_depth() == 0
+
+
+class TestInlineExecutor:
+    def test_stats_match_the_pool(self):
+        """Test that inline execution reports the same counters as WorkerPool"""
+        executor = InlineExecutor()
+        executor.submit_many(lambda: None, [(), ()])
+        with pytest.raises(ValueError):
+            executor.submit(int, 'x')
+
+        stats = executor.stats()
+
+        assert set(stats) == set(WorkerPool().stats())
+        assert (stats['submitted'], stats['completed'], stats['failed']) == (3, 3, 1)